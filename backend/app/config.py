@@ -17,6 +17,14 @@ class Settings(BaseSettings):
     # Notion API
     NOTION_TOKEN: str
     NOTION_DATABASE_ID: str = ""  # Optional: 預設資料庫 ID
+    NOTION_CRAWL_CONCURRENCY: int = 8  # 同步頁面樹時同時查詢子頁面的 Root 數量上限
+    NOTION_PAGE_TREE_TTL: int = 1800  # 頁面樹快取多久後需要更新 (Redis 共用，本機另有一層)
+    NOTION_PAGE_TREE_INCREMENTAL: bool = True  # 依 last_edited_time 增量更新頁面樹，而非每次完整爬取
+    NOTION_PAGE_TREE_FULL_SYNC_SECONDS: int = 21600  # 完整重新同步的間隔 (移除已刪除的頁面)
+    NOTION_RATE_LIMIT_PER_SECOND: float = 3.0  # 每個 Integration Token 所有 Worker 合計的請求速率
+    NOTION_RATE_LIMIT_BURST: int = 3  # 閒置後可連續發送的請求數
+    NOTION_REQUEST_RETRIES: int = 4  # 429 / 409 / 5xx 時於呼叫層級重試的次數，用盡後才交由 Task 重試
+    NOTION_PAGE_TREE_LOCK_WAIT_SECONDS: float = 20.0  # 其他 Process 正在同步時等待結果的最長秒數
     
     # Line Messaging API
     LINE_CHANNEL_ACCESS_TOKEN: str
@@ -34,11 +42,80 @@ class Settings(BaseSettings):
     BACKEND_CORS_ORIGINS: list[str] = ["*"]
     TASK_ENCRYPTION_KEY: str = ""  # 用於加密 Celery 任務酬載的 Fernet 金鑰
     
+    # Audio Ingest
+    AUDIO_PREDECODE_ENABLED: bool = False  # 上傳時預先解碼為 16 kHz PCM (需安裝 ingest 依賴群組)
+    AUDIO_PREDECODE_DTYPE: str = "float32"  # float32 (Worker 零拷貝) / int16 (節省一半空間)
+    
+    # Speech-to-Text (Faster-Whisper)
+    STT_MODEL_SIZE: str = "small"  # tiny / base / small ...
+    STT_COMPUTE_TYPE: str = "int8"  # CPU 量化類型
+    STT_LANGUAGE: str = "zh"
+    STT_PRELOAD_MODEL: bool = True  # Worker Process 啟動時預先載入並暖機模型
+    STT_CHUNKED_ENABLED: bool = False  # 長錄音依 VAD 靜音切段並行轉錄 (會增加記憶體用量)
+    STT_CHUNK_MIN_SECONDS: float = 180.0  # 超過此長度才啟用切段
+    STT_CHUNK_MAX_SECONDS: float = 60.0  # 單段最長秒數
+    STT_CHUNK_OVERLAP_SECONDS: float = 1.0  # 每段前後重疊秒數
+    STT_CHUNK_WORKERS: int = 0  # 並行數，0 表示使用 CPU 核心數
+    STT_CHUNK_POOL: str = "thread"  # thread / process (process 需搭配 celery --pool=solo 或 threads)
+    STT_BATCH_ENABLED: bool = False  # 跨任務批次轉錄短語音
+    STT_BATCH_MAX_SECONDS: float = 30.0  # 短於此長度的語音才參與批次 (上限 30 秒)
+    STT_BATCH_MAX_SIZE: int = 8  # 單批最多筆數
+    STT_BATCH_WINDOW_MS: int = 500  # 收集批次的最長等待時間
+    STT_BATCH_RESULT_TIMEOUT: float = 120.0  # 等待批次結果的逾時秒數，逾時後自行轉錄
+    STT_CACHE_ENABLED: bool = True  # 以音訊內容雜湊快取逐字稿
+    STT_CACHE_BACKEND: str = "redis"  # redis / disk
+    STT_CACHE_MAX_ENTRIES: int = 1000  # 超過後以 LRU 淘汰
+    STT_CACHE_DIR: str = "/data/stt_cache"  # disk backend 使用
+    STT_TRIM_SILENCE: bool = False  # 推論前移除頭尾靜音並壓縮過長停頓 (會改變逐字稿，且需複製 PCM，Sidecar 的零拷貝 mmap 失效)
+    STT_TRIM_THRESHOLD_DB: float = -45.0  # 低於此能量 (dBFS) 視為靜音
+    STT_TRIM_MIN_GAP_SECONDS: float = 1.0  # 超過此長度的內部停頓才壓縮
+    STT_TRIM_KEEP_GAP_SECONDS: float = 0.3  # 壓縮後保留的停頓長度
+    STT_PROFILE_PATH: str = "/data/stt_profile.json"  # scripts/benchmark_whisper.py 產生的調校檔
+    STT_PROFILE_MODE: str = "latency"  # latency / throughput
+    STT_MODEL_CACHE_SIZE: int = 2  # 每個 Worker Process 最多同時常駐的模型數
+    STT_ADAPTIVE_MODEL: bool = False  # 依音訊長度與佇列深度動態選擇模型
+    STT_POLICY_MODELS: str = "small,base,tiny"  # 候選模型 (由準確到快速)
+    STT_LATENCY_SLO_SECONDS: float = 300.0  # 任務從開始轉錄到完成的目標秒數
+    STT_MODEL_RTF: dict[str, float] = {"tiny": 0.05, "base": 0.1, "small": 0.3}  # 各模型即時率 (處理秒數 / 音訊秒數)
+    STT_POLICY_AVG_AUDIO_SECONDS: float = 60.0  # 估算排隊時間用的平均音訊長度
+    STT_POLICY_CONCURRENCY: int = 1  # STT Worker 並行數
+    STT_POLICY_QUEUES: str = "stt_fast,stt_bulk"  # 計算佇列深度的 Celery 佇列 (逗號分隔)
+    STT_FAST_QUEUE: str = "stt_fast"  # 短錄音的快速通道
+    STT_BULK_QUEUE: str = "stt_bulk"  # 長錄音 (或長度未知) 的一般通道
+    STT_FAST_MAX_SECONDS: float = 120.0  # 不超過此長度的錄音進入快速通道
+    STT_PRIORITY_BUCKETS: str = "30,120,600"  # 依音訊長度 (秒) 分級的優先序邊界，越短越優先
+    
+    # LLM
+    LLM_FUSED_MODE: bool = False  # 單次呼叫同時完成路由判斷與摘要 (驗證失敗時退回兩階段)
+    LLM_SPECULATIVE_SUMMARY: bool = False  # 以預測模板與路由判斷並行生成摘要 (預測錯誤時重新生成)
+    
+    # Observability
+    METRICS_WORKER_PORT: int = 9808  # Celery Worker 的 /metrics 埠號，0 表示不啟動
+    
+    # Pipeline
+    PAGE_TREE_PREFETCH_ENABLED: bool = True  # 轉錄同時於 io 佇列預取 Notion 頁面樹
+    PAGE_TREE_PREFETCH_WAIT_SECONDS: float = 30.0  # 路由階段等待預取完成的最長秒數，逾時自行同步
+    
     @property
     def allowed_hosts_list(self) -> list[str]:
         """將 ALLOWED_HOSTS 字串轉為列表"""
         return [host.strip() for host in self.ALLOWED_HOSTS.split(",") if host.strip()]
     
+    @property
+    def stt_policy_models_list(self) -> list[str]:
+        """將 STT_POLICY_MODELS 字串轉為列表"""
+        return [model.strip() for model in self.STT_POLICY_MODELS.split(",") if model.strip()]
+    
+    @property
+    def stt_policy_queues_list(self) -> list[str]:
+        """將 STT_POLICY_QUEUES 字串轉為列表"""
+        return [queue.strip() for queue in self.STT_POLICY_QUEUES.split(",") if queue.strip()]
+    
+    @property
+    def stt_priority_buckets_list(self) -> list[float]:
+        """將 STT_PRIORITY_BUCKETS 字串轉為由小到大的秒數列表"""
+        return sorted(float(bound) for bound in self.STT_PRIORITY_BUCKETS.split(",") if bound.strip())
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
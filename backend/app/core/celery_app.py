@@ -6,6 +6,11 @@ from app.config import get_settings
 
 settings = get_settings()
 
+# Redis Broker 以多個 List 模擬優先序：數字越小越優先 (0~9)，
+# 佇列 Key 為 `{queue}` (優先序 0) 與 `{queue}:{priority}`
+PRIORITY_STEPS = list(range(10))
+PRIORITY_SEP = ":"
+
 celery_app = Celery(
     "voice_notion",
     broker=settings.REDIS_URL,
@@ -23,4 +28,17 @@ celery_app.conf.update(
     task_track_started=True,
     task_acks_late=True,  # 確保任務執行完才移除
     worker_prefetch_multiplier=1,
+    worker_proc_alive_timeout=120,  # 子 Process 需於 worker_process_init 載入 Whisper 模型，預設 4 秒不足
+    task_default_queue="io",
+    # 依負載類型分派佇列：CPU-bound 的轉錄進入 stt 通道，其餘等待網路的 Stage 進入 io
+    # (發送時再依音訊長度改派 stt_fast / stt_bulk，見 app.services.stt_scheduler)
+    task_routes={
+        "app.worker.tasks.transcribe_stage": {"queue": settings.STT_BULK_QUEUE},
+        "app.worker.tasks.*": {"queue": "io"},
+    },
+    broker_transport_options={
+        "priority_steps": PRIORITY_STEPS,
+        "sep": PRIORITY_SEP,
+        "queue_order_strategy": "priority",
+    },
 )
@@ -33,6 +33,28 @@ async def get_user_context(
     2. 若帶有 X-Voice-Notion-Config -> 解析 JSON 並進入 Demo 模式 (BYOK)
     3. 否則拋出 401
     """
+    return await _resolve_user_context(request, x_api_key, x_voice_notion_config, rate_limit=True)
+
+
+async def get_authenticated_context(
+    request: Request,
+    x_api_key: Optional[str] = Header(None, alias="X-API-Key"),
+    x_voice_notion_config: Optional[str] = Header(None, alias="X-Voice-Notion-Config"),
+) -> UserContext:
+    """
+    與 get_user_context 相同的身份驗證，但 Demo 模式不計入限流
+
+    用於已計算過限流的後續請求 (例如可續傳上傳的 Chunk 與 finalize)。
+    """
+    return await _resolve_user_context(request, x_api_key, x_voice_notion_config, rate_limit=False)
+
+
+async def _resolve_user_context(
+    request: Request,
+    x_api_key: Optional[str],
+    x_voice_notion_config: Optional[str],
+    rate_limit: bool,
+) -> UserContext:
     
     # Path A: Admin Intent
     if x_api_key is not None:
@@ -56,7 +78,8 @@ async def get_user_context(
             line_user_id = config.get("X-Line-User-ID")
             
             if gemini_key and notion_token:
-                await demo_rate_limiter(request)
+                if rate_limit:
+                    await demo_rate_limiter(request)
                 return UserContext(
                     type=AuthType.DEMO,
                     gemini_key=gemini_key,
@@ -0,0 +1,164 @@
+"""
+Prometheus Metrics
+Pipeline 各階段、上傳處理、佇列等待與外部 API (Notion / Gemini) 的延遲指標
+
+- Web: 由 /metrics 端點輸出
+- Celery Worker: 於 worker_init 啟動獨立 HTTP Server (METRICS_WORKER_PORT)
+
+設定環境變數 PROMETHEUS_MULTIPROC_DIR 時以 Multiprocess 模式記錄，
+prefork 子 Process 與多個 uvicorn worker 的數值會彙整後輸出。
+"""
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# 轉錄可達數十分鐘，Bucket 需涵蓋長尾
+STAGE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+CALL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_DURATION = Histogram(
+    "voice_notion_stage_duration_seconds",
+    "Pipeline stage processing time",
+    ["stage", "status"],
+    buckets=STAGE_BUCKETS,
+)
+QUEUE_WAIT = Histogram(
+    "voice_notion_queue_wait_seconds",
+    "Time between a stage being enqueued and starting",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+UPLOAD_DURATION = Histogram(
+    "voice_notion_upload_duration_seconds",
+    "Upload request handling time",
+    ["endpoint", "status"],
+    buckets=CALL_BUCKETS,
+)
+EXTERNAL_CALLS = Counter(
+    "voice_notion_external_calls_total",
+    "External API calls",
+    ["service", "operation", "status"],
+)
+EXTERNAL_DURATION = Histogram(
+    "voice_notion_external_call_duration_seconds",
+    "External API call latency",
+    ["service", "operation"],
+    buckets=CALL_BUCKETS,
+)
+PAGE_TREE_CRAWL_DURATION = Histogram(
+    "voice_notion_page_tree_crawl_seconds",
+    "Notion page tree sync time",
+    ["mode"],
+    buckets=CALL_BUCKETS,
+)
+PAGE_TREE_CRAWL_CALLS = Histogram(
+    "voice_notion_page_tree_crawl_calls",
+    "Notion API calls per page tree sync",
+    ["mode"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+RATE_LIMIT_WAIT = Histogram(
+    "voice_notion_rate_limit_wait_seconds",
+    "Time spent waiting for the shared external API rate limit",
+    ["service"],
+    buckets=CALL_BUCKETS,
+)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """記錄 Pipeline 階段耗時 (依成功 / 失敗分開統計)"""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        STAGE_DURATION.labels(stage, status).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_external(service: str, operation: str) -> Iterator[None]:
+    """記錄外部 API 呼叫次數與延遲"""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        EXTERNAL_DURATION.labels(service, operation).observe(time.perf_counter() - start)
+        EXTERNAL_CALLS.labels(service, operation, status).inc()
+
+
+def observe_queue_wait(stage: str, enqueued_at: float) -> None:
+    """記錄任務從排入佇列到開始執行的等待時間"""
+    QUEUE_WAIT.labels(stage).observe(max(0.0, time.time() - enqueued_at))
+
+
+def observe_upload(endpoint: str, status_code: int, seconds: float) -> None:
+    """記錄上傳請求處理時間"""
+    UPLOAD_DURATION.labels(endpoint, str(status_code)).observe(seconds)
+
+
+def observe_page_tree_crawl(seconds: float, calls: int, mode: str = "full") -> None:
+    """記錄一次頁面樹同步 (full / incremental) 的耗時與 API 呼叫次數"""
+    PAGE_TREE_CRAWL_DURATION.labels(mode).observe(seconds)
+    PAGE_TREE_CRAWL_CALLS.labels(mode).observe(calls)
+
+
+def observe_rate_limit_wait(service: str, seconds: float) -> None:
+    """記錄請求因共用速率限制而等待的時間"""
+    RATE_LIMIT_WAIT.labels(service).observe(seconds)
+
+
+def _registry() -> CollectorRegistry:
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_latest() -> bytes:
+    """輸出 Prometheus 文字格式"""
+    return generate_latest(_registry())
+
+
+def reset_multiproc_dir() -> None:
+    """清除上次執行殘留的 Multiprocess 指標檔 (僅能於啟動時、子 Process 建立前呼叫)"""
+    if not MULTIPROC_DIR:
+        return
+    shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def start_metrics_server(port: int) -> None:
+    """啟動獨立的 /metrics HTTP Server (Celery Worker 使用)"""
+    start_http_server(port, registry=_registry())
+    logger.info(f"Metrics server listening on :{port}")
+
+
+def mark_process_dead(pid: int) -> None:
+    """子 Process 結束時清理其 live gauge 檔案"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
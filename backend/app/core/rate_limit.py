@@ -1,13 +1,10 @@
 import time
-import redis
 from fastapi import Request, HTTPException
 from app.config import get_settings
+from app.core.redis_client import redis_client
 
 settings = get_settings()
 
-# Initialize Redis client (using same URL as Celery)
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-
 class RateLimiter:
     """
     Redis 滑動視窗限流器
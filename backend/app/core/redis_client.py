@@ -0,0 +1,10 @@
+"""
+Redis Client
+Web 與 Worker 共用的 Redis 連線 (與 Celery 使用相同 URL)
+"""
+import redis
+from app.config import get_settings
+
+settings = get_settings()
+
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
@@ -2,6 +2,7 @@
 Security Utilities
 提供資料加密與解密功能，確保傳輸安全性。
 """
+import hashlib
 import json
 from base64 import b64encode, b64decode
 from typing import Dict, Any
@@ -9,6 +10,7 @@ from typing import Dict, Any
 from cryptography.fernet import Fernet
 from app.config import get_settings
 from app.core.logger import get_logger
+from app.schemas.context import UserContext, AuthType
 
 settings = get_settings()
 logger = get_logger(__name__)
@@ -59,3 +61,13 @@ class TaskSecurity:
         except Exception as e:
             logger.error(f"Payload decryption failed: {e}")
             raise
+
+    @staticmethod
+    def owner_of(context: UserContext) -> str:
+        """
+        資源擁有者識別 (任務進度、可續傳上傳)
+
+        Admin 共用同一識別，Demo 以 Notion Token 區分；僅存雜湊，不保存 Token 本身。
+        """
+        identity = "admin" if context.type == AuthType.ADMIN else f"demo:{context.notion_token}"
+        return hashlib.sha256(identity.encode()).hexdigest()
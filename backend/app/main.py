@@ -2,17 +2,25 @@
 FastAPI Main Application
 Siri-Notion Backend
 """
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, FileResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 import os
+import time
+from typing import Any, Callable, Optional
 
-from app.routes import voice_note
+from app.routes import voice_note, upload
 from app.config import get_settings
+from app.core.dependencies import get_authenticated_context
+from app.schemas.context import UserContext, AuthType
 from app.core.logger import get_logger
+from app.core.metrics import CONTENT_TYPE_LATEST, observe_upload, render_latest
+from app.services.transcript_cache import TranscriptCache
+from app.services.model_policy import model_usage
+from app.services.template_predictor import speculation_stats
 
 logger = get_logger(__name__)
 settings = get_settings()
@@ -58,8 +66,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def upload_metrics(request: Request, call_next):
+    """記錄上傳端點的處理時間 (含接收檔案內容，包含可續傳上傳的 Chunk 與 finalize)"""
+    if request.method not in ("POST", "PATCH") or not request.url.path.startswith(("/api/v1/note", "/api/v1/upload")):
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    # 以路由樣板作為 Label，避免路徑參數造成 Label 爆量
+    route = request.scope.get("route")
+    observe_upload(getattr(route, "path", request.url.path), response.status_code, time.perf_counter() - start)
+    return response
+
+
 # 註冊路由
 app.include_router(voice_note.router)
+app.include_router(upload.router)
 
 # Mount Static Files (for Demo Page)
 static_dir = os.path.join(os.path.dirname(__file__), "static")
@@ -87,3 +109,34 @@ async def demo_page():
 async def health():
     """健康檢查"""
     return {"status": "healthy"}
+
+
+def _read_stats(name: str, reader: Callable[[], Any]) -> Optional[Any]:
+    """讀取單項統計，Redis 無法使用時回傳 None 而非讓整個請求失敗"""
+    try:
+        return reader()
+    except Exception as e:
+        logger.warning(f"Failed to read {name} stats: {e}")
+        return None
+
+
+@app.get("/stats")
+def stats(context: UserContext = Depends(get_authenticated_context)):
+    """
+    處理統計 (逐字稿快取命中率、各 Whisper 模型使用次數、推測式摘要命中率)
+
+    僅限 Admin；以一般函式定義，Redis 讀取於 Threadpool 執行，不阻塞 Event Loop。
+    """
+    if context.type != AuthType.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin only")
+    return {
+        "transcript_cache": _read_stats("transcript cache", TranscriptCache.stats),
+        "stt_models": _read_stats("model usage", model_usage),
+        "speculative_summary": _read_stats("speculation", speculation_stats),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指標 (上傳處理時間等；Pipeline 階段指標由 Worker 的 METRICS_WORKER_PORT 輸出)"""
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,126 @@
+"""
+Resumable Upload Routes
+可續傳分段上傳 API (長錄音 / 不穩定的行動網路)
+"""
+import uuid
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Depends, Header
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.voice_note import VoiceNoteResponse, UploadSessionResponse
+from app.worker.tasks import enqueue_voice_note
+from app.core.logger import get_logger
+from app.config import get_settings
+from app.core.dependencies import get_user_context, get_authenticated_context
+from app.schemas.context import UserContext
+from app.core.security import TaskSecurity
+from app.services.resumable_upload import UploadSession
+from app.services.audio_decoder import write_pcm_sidecar
+from app.services.audio_validator import probe_audio_duration
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["Resumable Upload"]
+)
+
+
+def _get_session(upload_id: str, context: UserContext) -> UploadSession:
+    try:
+        uuid.UUID(upload_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="無效的 Upload ID")
+
+    session = UploadSession.load(upload_id)
+    # 非建立者一律視為不存在，避免洩漏其他使用者的上傳
+    if session is None or session.owner != TaskSecurity.owner_of(context):
+        raise HTTPException(status_code=404, detail="找不到此上傳或已過期")
+    return session
+
+
+@router.post("/upload", response_model=UploadSessionResponse, status_code=201)
+async def create_upload(
+    upload_length: Optional[int] = Header(None, alias="Upload-Length"),
+    context: UserContext = Depends(get_user_context)
+):
+    """
+    建立可續傳上傳 Session
+
+    驗證方式與 /note/ios 相同；後續請求須帶相同的驗證 Header，
+    僅限建立者存取 (Demo 模式的限流僅於建立時計算一次)。
+
+    Headers:
+    - Upload-Length: 檔案總大小 (選用，finalize 時檢查是否完整)
+    """
+    encrypted_context = TaskSecurity.encrypt_payload(context.model_dump())
+    session = await run_in_threadpool(UploadSession.create, encrypted_context, TaskSecurity.owner_of(context), upload_length)
+    return UploadSessionResponse(upload_id=session.upload_id, offset=0, length=session.length)
+
+
+@router.get("/upload/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_offset(
+    upload_id: str,
+    context: UserContext = Depends(get_authenticated_context)
+):
+    """查詢目前 Offset (連線中斷後由此處續傳)"""
+    session = _get_session(upload_id, context)
+    return UploadSessionResponse(upload_id=upload_id, offset=session.offset, length=session.length)
+
+
+@router.patch("/upload/{upload_id}", response_model=UploadSessionResponse)
+async def append_upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    context: UserContext = Depends(get_authenticated_context)
+):
+    """
+    上傳一段 Chunk (Request Body 為原始二進位資料)
+
+    Headers:
+    - Upload-Offset: 此 Chunk 的起始位置，須等於目前 Offset，否則回傳 409
+    """
+    session = _get_session(upload_id, context)
+    offset = await session.append(upload_offset, request.stream())
+    return UploadSessionResponse(upload_id=upload_id, offset=offset, length=session.length)
+
+
+@router.post("/upload/{upload_id}/finalize", response_model=VoiceNoteResponse, status_code=202)
+async def finalize_upload(
+    upload_id: str,
+    context: UserContext = Depends(get_authenticated_context)
+):
+    """
+    完成上傳並發送處理任務
+
+    檢查檔案完整性與格式 (Magic Number)，回傳與 /note 相同的 task_id。
+    可安全重送：已完成的上傳回傳同一個 task_id，不會重複處理。
+    """
+    session = _get_session(upload_id, context)
+
+    def process(file_path: str) -> str:
+        # ⏱️ 由容器標頭取得音訊長度 (不解碼)，供排程與模型選擇使用
+        duration = probe_audio_duration(file_path)
+
+        # 🎚️ 預先解碼為 16 kHz PCM (選用)，Worker 可直接 mmap 使用
+        if settings.AUDIO_PREDECODE_ENABLED:
+            write_pcm_sidecar(file_path)
+
+        # 🚀 發送 Celery Pipeline (使用建立 Session 時的 Context)
+        task = enqueue_voice_note(file_path, session.encrypted_context, duration=duration, owner=session.owner)
+        logger.info(f"Task enqueued (resumable): {task.id}")
+        return task.id
+
+    try:
+        task_id = await run_in_threadpool(session.finalize, process)
+        return VoiceNoteResponse(
+            message="已收到，開始處理",
+            task_id=task_id
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload (resumable) failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="上傳失敗")
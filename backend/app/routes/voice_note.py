@@ -2,17 +2,20 @@
 Voice Note Routes
 處理語音筆記上傳 API
 """
-import os
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Depends
-from app.schemas.voice_note import VoiceNoteResponse
-from app.worker.tasks import process_voice_note
+from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.voice_note import VoiceNoteResponse, TaskStatusResponse
+from app.worker.tasks import enqueue_voice_note
+from app.core.celery_app import celery_app
 from app.core.logger import get_logger
 from app.config import get_settings
-from app.services.audio_validator import validate_audio_format, validate_file_size, MAX_FILE_SIZE
-from app.core.dependencies import get_user_context
+from app.services.upload_service import save_upload_stream, iter_multipart_file
+from app.core.dependencies import get_user_context, get_authenticated_context
 from app.schemas.context import UserContext
 from app.core.security import TaskSecurity
+from app.services.progress_service import TaskProgress
+from app.services.audio_decoder import write_pcm_sidecar
 
 logger = get_logger(__name__)
 settings = get_settings()
@@ -23,9 +26,26 @@ router = APIRouter(
 )
 
 
-@router.post("/note", response_model=VoiceNoteResponse, status_code=202)
+# 表單於 Handler 內串流解析，以 openapi_extra 保留文件中的檔案欄位
+NOTE_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["audio"],
+                    "properties": {"audio": {"type": "string", "format": "binary", "description": "音訊檔案"}},
+                }
+            }
+        },
+    }
+}
+
+
+@router.post("/note", response_model=VoiceNoteResponse, status_code=202, openapi_extra=NOTE_FORM_SCHEMA)
 async def upload_voice_note(
-    audio: UploadFile = File(..., description="音訊檔案"),
+    request: Request,
     context: UserContext = Depends(get_user_context)
 ):
     """
@@ -43,35 +63,25 @@ async def upload_voice_note(
     - 第三方整合（需搭配 OAuth/JWT）
     
     安全機制:
-    - 檔案大小限制 (25MB)
-    - Magic Number 格式驗證
+    - 檔案大小限制 (25MB，串流寫入時逐 Chunk 檢查)
+    - Magic Number 格式驗證 (第一個 Chunk)
+    - 直接解析 Request 串流，不先將整個表單暫存至磁碟
     """
     try:
-        # 📦 讀取檔案內容
-        content = await audio.read()
-        
-        if not content:
-            raise HTTPException(status_code=400, detail="未收到音訊資料")
-        
-        # 📏 檢查檔案大小
-        validate_file_size(content)
-        
-        # 🔍 驗證音訊格式 (Magic Number)
-        file_ext = validate_audio_format(content)
-        
-        # 💾 儲存檔案
-        file_id = str(uuid.uuid4()) # 防止路徑注入攻擊
-        file_path = f"/data/{file_id}{file_ext}"
-        
-        os.makedirs("/data", mode=0o700, exist_ok=True)  # 限制目錄權限為僅擁有者可存取
-        with open(file_path, "wb") as f:
-            f.write(content)
+        # 💾 串流解析表單並寫入檔案 (驗證格式與大小並由容器標頭推算長度，記憶體用量固定)
+        file_path, duration = await save_upload_stream(iter_multipart_file(request, "audio"))
         
         logger.info(f"Audio file saved (standard): {file_path}, Auth: {context.type}")
         
-        # 🚀 發送 Celery 任務 (傳遞加密後的 Context)
+        # 🎚️ 預先解碼為 16 kHz PCM (選用)，Worker 可直接 mmap 使用
+        if settings.AUDIO_PREDECODE_ENABLED:
+            await run_in_threadpool(write_pcm_sidecar, file_path)
+        
+        # 🚀 發送 Celery Pipeline (傳遞加密後的 Context)
         encrypted_context = TaskSecurity.encrypt_payload(context.model_dump())
-        task = process_voice_note.delay(file_path, encrypted_context)
+        task = enqueue_voice_note(
+            file_path, encrypted_context, duration=duration, owner=TaskSecurity.owner_of(context)
+        )
         logger.info(f"Task enqueued: {task.id}")
         
         return VoiceNoteResponse(
@@ -98,8 +108,8 @@ async def upload_voice_note_ios(
     
     安全機制:
     - API Key 驗證 (X-API-Key header)
-    - 檔案大小限制 (25MB)
-    - Magic Number 格式驗證
+    - 檔案大小限制 (25MB，串流寫入時逐 Chunk 檢查)
+    - Magic Number 格式驗證 (第一個 Chunk)
     
     Shortcuts 設定:
     1. Request Body 選擇 File
@@ -109,31 +119,20 @@ async def upload_voice_note_ios(
     詳細設定請參考: docs/SIRI_INTEGRATION_DEMO.md 或 docs/SIRI_INTEGRATION_ADMIN.md
     """
     try:
-        # 📦 讀取檔案內容
-        content = await request.body()
-        
-        if not content:
-            raise HTTPException(status_code=400, detail="未收到音訊資料")
-        
-        # 📏 檢查檔案大小
-        validate_file_size(content)
-        
-        # 🔍 驗證音訊格式 (Magic Number)
-        file_ext = validate_audio_format(content)
-        
-        # 💾 儲存檔案
-        file_id = str(uuid.uuid4())  # 防止路徑注入攻擊
-        file_path = f"/data/{file_id}{file_ext}"
-        
-        os.makedirs("/data", mode=0o700, exist_ok=True)  # 限制目錄權限為僅擁有者可存取
-        with open(file_path, "wb") as f:
-            f.write(content)
+        # 💾 串流寫入檔案並推算音訊長度 (不將整個 Request Body 載入記憶體)
+        file_path, duration = await save_upload_stream(request.stream())
         
         logger.info(f"Audio file saved (iOS): {file_path}, Auth: {context.type}")
         
-        # 🚀 發送 Celery 任務 (傳遞加密後的 Context)
+        # 🎚️ 預先解碼為 16 kHz PCM (選用)，Worker 可直接 mmap 使用
+        if settings.AUDIO_PREDECODE_ENABLED:
+            await run_in_threadpool(write_pcm_sidecar, file_path)
+        
+        # 🚀 發送 Celery Pipeline (傳遞加密後的 Context)
         encrypted_context = TaskSecurity.encrypt_payload(context.model_dump())
-        task = process_voice_note.delay(file_path, encrypted_context)
+        task = enqueue_voice_note(
+            file_path, encrypted_context, duration=duration, owner=TaskSecurity.owner_of(context)
+        )
         logger.info(f"Task enqueued: {task.id}")
         
         return VoiceNoteResponse(
@@ -146,3 +145,31 @@ async def upload_voice_note_ios(
     except Exception as e:
         logger.error(f"Upload (iOS) failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="上傳失敗")
+
+
+@router.get("/task/{task_id}", response_model=TaskStatusResponse)
+def get_task_status(
+    task_id: str,
+    context: UserContext = Depends(get_authenticated_context)
+):
+    """
+    查詢任務處理狀態
+
+    回傳目前階段、進度與部分逐字稿，讓客戶端與監控不必透過 Notion 判斷任務是否卡住。
+
+    安全機制:
+    - 需帶與上傳時相同的驗證 Header (不計入 Demo 限流)
+    - 僅上傳者可查詢；其他使用者與不存在的任務一律回傳 404
+    """
+    try:
+        uuid.UUID(task_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="無效的 Task ID")
+
+    # 以進度紀錄判斷任務是否存在及其擁有者 (Celery 對不存在的任務同樣回傳 PENDING)
+    progress = TaskProgress.get(task_id)
+    if progress is None or progress.pop("owner", None) != TaskSecurity.owner_of(context):
+        raise HTTPException(status_code=404, detail="找不到此任務")
+
+    state = celery_app.AsyncResult(task_id).state
+    return TaskStatusResponse(task_id=task_id, state=state, **progress)
@@ -2,6 +2,7 @@
 Voice Note Schema
 API 請求/回應的資料結構
 """
+from typing import Optional
 from pydantic import BaseModel
 
 
@@ -9,3 +10,24 @@ class VoiceNoteResponse(BaseModel):
     """語音筆記回應"""
     message: str
     task_id: str
+
+
+class TaskStatusResponse(BaseModel):
+    """任務狀態回應"""
+    task_id: str
+    state: str  # Celery 任務狀態 (PENDING / STARTED / RETRY / SUCCESS / FAILURE)
+    stage: Optional[str] = None  # 處理階段 (queued / transcribing / syncing / routing / ...)
+    progress: float = 0.0  # 目前階段完成百分比 (0~100)
+    partial_text: Optional[str] = None  # 目前為止的逐字稿
+    duration: Optional[float] = None  # 音訊長度 (秒，由上傳時的容器標頭取得)
+    model: Optional[str] = None  # 負責轉錄的 Whisper 模型
+    title: Optional[str] = None
+    notion_url: Optional[str] = None
+    error: Optional[str] = None
+
+
+class UploadSessionResponse(BaseModel):
+    """可續傳上傳 Session 狀態"""
+    upload_id: str
+    offset: int  # 已接收的位元組數 (下一個 Chunk 的起點)
+    length: Optional[int] = None  # 建立時預告的檔案總大小
@@ -0,0 +1,133 @@
+"""
+Audio Decoder Service
+於 Ingest 階段將音訊解碼為 16 kHz 單聲道 PCM，並以可 Memory-map 的 .npy 存於原檔旁
+
+Web 端解碼一次後，Worker 直接 mmap 讀取陣列交給模型，省去每次轉錄的 ffmpeg 解碼成本。
+需要 av 與 numpy (poetry install --with ingest)，未安裝時此階段自動略過。
+"""
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import get_settings
+from app.core.logger import get_logger
+from app.utils.audio_chunking import SAMPLE_RATE
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+PCM_SUFFIX = ".pcm.npy"
+
+
+def pcm_sidecar_path(audio_path: str) -> str:
+    """取得音訊檔對應的 PCM 檔路徑 (/data/{uuid}.m4a -> /data/{uuid}.m4a.pcm.npy)"""
+    return f"{audio_path}{PCM_SUFFIX}"
+
+
+def has_pcm_sidecar(audio_path: str) -> bool:
+    return os.path.exists(pcm_sidecar_path(audio_path))
+
+
+def decode_to_pcm(audio_path: str, dtype: str = "float32") -> Any:
+    """
+    解碼並重新取樣為 16 kHz 單聲道 PCM
+
+    Args:
+        audio_path: 音訊檔案路徑 (M4A / MP3 / WAV ...)
+        dtype: float32 (範圍 -1~1，可零拷貝交給模型) 或 int16 (節省一半空間)
+
+    Returns:
+        一維 numpy 陣列
+    """
+    import av
+    import numpy as np
+
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    chunks = []
+    with av.open(audio_path, mode="r", metadata_errors="ignore") as container:
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+    # 取出 resampler 緩衝中剩餘的取樣
+    for resampled in resampler.resample(None):
+        chunks.append(resampled.to_ndarray().reshape(-1))
+
+    pcm = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+    if dtype == "int16":
+        return pcm
+    return pcm.astype(np.float32) / 32768.0
+
+
+def write_pcm_sidecar(audio_path: str) -> Optional[str]:
+    """
+    解碼音訊並寫入 PCM 檔 (Ingest 階段呼叫)
+
+    先寫入暫存檔再原子性改名，Worker 不會讀到寫入一半的檔案。
+    解碼失敗只記錄警告，Worker 會退回自行解碼。
+
+    Returns:
+        PCM 檔路徑；失敗時回傳 None
+    """
+    import numpy as np
+
+    target = pcm_sidecar_path(audio_path)
+    tmp_path = f"{target}.tmp"
+    try:
+        pcm = decode_to_pcm(audio_path, settings.AUDIO_PREDECODE_DTYPE)
+        with open(tmp_path, "wb") as f:
+            np.save(f, pcm)
+        os.replace(tmp_path, target)
+        logger.info(f"PCM sidecar written: {target} ({len(pcm) / SAMPLE_RATE:.1f}s, {pcm.dtype})")
+        return target
+    except Exception as e:
+        logger.warning(f"Failed to pre-decode {audio_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+
+def load_pcm(audio_path: str) -> Any:
+    """
+    取得 16 kHz float32 PCM (Worker 端)
+
+    若存在 PCM 檔則以 mmap 唯讀載入 (float32 為零拷貝，int16 需轉換一次)，
+    否則退回以 faster-whisper 解碼原始音訊。
+    """
+    import numpy as np
+
+    sidecar = pcm_sidecar_path(audio_path)
+    if os.path.exists(sidecar):
+        pcm = np.load(sidecar, mmap_mode="r")
+        if pcm.dtype == np.int16:
+            return pcm.astype(np.float32) / 32768.0
+        return pcm
+
+    from faster_whisper.audio import decode_audio
+
+    return decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+
+
+def trim_for_stt(pcm: Any) -> Tuple[Any, Optional[Dict[str, float]]]:
+    """
+    依設定移除靜音 (STT_TRIM_SILENCE)
+
+    Returns:
+        (處理後的 PCM, 移除秒數報告；未啟用時為 None)
+    """
+    if not settings.STT_TRIM_SILENCE:
+        return pcm, None
+
+    from app.utils.silence_trim import trim_silence
+
+    return trim_silence(
+        pcm,
+        threshold_db=settings.STT_TRIM_THRESHOLD_DB,
+        min_gap_seconds=settings.STT_TRIM_MIN_GAP_SECONDS,
+        keep_gap_seconds=settings.STT_TRIM_KEEP_GAP_SECONDS
+    )
+
+
+def remove_pcm_sidecar(audio_path: str) -> None:
+    """刪除 PCM 檔 (任務完成清理時呼叫)"""
+    sidecar = pcm_sidecar_path(audio_path)
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
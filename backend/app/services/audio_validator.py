@@ -2,11 +2,25 @@
 Audio Validation Service
 音訊檔案驗證服務
 """
+import os
+import struct
+from typing import BinaryIO, Optional, Tuple
+
 from fastapi import HTTPException
 
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
 # 檔案大小限制
 MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB (支援約 20 分鐘高品質錄音)
 
+# 驗證格式需要的檔頭長度 (WebM 的 DocType 位於 EBML 標頭內)
+HEADER_BYTES = 64
+
+# OGG 內的音訊 Codec 識別標頭 (排除 Theora 等影像串流)
+OGG_AUDIO_CODECS = (b'OpusHead', b'\x01vorbis', b'\x7fFLAC')
+
 
 def validate_audio_format(content: bytes) -> str:
     """
@@ -18,13 +32,16 @@ def validate_audio_format(content: bytes) -> str:
     支援格式:
     - M4A: 00 00 00 ?? 66 74 79 70 4D 34 41 (ftyp 之後是 M4A)
     - WAV: 52 49 46 46 (RIFF)
-    - MP3: FF FB / FF F3 / FF F2 (MPEG Audio Frame Sync)
+    - MP3: FF FB / FF F3 / FF F2 (MPEG Audio Frame Sync) 或 49 44 33 (ID3v2 標籤)
+    - OGG: 4F 67 67 53 (OggS，第一頁為 Opus / Vorbis / FLAC 識別標頭)
+    - WebM: 1A 45 DF A3 (EBML)，DocType 為 webm
+    - FLAC: 66 4C 61 43 (fLaC)
     
     Args:
         content: 檔案二進位內容
         
     Returns:
-        str: 驗證後的副檔名 (.m4a, .wav, .mp3)
+        str: 驗證後的副檔名 (.m4a, .wav, .mp3, .ogg, .webm, .flac)
         
     Raises:
         HTTPException: 若格式不支援或檔案損壞
@@ -45,14 +62,28 @@ def validate_audio_format(content: bytes) -> str:
     if content.startswith(b'RIFF') and b'WAVE' in content[:12]:
         return '.wav'
     
-    # MP3 格式檢查 (MPEG Frame Sync)
-    if content[:2] in [b'\xff\xfb', b'\xff\xf3', b'\xff\xf2']:
+    # MP3 格式檢查 (MPEG Frame Sync，或開頭為 ID3v2 標籤)
+    if content[:2] in [b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'] or content.startswith(b'ID3'):
         return '.mp3'
     
+    # OGG 格式檢查 (第一頁 27 bytes 標頭 + 1 byte 區段表之後為 Codec 識別標頭)
+    # 不足以容納識別標頭的內容無法判斷是否為音訊串流，一律拒絕
+    if content.startswith(b'OggS') and len(content) >= 36:
+        if content[28:36].startswith(OGG_AUDIO_CODECS):
+            return '.ogg'
+    
+    # WebM 格式檢查 (EBML 標頭內的 DocType)
+    if content.startswith(b'\x1a\x45\xdf\xa3') and b'webm' in content[:HEADER_BYTES]:
+        return '.webm'
+    
+    # FLAC 格式檢查
+    if content.startswith(b'fLaC'):
+        return '.flac'
+    
     # 不支援的格式
     raise HTTPException(
         status_code=400,
-        detail="不支援的音訊格式 (僅支援 M4A/WAV/MP3)"
+        detail="不支援的音訊格式 (僅支援 M4A/WAV/MP3/OGG/WebM/FLAC)"
     )
 
 
@@ -72,3 +103,311 @@ def validate_file_size(content: bytes) -> None:
             status_code=413,
             detail=f"檔案過大 (最大 {MAX_FILE_SIZE // 1024 // 1024}MB)"
         )
+
+
+def probe_audio_duration(file_path: str) -> Optional[float]:
+    """
+    開啟已存檔的音訊並推算長度 (見 probe_duration)
+
+    上傳串流寫入時已由 save_upload_stream 直接推算，此函式用於僅有檔案路徑的情境。
+
+    Args:
+        file_path: 音訊檔案路徑
+
+    Returns:
+        音訊長度 (秒)；無法判斷時回傳 None
+    """
+    try:
+        with open(file_path, "rb") as f:
+            file_ext = validate_audio_format(f.read(HEADER_BYTES))
+            return probe_duration(f, file_ext, os.fstat(f.fileno()).st_size)
+    except Exception as e:
+        logger.warning(f"Failed to probe duration of {file_path}: {e}")
+        return None
+
+
+def probe_duration(f: BinaryIO, file_ext: str, size: int) -> Optional[float]:
+    """
+    只讀取容器標頭推算音訊長度 (不解碼)
+
+    - M4A: moov/mvhd (或 trak/mdia/mdhd) 的 duration / timescale
+    - WAV: fmt 的 byte rate 與 data 區塊大小
+    - MP3: Xing / Info / VBRI 標頭的總 Frame 數，無標頭時以 CBR 位元率估算
+    - FLAC: STREAMINFO 的總取樣數 / 取樣率
+    - OGG: 最後一頁的 Granule Position (Opus 以 48 kHz 計並扣除 pre-skip)
+    - WebM: Segment/Info 的 Duration × TimecodeScale (瀏覽器錄音常未寫入，此時為 None)
+
+    Args:
+        f: 已開啟的檔案 (可讀取、可 seek)
+        file_ext: validate_audio_format 驗證後的副檔名
+        size: 檔案大小
+
+    Returns:
+        音訊長度 (秒)；無法判斷時回傳 None，由 Worker 解碼時取得
+    """
+    parser = _DURATION_PARSERS.get(file_ext)
+    if parser is None:
+        return None
+    try:
+        duration = parser(f, size)
+    except Exception as e:
+        logger.warning(f"Failed to probe {file_ext} duration: {e}")
+        return None
+
+    if duration is None or duration <= 0:
+        return None
+    return round(duration, 3)
+
+
+def _probe_mp4(f: BinaryIO, size: int) -> Optional[float]:
+    moov = _find_box(f, 0, size, b"moov")
+    if moov is None:
+        return None
+
+    mvhd = _find_box(f, *moov, b"mvhd")
+    duration = _read_mvhd(f, mvhd[0]) if mvhd else None
+    if duration:
+        return duration
+
+    # mvhd 未記錄長度時改讀第一個音軌的 mdhd
+    box = moov
+    for box_type in (b"trak", b"mdia", b"mdhd"):
+        box = _find_box(f, *box, box_type)
+        if box is None:
+            return None
+    return _read_mvhd(f, box[0])
+
+
+def _find_box(f: BinaryIO, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    """於 [start, end) 內尋找指定類型的 Box，回傳其內容範圍 (僅讀取各 Box 的 8~16 bytes 標頭)"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        box_size, current_type = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = end - offset
+        if box_size < header_size:
+            return None
+        if current_type == box_type:
+            return offset + header_size, min(offset + box_size, end)
+        offset += box_size
+    return None
+
+
+def _read_mvhd(f: BinaryIO, offset: int) -> Optional[float]:
+    """讀取 mvhd / mdhd 的 timescale 與 duration (兩者欄位配置相同)"""
+    f.seek(offset)
+    version = f.read(4)[0]
+    if version == 1:
+        timescale, duration = struct.unpack(">16xIQ", f.read(28))
+    else:
+        timescale, duration = struct.unpack(">8xII", f.read(16))
+    if not timescale:
+        return None
+    return duration / timescale
+
+
+def _probe_wav(f: BinaryIO, size: int) -> Optional[float]:
+    offset = 12
+    byte_rate = None
+    while offset + 8 <= size:
+        f.seek(offset)
+        chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+        if chunk_id == b"fmt ":
+            byte_rate = struct.unpack("<8xI", f.read(12))[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            # 串流錄音可能未回填 data 大小 (0 或 0xFFFFFFFF)
+            data_size = min(chunk_size, size - offset - 8) if chunk_size else size - offset - 8
+            return data_size / byte_rate
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+# MPEG Audio 位元率 (kbps)，依 (版本, Layer) 索引
+_MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+
+
+def _probe_mp3(f: BinaryIO, size: int) -> Optional[float]:
+    # 略過 ID3v2 標籤 (長度為 syncsafe integer)
+    f.seek(0)
+    audio_start = 0
+    tag = f.read(10)
+    if tag[:3] == b"ID3":
+        audio_start = 10 + ((tag[6] & 0x7F) << 21 | (tag[7] & 0x7F) << 14 | (tag[8] & 0x7F) << 7 | (tag[9] & 0x7F))
+
+    f.seek(audio_start)
+    frame = f.read(64)
+    header = struct.unpack(">I", frame[:4])[0]
+    if header >> 21 != 0x7FF:
+        return None
+
+    version = {0b11: 1, 0b10: 2, 0b00: 2.5}.get((header >> 19) & 0b11)
+    layer = {0b11: 1, 0b10: 2, 0b01: 3}.get((header >> 17) & 0b11)
+    bitrate_index = (header >> 12) & 0xF
+    sample_rate_index = (header >> 10) & 0b11
+    mono = (header >> 6) & 0b11 == 0b11
+    if version is None or layer is None or sample_rate_index == 3:
+        return None
+
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    samples_per_frame = 384 if layer == 1 else 1152 if layer == 2 or version == 1 else 576
+
+    # Xing / Info 標頭位於 Side Information 之後
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    xing = frame[4 + side_info:]
+    if xing[:4] in (b"Xing", b"Info") and struct.unpack(">I", xing[4:8])[0] & 0x1:
+        frames = struct.unpack(">I", xing[8:12])[0]
+        return frames * samples_per_frame / sample_rate
+
+    # VBRI 標頭固定位於 Frame 標頭後 32 bytes
+    vbri = frame[36:]
+    if vbri[:4] == b"VBRI":
+        frames = struct.unpack(">I", vbri[14:18])[0]
+        return frames * samples_per_frame / sample_rate
+
+    bitrate = _MP3_BITRATES[(min(version, 2), layer)][bitrate_index] * 1000
+    if not bitrate:
+        return None
+    return (size - audio_start) * 8 / bitrate
+
+
+def _probe_flac(f: BinaryIO, size: int) -> Optional[float]:
+    # STREAMINFO 必為第一個 Metadata Block：4 bytes 標頭後第 10 byte 起為
+    # 20 bits 取樣率 | 3 bits 聲道 | 5 bits 位元深度 | 36 bits 總取樣數
+    f.seek(4 + 4 + 10)
+    packed = struct.unpack(">Q", f.read(8))[0]
+    sample_rate = packed >> 44
+    total_samples = packed & ((1 << 36) - 1)
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+OGG_TAIL_BYTES = 64 * 1024  # 最後一頁必定位於檔尾 64 KB 內 (單頁上限約 64 KB)
+
+
+def _probe_ogg(f: BinaryIO, size: int) -> Optional[float]:
+    f.seek(28)
+    codec_header = f.read(19)
+    if codec_header.startswith(b"OpusHead"):
+        # Opus 的 Granule Position 一律以 48 kHz 計
+        sample_rate = 48000
+        pre_skip = struct.unpack("<H", codec_header[10:12])[0]
+    elif codec_header.startswith(b"\x01vorbis"):
+        sample_rate = struct.unpack("<I", codec_header[12:16])[0]
+        pre_skip = 0
+    else:
+        return None
+
+    tail_start = max(0, size - OGG_TAIL_BYTES)
+    f.seek(tail_start)
+    tail = f.read()
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail) or not sample_rate:
+        return None
+    granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+    if granule <= 0:
+        return None
+    return (granule - pre_skip) / sample_rate
+
+
+# Matroska / WebM 的 EBML Element ID (含長度標記位元)
+EBML_SEGMENT = 0x18538067
+EBML_INFO = 0x1549A966
+EBML_TIMECODE_SCALE = 0x2AD7B1
+EBML_DURATION = 0x4489
+EBML_CLUSTER = 0x1F43B675  # Info 必位於第一個 Cluster 之前
+EBML_DEFAULT_TIMECODE_SCALE = 1_000_000  # 奈秒
+
+
+def _read_vint(f: BinaryIO, keep_marker: bool) -> Tuple[Optional[int], int]:
+    """
+    讀取 EBML 可變長度整數
+
+    Returns:
+        (數值, 位元組數)；數值全為 1 (未知長度) 時回傳 None
+    """
+    first = f.read(1)
+    if not first:
+        raise EOFError("Truncated EBML element")
+    length = 9 - first[0].bit_length()
+    if length > 8:
+        raise ValueError("Invalid EBML variable-length integer")
+    rest = f.read(length - 1)
+    if len(rest) != length - 1:
+        raise EOFError("Truncated EBML element")
+    marker = 1 << (7 * length)
+    value = int.from_bytes(first + rest, "big")
+    if keep_marker:
+        return value, length
+    value -= marker
+    return (None if value == marker - 1 else value), length
+
+
+def _iter_ebml(f: BinaryIO, start: int, end: int):
+    """逐一列出 [start, end) 內的 EBML Element (ID, 內容起點, 內容長度或 None)"""
+    offset = start
+    while offset < end:
+        f.seek(offset)
+        element_id, id_length = _read_vint(f, keep_marker=True)
+        data_size, size_length = _read_vint(f, keep_marker=False)
+        data_start = offset + id_length + size_length
+        yield element_id, data_start, data_size
+        if data_size is None:
+            return
+        offset = data_start + data_size
+
+
+def _probe_webm(f: BinaryIO, size: int) -> Optional[float]:
+    for element_id, start, length in _iter_ebml(f, 0, size):
+        if element_id == EBML_SEGMENT:
+            segment = (start, size if length is None else min(start + length, size))
+            break
+    else:
+        return None
+
+    for element_id, start, length in _iter_ebml(f, *segment):
+        if element_id == EBML_CLUSTER:
+            return None
+        if element_id == EBML_INFO and length is not None:
+            info = (start, min(start + length, segment[1]))
+            break
+    else:
+        return None
+
+    scale, duration = EBML_DEFAULT_TIMECODE_SCALE, None
+    for element_id, start, length in _iter_ebml(f, *info):
+        if length is None:
+            break
+        f.seek(start)
+        if element_id == EBML_TIMECODE_SCALE and 0 < length <= 8:
+            scale = int.from_bytes(f.read(length), "big")
+        elif element_id == EBML_DURATION and length in (4, 8):
+            duration = struct.unpack(">f" if length == 4 else ">d", f.read(length))[0]
+    if duration is None:
+        return None
+    return duration * scale / 1e9
+
+
+_DURATION_PARSERS = {
+    ".m4a": _probe_mp4,
+    ".wav": _probe_wav,
+    ".mp3": _probe_mp3,
+    ".flac": _probe_flac,
+    ".ogg": _probe_ogg,
+    ".webm": _probe_webm,
+}
@@ -0,0 +1,54 @@
+"""
+Pipeline Checkpoint Service
+將每個 Stage 的結果以 Note ID 為 Key 存入 Redis，重試或重新投遞時略過已完成的 Stage
+"""
+import json
+from typing import Any, Dict, Optional
+
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+
+logger = get_logger(__name__)
+
+CHECKPOINT_TTL = 24 * 3600  # 檢查點保留 1 天 (與任務進度相同)
+
+
+class NoteCheckpoint:
+    """
+    單一語音筆記的 Stage 檢查點
+
+    存放於 Hash `note_checkpoint:{note_id}`，每個欄位為一個 Stage 的 JSON 結果
+    (transcript / page_tree / routing / summary / notion_write / notion / notified)。
+    notion_write 為 Notion 多個請求寫入的進度，Stage 重試時由此繼續。
+    讀寫失敗只記錄警告，退回重新執行該 Stage。
+    """
+
+    def __init__(self, note_id: str):
+        self.note_id = note_id
+        self.key = f"note_checkpoint:{note_id}"
+
+    def get(self, stage: str) -> Optional[Any]:
+        """讀取 Stage 結果，不存在時回傳 None"""
+        try:
+            raw = redis_client.hget(self.key, stage)
+        except Exception as e:
+            logger.warning(f"Failed to read checkpoint '{stage}' for note {self.note_id}: {e}")
+            return None
+        if raw is None:
+            return None
+        logger.info(f"Stage '{stage}' restored from checkpoint for note {self.note_id}")
+        return json.loads(raw)
+
+    def save(self, stage: str, result: Any) -> None:
+        """寫入 Stage 結果並更新 TTL"""
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(self.key, stage, json.dumps(result, ensure_ascii=False))
+            pipe.expire(self.key, CHECKPOINT_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to save checkpoint '{stage}' for note {self.note_id}: {e}")
+
+    def all(self) -> Dict[str, Any]:
+        """讀取所有已完成 Stage 的結果"""
+        return {stage: json.loads(raw) for stage, raw in redis_client.hgetall(self.key).items()}
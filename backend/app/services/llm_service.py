@@ -1,21 +1,37 @@
 """
 LLM Service - Gemini
 兩階段 LLM：路由判斷 + 依模板生成摘要
+(選用) 融合模式：單次呼叫同時回傳路由判斷與摘要
+(選用) 推測模式：以預測模板與路由判斷並行生成摘要
 """
+import hashlib
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from google import genai
 from google.genai import types
+from cachetools import TTLCache
 from app.config import get_settings
 from app.core.logger import get_logger
+from app.core.metrics import track_external
 from app.prompts.routing import ROUTING_PROMPT
+from app.prompts.fused import FUSED_PROMPT
 from app.schemas.context import UserContext, AuthType
 
 settings = get_settings()
 logger = get_logger(__name__)
 
+# 路由需穩定輸出 (0.0)；摘要沿用原本的生成風格 (1.0)，合併呼叫也使用摘要的設定以免改變摘要風格
+ROUTING_TEMPERATURE = 0.0
+SUMMARY_TEMPERATURE = 1.0
+
+# Gemini Client 快取 (Key 為雜湊後的 API Key)，同一 Process 內的任務共用連線
+_gemini_clients = TTLCache(maxsize=100, ttl=1800)
+_gemini_clients_lock = threading.Lock()  # TTLCache 非執行緒安全 (io Worker 以 threads 執行)
+
 # Schema：路由判斷
 ROUTING_SCHEMA = genai.types.Schema(
     type=genai.types.Type.OBJECT,
@@ -46,6 +62,21 @@ ROUTING_SCHEMA = genai.types.Schema(
     },
 )
 
+# Schema：融合模式 (路由欄位 + 摘要)
+FUSED_SCHEMA = genai.types.Schema(
+    type=genai.types.Type.OBJECT,
+    required=ROUTING_SCHEMA.required + ["summary"],
+    properties={
+        **ROUTING_SCHEMA.properties,
+        "summary": genai.types.Schema(
+            type=genai.types.Type.STRING,
+            description="依 template_type 對應模板格式撰寫的 Markdown 摘要",
+        ),
+    },
+)
+
+TEMPLATE_TYPES = ROUTING_SCHEMA.properties["template_type"].enum
+
 
 class LLMService:
     """Large Language Model Service - 兩階段架構"""
@@ -60,10 +91,21 @@ class LLMService:
             api_key = settings.GEMINI_API_KEY
             self.is_demo = False
 
-        self.client = genai.Client(api_key=api_key)
+        self.client = self._get_client(api_key)
         self.templates_dir = Path(__file__).parent.parent / "prompts" / "templates"
         logger.info(f"Gemini client initialized (Mode: {'Demo' if self.is_demo else 'Admin'})")
     
+    @staticmethod
+    def _get_client(api_key: str) -> genai.Client:
+        """取得 (或建立並快取) 指定 API Key 的 Gemini Client"""
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        with _gemini_clients_lock:
+            client = _gemini_clients.get(key_hash)
+            if client is None:
+                client = genai.Client(api_key=api_key)
+                _gemini_clients[key_hash] = client
+        return client
+    
     def route(
         self, 
         transcript: str, 
@@ -104,14 +146,15 @@ class LLMService:
             config = types.GenerateContentConfig(
                 response_mime_type="application/json",
                 response_schema=ROUTING_SCHEMA,
-                temperature=0.0
+                temperature=ROUTING_TEMPERATURE
             )
             
-            response = self.client.models.generate_content(
-                model="gemini-flash-lite-latest",
-                contents=contents,
-                config=config
-            )
+            with track_external("gemini", "route"):
+                response = self.client.models.generate_content(
+                    model="gemini-flash-lite-latest",
+                    contents=contents,
+                    config=config
+                )
             
             result = json.loads(response.text)
             logger.info(f"Routing result: {result}")
@@ -122,6 +165,24 @@ class LLMService:
             logger.error(f"LLM routing failed: {e}", exc_info=True)
             raise
     
+    def _load_template(self, template_type: str) -> str:
+        """載入摘要模板，不存在時使用 general"""
+        template_path = self.templates_dir / f"{template_type}.md"
+        if not template_path.exists():
+            logger.warning(f"Template {template_type} not found, using general")
+            template_path = self.templates_dir / "general.md"
+        
+        with open(template_path, "r", encoding="utf-8") as f:
+            return f.read()
+    
+    def _load_spec(self) -> str:
+        """載入共用的摘要與 Markdown 規範"""
+        markdown_spec_path = self.templates_dir / "_spec.md"
+        if not markdown_spec_path.exists():
+            return ""
+        with open(markdown_spec_path, "r", encoding="utf-8") as f:
+            return f.read()
+    
     def summarize(self, transcript: str, template_type: str) -> str:
         """
         LLM Stage 2: 依模板生成摘要
@@ -134,24 +195,8 @@ class LLMService:
             摘要內容（依模板格式）
         """
         try:
-            # 載入模板
-            template_path = self.templates_dir / f"{template_type}.md"
-            if not template_path.exists():
-                logger.warning(f"Template {template_type} not found, using general")
-                template_path = self.templates_dir / "general.md"
-            
-            with open(template_path, "r", encoding="utf-8") as f:
-                template = f.read()
-            
-            # 載入共用的規範
-            markdown_spec_path = self.templates_dir / "_spec.md"
-            markdown_spec = ""
-            if markdown_spec_path.exists():
-                with open(markdown_spec_path, "r", encoding="utf-8") as f:
-                    markdown_spec = f.read()
-            
             # 組合：原模板 + 規範
-            full_template = template + "\n" + markdown_spec
+            full_template = self._load_template(template_type) + "\n" + self._load_spec()
             
             prompt = full_template.format(transcript=transcript)
             
@@ -161,14 +206,15 @@ class LLMService:
             )]
             
             config = types.GenerateContentConfig(
-                temperature=1.0
+                temperature=SUMMARY_TEMPERATURE
             )
             
-            response = self.client.models.generate_content(
-                model="gemini-flash-lite-latest",
-                contents=contents,
-                config=config
-            )
+            with track_external("gemini", "summarize"):
+                response = self.client.models.generate_content(
+                    model="gemini-flash-lite-latest",
+                    contents=contents,
+                    config=config
+                )
             
             summary = response.text
             logger.info(f"Summary generated using template: {template_type}")
@@ -178,3 +224,133 @@ class LLMService:
         except Exception as e:
             logger.error(f"LLM summarization failed: {e}", exc_info=True)
             raise
+    
+    def route_and_summarize(
+        self,
+        transcript: str,
+        page_tree: Dict[str, List[Dict[str, str]]]
+    ) -> Tuple[Dict, str]:
+        """
+        融合模式：單次呼叫同時完成路由判斷與摘要
+        
+        回應未通過驗證時退回兩階段：路由有效則只補呼叫 summarize (沿用路由決策)，
+        否則重新執行 route + summarize。
+        
+        Args:
+            transcript: 語音逐字稿
+            page_tree: { "roots": [], "subpages": [] }
+            
+        Returns:
+            (路由結果, 摘要內容)
+        """
+        result = {}
+        try:
+            prompt = FUSED_PROMPT.format(
+                transcript=transcript,
+                roots=self._format_pages(page_tree.get("roots", [])),
+                subpages=self._format_pages(page_tree.get("subpages", [])),
+                templates=self._template_formats(),
+                spec=self._load_spec()
+            )
+            
+            contents = [types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=prompt)]
+            )]
+            
+            config = types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=FUSED_SCHEMA,
+                temperature=SUMMARY_TEMPERATURE
+            )
+            
+            with track_external("gemini", "route_and_summarize"):
+                response = self.client.models.generate_content(
+                    model="gemini-flash-lite-latest",
+                    contents=contents,
+                    config=config
+                )
+            
+            result = json.loads(response.text)
+        except Exception as e:
+            logger.warning(f"Fused LLM call failed, falling back to two-stage: {e}")
+        
+        if not self._valid_routing(result, page_tree):
+            logger.warning("Fused routing failed validation, falling back to two-stage")
+            routing = self.route(transcript, page_tree)
+            return routing, self.summarize(transcript, routing.get("template_type", "general"))
+        
+        summary = result.pop("summary", "")
+        logger.info(f"Routing result (fused): {result}")
+        if not (isinstance(summary, str) and summary.strip()):
+            # 路由有效但缺少摘要：沿用路由決策，只補生成摘要
+            logger.warning("Fused summary missing, summarizing separately")
+            summary = self.summarize(transcript, result["template_type"])
+        
+        return result, summary
+    
+    def route_with_speculation(
+        self,
+        transcript: str,
+        page_tree: Dict[str, List[Dict[str, str]]],
+        predicted_template: str
+    ) -> Tuple[Dict, str]:
+        """
+        推測式摘要：以預測模板執行 summarize，同時進行 route
+        
+        路由選用的模板與預測相同時直接採用推測的摘要；
+        不同時捨棄並以正確模板重新生成 (路由決策優先)。
+        
+        Args:
+            transcript: 語音逐字稿
+            page_tree: { "roots": [], "subpages": [] }
+            predicted_template: 預測的模板類型
+            
+        Returns:
+            (路由結果, 摘要內容)
+        """
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            speculative = executor.submit(self.summarize, transcript, predicted_template)
+            routing = self.route(transcript, page_tree)
+            template_type = routing.get("template_type", "general")
+            
+            if template_type != predicted_template:
+                speculative.cancel()
+                logger.info(f"Speculative template miss ({predicted_template} -> {template_type}), re-summarizing")
+                return routing, self.summarize(transcript, template_type)
+            
+            try:
+                return routing, speculative.result()
+            except Exception as e:
+                logger.warning(f"Speculative summary failed, re-summarizing: {e}")
+                return routing, self.summarize(transcript, template_type)
+        finally:
+            # 預測錯誤時不等待推測中的摘要完成
+            executor.shutdown(wait=False)
+    
+    @staticmethod
+    def _format_pages(pages: List[Dict[str, str]]) -> str:
+        return "\n".join([f"- {p['title']} (ID: {p['id']})" for p in pages]) or "(無)"
+    
+    def _template_formats(self) -> str:
+        """取出各模板的「輸出格式」段落 (不含逐字稿佔位符)"""
+        sections = []
+        for template_type in TEMPLATE_TYPES:
+            template = self._load_template(template_type)
+            _, _, output_format = template.partition("## 輸出格式")
+            sections.append(f"## {template_type}\n{output_format.strip() or template}")
+        return "\n\n".join(sections)
+    
+    @staticmethod
+    def _valid_routing(result: Any, page_tree: Dict[str, List[Dict[str, str]]]) -> bool:
+        """驗證融合模式回傳的路由欄位：必填欄位、列舉值，以及目標 ID 存在於頁面樹"""
+        if not isinstance(result, dict) or any(field not in result for field in ROUTING_SCHEMA.required):
+            return False
+        if result["template_type"] not in TEMPLATE_TYPES:
+            return False
+        
+        candidates = {"create": page_tree.get("roots", []), "append": page_tree.get("subpages", [])}
+        if result["action"] not in candidates:
+            return False
+        return result["target_id"] in {page["id"] for page in candidates[result["action"]]}
@@ -0,0 +1,141 @@
+"""
+STT Model Policy
+依音訊長度、佇列深度與延遲 SLO 為每個任務選擇 Whisper 模型 (tiny / base / small)
+
+佇列積壓時改用較快但較粗略的模型，避免任務排隊數小時。
+"""
+import os
+from typing import Dict, List, Optional
+
+from app.config import get_settings
+from app.core.celery_app import PRIORITY_STEPS, PRIORITY_SEP
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+from app.services.stt_tuning import tuning_for
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+USAGE_KEY = "stt_model_usage"
+
+
+def estimate_latency(model_size: str, duration: float, queue_depth: int) -> float:
+    """
+    估計使用指定模型時，此任務從現在到完成的秒數
+
+    排隊等待 = (佇列深度 / 並行數) × 平均音訊長度 × RTF
+    轉錄時間 = 音訊長度 × RTF
+    (積壓時佇列中的任務同樣套用此策略，故等待時間以同一模型估算)
+    """
+    # 優先使用本機調校檔實測的 RTF
+    rtf = tuning_for(model_size).get("rtf") or settings.STT_MODEL_RTF.get(model_size, 1.0)
+    concurrency = max(1, settings.STT_POLICY_CONCURRENCY)
+    queue_wait = queue_depth / concurrency * settings.STT_POLICY_AVG_AUDIO_SECONDS * rtf
+    return queue_wait + duration * rtf
+
+
+def select_model(duration: float, queue_depth: int, candidates: Optional[List[str]] = None) -> str:
+    """
+    選擇在 SLO 內能完成的最準確模型，皆無法達成時使用最快的模型
+
+    Args:
+        duration: 音訊長度 (秒)
+        queue_depth: STT 佇列中等待的任務數
+        candidates: 由準確到快速排列的候選模型，預設為 STT_POLICY_MODELS
+
+    Returns:
+        模型大小
+    """
+    candidates = candidates or settings.stt_policy_models_list
+    for model_size in candidates:
+        if estimate_latency(model_size, duration, queue_depth) <= settings.STT_LATENCY_SLO_SECONDS:
+            return model_size
+    return candidates[-1]
+
+
+def stt_queue_depth(queues: Optional[List[str]] = None) -> int:
+    """
+    取得 STT 佇列中等待的任務數
+
+    Celery Redis Broker 以 List 儲存佇列，每個優先序各自一個 List
+    (`{queue}` 與 `{queue}:{priority}`)。
+
+    Args:
+        queues: 佇列名稱，預設為 STT_POLICY_QUEUES
+    """
+    pipe = redis_client.pipeline()
+    for queue in queues or settings.stt_policy_queues_list:
+        for step in PRIORITY_STEPS:
+            pipe.llen(f"{queue}{PRIORITY_SEP}{step}" if step else queue)
+    return sum(pipe.execute())
+
+
+def probe_duration(audio_path: str) -> Optional[float]:
+    """
+    取得音訊長度 (秒)
+
+    優先使用 Ingest 產生的 PCM 檔長度，其次解析容器標頭，最後以 PyAV 讀取 Metadata (皆不需完整解碼)。
+    """
+    from app.services.audio_decoder import pcm_sidecar_path
+    from app.services.audio_validator import probe_audio_duration
+
+    sidecar = pcm_sidecar_path(audio_path)
+    try:
+        if os.path.exists(sidecar):
+            import numpy as np
+            from app.utils.audio_chunking import SAMPLE_RATE
+
+            return len(np.load(sidecar, mmap_mode="r")) / SAMPLE_RATE
+
+        duration = probe_audio_duration(audio_path)
+        if duration is not None:
+            return duration
+
+        import av
+
+        with av.open(audio_path, mode="r", metadata_errors="ignore") as container:
+            if container.duration:
+                return container.duration / av.time_base
+    except Exception as e:
+        logger.warning(f"Failed to probe audio duration for {audio_path}: {e}")
+    return None
+
+
+def choose_model_for(audio_path: str, duration: Optional[float] = None, queues: Optional[List[str]] = None) -> str:
+    """
+    為單一任務選擇模型並記錄使用次數
+
+    Args:
+        audio_path: 音訊檔案路徑
+        duration: 已知的音訊長度 (秒)，未提供時自行探測
+        queues: 此任務所在的佇列 (只計算同一通道的積壓)，預設為 STT_POLICY_QUEUES
+
+    Returns:
+        模型大小
+    """
+    if duration is None:
+        duration = probe_duration(audio_path)
+    if duration is None:
+        return settings.STT_MODEL_SIZE
+
+    try:
+        queue_depth = stt_queue_depth(queues)
+    except Exception as e:
+        logger.warning(f"Failed to read STT queue depth: {e}")
+        queue_depth = 0
+
+    model_size = select_model(duration, queue_depth)
+    logger.info(
+        f"Selected Whisper model '{model_size}' (duration {duration:.0f}s, queue depth {queue_depth}, "
+        f"estimated {estimate_latency(model_size, duration, queue_depth):.0f}s, SLO {settings.STT_LATENCY_SLO_SECONDS:.0f}s)"
+    )
+    try:
+        redis_client.hincrby(USAGE_KEY, model_size, 1)
+    except Exception as e:
+        logger.warning(f"Failed to record model usage: {e}")
+    return model_size
+
+
+def model_usage() -> Dict[str, int]:
+    """取得各模型被選用的次數"""
+    return {size: int(count) for size, count in redis_client.hgetall(USAGE_KEY).items()}
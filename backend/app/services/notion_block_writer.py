@@ -0,0 +1,187 @@
+"""
+Notion Block Writer
+將任意長度、任意深度的 Block 寫入 Notion，不受單次請求的限制
+
+Notion API 單次請求限制:
+- 每個 children 陣列最多 100 個 Block
+- 最多兩層巢狀 (Block → children → children)
+- 整個請求最多 1000 個 Block
+REFERENCE: https://developers.notion.com/reference/request-limits
+
+寫入策略 (盡量減少 Round Trip):
+- 每批最多 100 個頂層 Block；能在單次請求內完成的子 Block 直接內嵌
+- 超出限制的子 Block 於父 Block 建立後，以其 ID 另行 append (遞迴套用相同策略)
+- 所有請求依序送出 (一次一個)，每完成一個請求保存寫入進度，Task 重試時由該處繼續
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from notion_client import Client
+
+from app.core.logger import get_logger
+from app.utils.markdown_parser import NOTION_BLOCK_CHILDREN_LIMIT
+
+logger = get_logger(__name__)
+
+NOTION_NESTING_LIMIT = 2  # 單次請求可內嵌的巢狀層數
+NOTION_REQUEST_BLOCK_LIMIT = 1000  # 單次請求的 Block 總數上限
+
+Block = Dict[str, Any]
+# (父 Block ID, 尚待寫入的 Block)
+Job = Tuple[str, List[Block]]
+# 寫入進度 {"page": 已建立的頁面 {id, url} 或 None, "jobs": 尚待寫入的 [父 Block ID, Block]}
+WriteState = Dict[str, Any]
+
+
+def _children(block: Block) -> List[Block]:
+    return block.get(block["type"], {}).get("children") or []
+
+
+def _with_children(block: Block, children: List[Block]) -> Block:
+    """複製 Block 並替換其 children (不修改原 Block)"""
+    body = {k: v for k, v in block.get(block["type"], {}).items() if k != "children"}
+    if children:
+        body["children"] = children
+    return {**block, block["type"]: body}
+
+
+def _fits(block: Block, levels: int) -> bool:
+    """Block 與其所有子 Block 能否在剩餘 levels 層巢狀內一次寫入"""
+    children = _children(block)
+    if not children:
+        return True
+    if levels == 0 or len(children) > NOTION_BLOCK_CHILDREN_LIMIT:
+        return False
+    return all(_fits(child, levels - 1) for child in children)
+
+
+def _size(block: Block) -> int:
+    """Block 連同內嵌子 Block 的數量"""
+    return 1 + sum(_size(child) for child in _children(block))
+
+
+def _split(block: Block) -> Tuple[Block, List[Block]]:
+    """
+    拆分頂層 Block 為 (本次請求內嵌的部分, 建立後需另行 append 的子 Block)
+
+    子 Block 可整批內嵌時內嵌前 100 個 (例如超過 100 列的表格)，否則全部延後寫入。
+    """
+    children = _children(block)
+    if not children:
+        return block, []
+    head = children[:NOTION_BLOCK_CHILDREN_LIMIT]
+    if (
+        all(_fits(child, NOTION_NESTING_LIMIT - 1) for child in head)
+        and 1 + sum(_size(child) for child in head) <= NOTION_REQUEST_BLOCK_LIMIT
+    ):
+        return _with_children(block, head), children[NOTION_BLOCK_CHILDREN_LIMIT:]
+    return _with_children(block, []), children
+
+
+def _next_batch(blocks: List[Block], stop_on_deferred: bool = False) -> Tuple[List[Block], List[List[Block]], int]:
+    """
+    取出下一批頂層 Block
+
+    Args:
+        blocks: 待寫入的 Block
+        stop_on_deferred: 遇到需延後寫入子 Block 的 Block 即停止 (pages.create 不回傳 Block ID)
+
+    Returns:
+        (本批內嵌後的 Block, 各 Block 延後寫入的子 Block, 取出的頂層 Block 數)
+    """
+    batch, deferred = [], []
+    total = 0
+    for block in blocks[:NOTION_BLOCK_CHILDREN_LIMIT]:
+        inline, rest = _split(block)
+        if rest and stop_on_deferred:
+            break
+        size = _size(inline)
+        if batch and total + size > NOTION_REQUEST_BLOCK_LIMIT:
+            break
+        batch.append(inline)
+        deferred.append(rest)
+        total += size
+    return batch, deferred, len(batch)
+
+
+class NotionBlockWriter:
+    """
+    以最少 Round Trip 依序寫入 Block 的 Writer
+
+    尚待寫入的工作 (與已建立的頁面) 為可序列化的寫入進度，每完成一個請求即交給
+    on_progress 保存；寫入中斷後以 resume 從保存的進度繼續，不重複建立頁面或 append。
+    """
+
+    def __init__(self, client: Client, on_progress: Optional[Callable[[WriteState], None]] = None):
+        self.client = client
+        self.on_progress = on_progress
+        self.page: Optional[Dict[str, str]] = None
+        self.jobs: List[Job] = []
+
+    def create_page(self, parent: Dict[str, str], properties: Dict[str, Any], blocks: List[Block]) -> Dict[str, Any]:
+        """
+        建立頁面，可一次寫入的開頭部分隨 pages.create 送出
+
+        其餘 Block 排入待寫入工作，由 flush 寫入。
+
+        Returns:
+            pages.create 回傳的 Page 物件
+        """
+        batch, _, count = _next_batch(blocks, stop_on_deferred=True)
+        page = self.client.pages.create(parent=parent, properties=properties, children=batch)
+        self.page = {"id": page["id"], "url": page["url"]}
+        if count < len(blocks):
+            self.jobs.append((page["id"], blocks[count:]))
+        self._save()
+        return page
+
+    def append(self, block_id: str, blocks: List[Block]) -> None:
+        """於 block_id 末尾追加所有 Block"""
+        if blocks:
+            self.jobs.append((block_id, blocks))
+        self.flush()
+
+    def resume(self, state: WriteState) -> Optional[Dict[str, str]]:
+        """
+        從保存的寫入進度繼續寫入
+
+        Returns:
+            進度中記錄的頁面 ({id, url})，寫入既有頁面時為 None
+        """
+        self.page = state.get("page")
+        self.jobs = [(block_id, blocks) for block_id, blocks in state.get("jobs", [])]
+        logger.info(f"Resuming Notion write with {len(self.jobs)} pending jobs")
+        self.flush()
+        return self.page
+
+    def flush(self) -> None:
+        """
+        依序執行所有待寫入工作，每次一個請求
+
+        同一頁面的 append 不並行，避免 Notion 回傳 conflict_error 或打亂 Block 順序。
+        """
+        requests = 0
+        while self.jobs:
+            block_id, blocks = self.jobs[0]
+            follow_ups = self._append_batch(block_id, blocks)
+            self.jobs[:1] = follow_ups
+            requests += 1
+            self._save()
+        if requests:
+            logger.info(f"Wrote Notion blocks in {requests} append requests")
+
+    def _save(self) -> None:
+        if self.on_progress is not None:
+            self.on_progress({"page": self.page, "jobs": [list(job) for job in self.jobs]})
+
+    def _append_batch(self, block_id: str, blocks: List[Block]) -> List[Job]:
+        """寫入一批 Block，回傳後續工作 (延後的子 Block 在前，同一父 Block 的下一批在後)"""
+        batch, deferred, count = _next_batch(blocks)
+        response = self.client.blocks.children.append(block_id=block_id, children=batch)
+
+        created: List[Block] = response.get("results", [])
+        if any(deferred) and len(created) != len(batch):
+            raise RuntimeError(f"Expected {len(batch)} appended blocks, got {len(created)}")
+        jobs: List[Job] = [(result["id"], rest) for result, rest in zip(created, deferred) if rest]
+        if count < len(blocks):
+            jobs.append((block_id, blocks[count:]))
+        return jobs
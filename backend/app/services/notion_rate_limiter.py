@@ -0,0 +1,126 @@
+"""
+Notion Rate Limiter
+以 Redis Token Bucket 協調所有 Worker 對 Notion API 的請求速率 (Per Integration Token)
+
+- Notion 對每個 Integration 限制平均約 3 requests/second，超過時回傳 429 與 Retry-After
+- 每次請求前取得一個 Token，不足時等待補充 (加入少量 Jitter 錯開同時等待的請求)
+- 收到 429 時暫停整個 Bucket 至 Retry-After，所有 Worker 一起等待，
+  由呼叫層級短暫重試取代整個 Task 的分鐘級重試
+- 409 (conflict) 與 5xx 為單次請求的暫時性錯誤，僅該呼叫以指數退避等待
+- Redis 無法使用時不限制速率 (僅依 Retry-After 等待)
+"""
+import random
+import time
+from typing import Optional
+
+from app.config import get_settings
+from app.core.logger import get_logger
+from app.core.metrics import observe_rate_limit_wait
+from app.core.redis_client import redis_client
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+MAX_BACKOFF = 30.0  # 單次重試等待的上限 (秒)
+BASE_BACKOFF = 0.5  # 未提供 Retry-After 時的指數退避基數 (秒)
+
+# 回傳需等待的秒數 (0 表示已取得 Token)；暫停期間一律等待
+# 數值以字串回傳，避免 Lua number 轉為 Redis Integer 時被截斷
+_ACQUIRE_SCRIPT = """
+local pause = redis.call("pttl", KEYS[2])
+if pause > 0 then
+    return tostring(pause / 1000)
+end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call("time")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call("hmget", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("expire", KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class NotionRateGovernor:
+    """單一 Notion Integration Token 的共用速率限制"""
+
+    def __init__(self, token_hash: str):
+        self.key = f"notion_rate:{token_hash}"
+        self.pause_key = f"{self.key}:pause"
+
+    def acquire(self) -> float:
+        """
+        取得一次請求的配額，必要時阻塞等待
+
+        Returns:
+            等待的秒數
+        """
+        waited = 0.0
+        while True:
+            try:
+                wait = float(redis_client.eval(
+                    _ACQUIRE_SCRIPT, 2, self.key, self.pause_key,
+                    settings.NOTION_RATE_LIMIT_PER_SECOND,
+                    settings.NOTION_RATE_LIMIT_BURST,
+                ))
+            except Exception as e:
+                logger.warning(f"Notion rate limiter unavailable, sending request unthrottled: {e}")
+                break
+            if wait <= 0:
+                break
+            wait *= random.uniform(1.0, 1.2)
+            time.sleep(wait)
+            waited += wait
+
+        if waited:
+            observe_rate_limit_wait("notion", waited)
+        return waited
+
+    def backoff(self, retry_after: Optional[str], attempt: int) -> float:
+        """
+        收到 429 後暫停整個 Bucket
+
+        Args:
+            retry_after: Retry-After Header (秒)
+            attempt: 目前為第幾次重試 (從 0 開始)
+
+        Returns:
+            暫停的秒數 (下一次 acquire 會等待至暫停結束)
+        """
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = BASE_BACKOFF * 2 ** attempt
+        delay = min(max(delay, 0.0), MAX_BACKOFF) + random.uniform(0, BASE_BACKOFF)
+
+        try:
+            redis_client.set(self.pause_key, 1, px=max(1, int(delay * 1000)))
+        except Exception as e:
+            logger.warning(f"Failed to share Notion rate limit pause: {e}")
+            time.sleep(delay)
+        return delay
+
+
+def transient_backoff(attempt: int) -> float:
+    """
+    409 / 5xx 後等待再重試 (不暫停 Bucket，其他 Worker 不受影響)
+
+    Args:
+        attempt: 目前為第幾次重試 (從 0 開始)
+
+    Returns:
+        等待的秒數
+    """
+    delay = min(BASE_BACKOFF * 2 ** attempt, MAX_BACKOFF) + random.uniform(0, BASE_BACKOFF)
+    time.sleep(delay)
+    return delay
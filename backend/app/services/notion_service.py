@@ -3,22 +3,81 @@ Notion Service
 與 Notion API 互動：搜尋頁面、建立筆記
 """
 import hashlib
-from typing import List, Dict, Optional, Any
-from datetime import datetime, timedelta
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Any, Tuple
+from datetime import datetime, timedelta, timezone
 from notion_client import Client
-from cachetools import TTLCache
+from notion_client.errors import HTTPResponseError
 
 from app.config import get_settings
 from app.core.logger import get_logger
+from app.core.metrics import track_external, observe_page_tree_crawl
+from app.services.notion_block_writer import NotionBlockWriter, WriteState
+from app.services.notion_rate_limiter import NotionRateGovernor, transient_backoff
+from app.services.page_tree_cache import PageTreeCache
 from app.utils.markdown_parser import NotionMarkdownParser
 from app.schemas.context import UserContext, AuthType
 
 settings = get_settings()
 logger = get_logger(__name__)
 
-# 使用 TTLCache 防止記憶體洩漏 (1000 個 Token, TTL 30 分鐘)
-# Key 為雜湊後的 Token，Value 為 {"data": result, "expires_at": ...}
-_token_caches = TTLCache(maxsize=1000, ttl=1800)
+# blocks.children.list / search 單頁上限
+NOTION_PAGE_SIZE = 100
+
+# last_edited_time 僅精確到分鐘，增量更新時 Watermark 往前多取一段以免漏掉頁面
+WATERMARK_OVERLAP = 120
+
+# 409 (conflict_error) 與 5xx 僅對唯讀請求重試：寫入可能已於 Notion 端完成，
+# 重送會重複建立頁面或 append，改由 Stage 的 notion_write 檢查點繼續
+TRANSIENT_STATUS = {409, 500, 502, 503, 504}
+# 以 POST 送出但不修改資料的 Endpoint (已移除路徑中的 ID)
+READ_ONLY_POST_OPERATIONS = {"search", "databases/query"}
+
+# Notion 物件 ID (UUID，可能不含連字號)，統計時自路徑移除以避免 Label 爆量
+_ID_SEGMENT = re.compile(r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$")
+
+
+class InstrumentedClient(Client):
+    """
+    記錄每次 Notion API 呼叫次數與延遲的 Client (所有 Endpoint 皆經由 request)
+
+    每次請求先經過共用的速率限制，並於呼叫層級重試：
+    - 429 (請求未被處理)：所有請求皆重試，依 Retry-After 暫停整個 Bucket
+    - 409 / 5xx：僅唯讀請求重試 (本次呼叫退避)，寫入請求直接拋出
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        token_hash = hashlib.sha256((self.options.auth or "").encode()).hexdigest()
+        self.governor = NotionRateGovernor(token_hash)
+
+    def request(self, path: str, method: str, *args: Any, **kwargs: Any) -> Any:
+        operation = "/".join(seg for seg in path.split("/") if seg and not _ID_SEGMENT.match(seg))
+        attempt = 0
+        while True:
+            self.governor.acquire()
+            try:
+                with track_external("notion", f"{method} {operation}"):
+                    return super().request(path, method, *args, **kwargs)
+            except HTTPResponseError as e:
+                retryable = e.status == 429 or (
+                    e.status in TRANSIENT_STATUS
+                    and (method == "GET" or operation in READ_ONLY_POST_OPERATIONS)
+                )
+                if not retryable or attempt >= settings.NOTION_REQUEST_RETRIES:
+                    raise
+                if e.status == 429:
+                    delay = self.governor.backoff(e.headers.get("Retry-After"), attempt)
+                else:
+                    delay = transient_backoff(attempt)
+                attempt += 1
+                logger.warning(
+                    f"Notion returned {e.status} on {method} {operation}, "
+                    f"retry {attempt}/{settings.NOTION_REQUEST_RETRIES} in {delay:.2f}s"
+                )
+
 
 class NotionService:
     """Notion API Service"""
@@ -32,7 +91,7 @@ class NotionService:
             self.auth_token = settings.NOTION_TOKEN
             self.is_demo = False
 
-        self.client = Client(auth=self.auth_token)
+        self.client = InstrumentedClient(auth=self.auth_token)
         self.md_parser = NotionMarkdownParser()
         
         # 雜湊 Token 用於快取金鑰索引
@@ -43,88 +102,220 @@ class NotionService:
     def sync_page_tree(self) -> Dict[str, List[Dict[str, str]]]:
         """
         同步取得 Page Tree (Roots & Subpages)
-        快取 30 分鐘 (Per Token)
+        快取 NOTION_PAGE_TREE_TTL 秒 (Per Token，所有 Worker 共用)
         """
-        # TTLCache 會自動處理過期，不再需要手動檢查 expires_at
-        cache_data = _token_caches.get(self._token_hash)
-        
-        if cache_data:
-            logger.info("Hit Page Tree Cache")
-            return cache_data
-            
         try:
-            # Step 1: Search Roots (All accessible pages)
-            # Notion Integration access logic: search returns all pages coupled
-            # We assume top-level ones or specific white-listed ones are "Roots"
-            # However, search() returns flat list. 
-            # To simplify "White-list" logic as requested by user -> The integration *is* the whitelist.
-            # We treat all directly accessible pages from search() as potential ROOTS if they have no parent (or we just treat them all as potential search targets).
-            # But the requirement calls for recursive 1-level check.
-            
-            roots = []
-            subpages = []
-            
-            # Fetch all accessible pages (Roots)
-            has_more = True
-            start_cursor = None
+            refresh = self._refresh_page_tree if settings.NOTION_PAGE_TREE_INCREMENTAL else None
+            tree, hit = PageTreeCache(self._token_hash).get_or_load(self._crawl_page_tree, refresh)
+        except Exception as e:
+            logger.error(f"Failed to sync Notion page tree: {e}", exc_info=True)
+            return {"roots": [], "subpages": []}
+
+        if hit:
+            logger.info("Hit Page Tree Cache")
+        return tree
+
+    def _crawl_page_tree(self) -> Dict[str, List[Dict[str, str]]]:
+        """完整爬取 Page Tree (Roots 與其第一層子頁面)"""
+        # Step 1: Search Roots (All accessible pages)
+        # Notion Integration access logic: search returns all pages coupled
+        # We assume top-level ones or specific white-listed ones are "Roots"
+        # However, search() returns flat list. 
+        # To simplify "White-list" logic as requested by user -> The integration *is* the whitelist.
+        # We treat all directly accessible pages from search() as potential ROOTS if they have no parent (or we just treat them all as potential search targets).
+        # But the requirement calls for recursive 1-level check.
+        
+        started = time.perf_counter()
+        calls = 0
+        roots = []
+        
+        # Fetch all accessible pages (Roots)
+        has_more = True
+        start_cursor = None
+        
+        while has_more:
+            response = self.client.search(
+                filter={"property": "object", "value": "page"},
+                start_cursor=start_cursor
+            )
+            calls += 1
             
-            while has_more:
-                response = self.client.search(
-                    filter={"property": "object", "value": "page"},
-                    start_cursor=start_cursor
-                )
+            for page in response.get("results", []):
+                # 過濾條件：只有「真正的頂層頁面」才是 Root
+                # Notion API 的 search 會回傳所有可存取的頁面，包括：
+                # 1. Top-level pages (parent.type = "workspace")
+                # 2. Subpages (parent.type = "page_id")
+                # 
+                # 我們只需要第 1 種作為 Root，第 2 種會透過 blocks.children.list 取得
+                parent = page.get("parent", {})
+                parent_type = parent.get("type")
                 
-                for page in response.get("results", []):
-                    # 過濾條件：只有「真正的頂層頁面」才是 Root
-                    # Notion API 的 search 會回傳所有可存取的頁面，包括：
-                    # 1. Top-level pages (parent.type = "workspace")
-                    # 2. Subpages (parent.type = "page_id")
-                    # 
-                    # 我們只需要第 1 種作為 Root，第 2 種會透過 blocks.children.list 取得
-                    parent = page.get("parent", {})
-                    parent_type = parent.get("type")
-                    
-                    # 只接受 workspace 層級的頁面作為 Root
-                    # 過濾掉 parent.type = "page_id" 的頁面（這些是 Subpages）
-                    if parent_type != "workspace":
-                        continue
-                    
-                    title = self._extract_title(page)
-                    roots.append({
-                        "id": page["id"],
-                        "title": title
-                    })
+                # 只接受 workspace 層級的頁面作為 Root
+                # 過濾掉 parent.type = "page_id" 的頁面（這些是 Subpages）
+                if parent_type != "workspace":
+                    continue
                 
-                has_more = response.get("has_more", False)
-                start_cursor = response.get("next_cursor")
-                
-            # Step 2: Fetch Subpages for each Root
-            # This can be slow if many roots. 
-            for root in roots:
-                children = self.client.blocks.children.list(block_id=root["id"])
-                for child in children.get("results", []):
-                    if child["object"] == "child_page":
-                        subpages.append({
-                            "id": child["id"],
-                            "parent_id": root["id"],
-                            "title": child["child_page"]["title"]
-                        })
-
-            result = {
-                "roots": roots,
-                "subpages": subpages
-            }
-            
-            # Update Cache (TTLCache will handle expiration)
-            _token_caches[self._token_hash] = result
+                title = self._extract_title(page)
+                roots.append({
+                    "id": page["id"],
+                    "title": title
+                })
             
-            logger.info(f"Synced {len(roots)} roots and {len(subpages)} subpages for token {self.auth_token[:8]}...")
-            return result
+            has_more = response.get("has_more", False)
+            start_cursor = response.get("next_cursor")
             
-        except Exception as e:
-            logger.error(f"Failed to sync Notion page tree: {e}", exc_info=True)
-            return {"roots": [], "subpages": []}
-    
+        # Step 2: Fetch Subpages for each Root (並行、完整分頁)
+        subpages, child_calls = self._crawl_subpages(roots)
+        calls += child_calls
+
+        result = {
+            "roots": roots,
+            "subpages": subpages
+        }
+        
+        elapsed = time.perf_counter() - started
+        observe_page_tree_crawl(elapsed, calls)
+        logger.info(
+            f"Synced {len(roots)} roots and {len(subpages)} subpages for token {self.auth_token[:8]}... "
+            f"({calls} calls, {elapsed:.2f}s)"
+        )
+        return result
+
+    def _refresh_page_tree(self, tree: Dict[str, List[Dict[str, str]]], since: float) -> Dict[str, List[Dict[str, str]]]:
+        """
+        增量更新 Page Tree：只處理 since 之後編輯過的頁面
+
+        search 依 last_edited_time 由新到舊排序，遇到早於 Watermark 的頁面即停止，
+        呼叫次數與變動的頁面數成正比。新增 / 改名 / 移動的頁面就地更新；
+        刪除的頁面不會出現在 search 結果中，留待完整同步移除。
+
+        Args:
+            tree: 上次同步的 Page Tree (不會被修改)
+            since: 上次同步開始的時間 (Unix timestamp)
+        """
+        started = time.perf_counter()
+        calls = 0
+        changed = 0
+        watermark = datetime.fromtimestamp(since - WATERMARK_OVERLAP, tz=timezone.utc)
+        roots = {root["id"]: root for root in tree["roots"]}
+        subpages = {page["id"]: page for page in tree["subpages"]}
+        new_roots = []
+
+        def drop(page_id: str) -> None:
+            subpages.pop(page_id, None)
+            if roots.pop(page_id, None) is not None:
+                for sub_id in [s["id"] for s in subpages.values() if s["parent_id"] == page_id]:
+                    del subpages[sub_id]
+
+        done = False
+        start_cursor = None
+        while not done:
+            response = self.client.search(
+                filter={"property": "object", "value": "page"},
+                sort={"direction": "descending", "timestamp": "last_edited_time"},
+                start_cursor=start_cursor,
+                page_size=NOTION_PAGE_SIZE
+            )
+            calls += 1
+
+            for page in response.get("results", []):
+                edited = datetime.fromisoformat(page["last_edited_time"].replace("Z", "+00:00"))
+                if edited < watermark:
+                    done = True
+                    break
+                changed += 1
+
+                page_id = page["id"]
+                parent = page.get("parent", {})
+                if page.get("archived") or page.get("in_trash"):
+                    drop(page_id)
+                elif parent.get("type") == "workspace":
+                    subpages.pop(page_id, None)
+                    root = {"id": page_id, "title": self._extract_title(page)}
+                    if page_id not in roots:
+                        new_roots.append(root)
+                    roots[page_id] = root
+                elif parent.get("type") == "page_id" and parent.get("page_id") in roots:
+                    if page_id in roots:
+                        drop(page_id)
+                    subpages[page_id] = {
+                        "id": page_id,
+                        "parent_id": parent["page_id"],
+                        "title": self._extract_title(page)
+                    }
+                else:
+                    # 移到 Page Tree 範圍之外 (更深層頁面或資料庫)
+                    drop(page_id)
+
+            if not done:
+                done = not response.get("has_more", False)
+                start_cursor = response.get("next_cursor")
+
+        # 新的 Root 需要取得其子頁面
+        added, child_calls = self._crawl_subpages(new_roots)
+        calls += child_calls
+        for page in added:
+            subpages[page["id"]] = page
+
+        result = {
+            "roots": list(roots.values()),
+            "subpages": list(subpages.values())
+        }
+
+        elapsed = time.perf_counter() - started
+        observe_page_tree_crawl(elapsed, calls, mode="incremental")
+        logger.info(
+            f"Refreshed page tree: {changed} changed pages, {len(new_roots)} new roots "
+            f"({calls} calls, {elapsed:.2f}s)"
+        )
+        return result
+
+    def _crawl_subpages(self, roots: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], int]:
+        """
+        並行取得所有 Root 的子頁面
+
+        同時查詢的 Root 數量上限為 NOTION_CRAWL_CONCURRENCY，結果依 Root 順序合併。
+
+        Returns:
+            (subpages, API 呼叫次數)
+        """
+        if not roots:
+            return [], 0
+
+        workers = max(1, min(settings.NOTION_CRAWL_CONCURRENCY, len(roots)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notion-crawl") as executor:
+            results = list(executor.map(self._list_child_pages, roots))
+
+        subpages = [page for pages, _ in results for page in pages]
+        return subpages, sum(calls for _, calls in results)
+
+    def _list_child_pages(self, root: Dict[str, str]) -> Tuple[List[Dict[str, str]], int]:
+        """取得單一 Root 的子頁面，依 next_cursor 讀完所有分頁 (每頁最多 100 個 Block)"""
+        subpages = []
+        calls = 0
+        has_more = True
+        start_cursor = None
+
+        while has_more:
+            children = self.client.blocks.children.list(
+                block_id=root["id"],
+                start_cursor=start_cursor,
+                page_size=NOTION_PAGE_SIZE
+            )
+            calls += 1
+            for child in children.get("results", []):
+                if child["type"] == "child_page":
+                    subpages.append({
+                        "id": child["id"],
+                        "parent_id": root["id"],
+                        "title": child["child_page"]["title"]
+                    })
+
+            has_more = children.get("has_more", False)
+            start_cursor = children.get("next_cursor")
+
+        return subpages, calls
+
     def _extract_title(self, page: Dict) -> str:
         """Helper to extract title safely"""
         title = ""
@@ -138,34 +329,49 @@ class NotionService:
                     break
         return title or "Untitled"
 
-    def create_subpage(self, parent_id: str, title: str, summary_md: str) -> str:
+    def create_subpage(
+        self,
+        parent_id: str,
+        title: str,
+        summary_md: str,
+        resume: Optional[WriteState] = None,
+        on_progress: Optional[Callable[[WriteState], None]] = None,
+    ) -> str:
         """
         在指定 Root (parent_id) 下建立新子頁面 (作為 Topic Page)
         並寫入摘要
+
+        Args:
+            resume: 上次中斷時保存的寫入進度 (已建立頁面時不再重新建立)
+            on_progress: 每完成一個 Notion 請求時呼叫，傳入目前的寫入進度
         """
         try:
-            # 1. Parse Markdown Summary to Blocks
-            content_blocks = self.md_parser.parse(summary_md)
-            
-            # 2. Create Page with Content
-            new_page = self.client.pages.create(
-                parent={"page_id": parent_id},
-                properties={
-                    "title": {
-                        "title": [{"text": {"content": title}}]
-                    }
-                },
-                children=content_blocks
-            )
-            
-            # Proactively Update Cache (instead of invalidation)
-            if self._token_hash in _token_caches:
-                _token_caches[self._token_hash]["subpages"].append({
+            writer = NotionBlockWriter(self.client, on_progress)
+            if resume and resume.get("page"):
+                new_page = writer.resume(resume)
+            else:
+                # 1. Parse Markdown Summary to Blocks
+                content_blocks = self.md_parser.parse(summary_md)
+
+                # 2. Create Page with Content (超過單次請求限制的部分於建立後依序 append)
+                new_page = writer.create_page(
+                    parent={"page_id": parent_id},
+                    properties={
+                        "title": {
+                            "title": [{"text": {"content": title}}]
+                        }
+                    },
+                    blocks=content_blocks
+                )
+
+                # Proactively Update Cache (instead of invalidation)
+                PageTreeCache(self._token_hash).add_subpage({
                     "id": new_page["id"],
                     "parent_id": parent_id,
                     "title": title
                 })
                 logger.info("Proactively updated Page Tree Cache")
+                writer.flush()
             
             page_url = new_page["url"]
             page_id = new_page["id"]
@@ -178,11 +384,27 @@ class NotionService:
             logger.error(f"Failed to create Notion subpage: {e}", exc_info=True)
             raise
 
-    def append_to_page(self, page_id: str, title: str, summary_md: str) -> str:
+    def append_to_page(
+        self,
+        page_id: str,
+        title: str,
+        summary_md: str,
+        resume: Optional[WriteState] = None,
+        on_progress: Optional[Callable[[WriteState], None]] = None,
+    ) -> str:
         """
         在現有頁面 (Subpage) 末尾追加內容
+
+        Args:
+            resume: 上次中斷時保存的寫入進度 (只寫入尚未完成的部分)
+            on_progress: 每完成一個 Notion 請求時呼叫，傳入目前的寫入進度
         """
         try:
+            writer = NotionBlockWriter(self.client, on_progress)
+            if resume:
+                writer.resume(resume)
+                return self._page_url(page_id)
+
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
             
             # 1. Header Block
@@ -204,18 +426,16 @@ class NotionService:
                 *content_blocks
             ]
             
-            self.client.blocks.children.append(
-                block_id=page_id,
-                children=blocks_to_append
-            )
-            
-            # 取得頁面 URL (for return)
-            page = self.client.pages.retrieve(page_id)
-            page_url = page["url"]
-            logger.info(f"Appended to Notion page: {page_url}")
-            
-            return page_url
+            writer.append(page_id, blocks_to_append)
+            return self._page_url(page_id)
             
         except Exception as e:
             logger.error(f"Failed to append to Notion page: {e}", exc_info=True)
             raise
+
+    def _page_url(self, page_id: str) -> str:
+        """取得頁面 URL (for return)"""
+        page = self.client.pages.retrieve(page_id)
+        page_url = page["url"]
+        logger.info(f"Appended to Notion page: {page_url}")
+        return page_url
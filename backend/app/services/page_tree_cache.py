@@ -0,0 +1,274 @@
+"""
+Page Tree Cache
+Notion 頁面樹的兩層快取：本機 TTLCache (L1) + Redis (L2)，所有 Worker 與主機共用
+
+- Redis Hash `page_tree:{token_hash}` 存放 roots / subpages (JSON)、版本號與同步時間
+- 每次寫入 (同步或 create_subpage 新增子頁面) 皆遞增版本號，
+  L1 命中前先比對 Redis 版本號，其他 Process 的更新會立即可見
+- 超過 NOTION_PAGE_TREE_TTL 後以上次同步時間為 Watermark 增量更新，
+  每 NOTION_PAGE_TREE_FULL_SYNC_SECONDS 才完整重新爬取一次
+- 需要同步時以 Redis 鎖 (Single-flight) 確保同一 Token 只有一個 Process 執行，
+  其餘沿用舊的 Page Tree，或在尚無快取時等待結果寫入 L2
+- Redis 無法使用時退回僅使用 L1
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from cachetools import TTLCache
+
+from app.config import get_settings
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+PageTree = Dict[str, List[Dict[str, str]]]
+
+
+class _Entry(NamedTuple):
+    version: int
+    tree: PageTree
+    synced_at: float  # 上次同步 (完整或增量) 開始的時間，作為下次增量更新的 Watermark
+    full_synced_at: float  # 上次完整同步開始的時間
+
+
+# L1: Key 為雜湊後的 Token，Value 為 _Entry
+_token_caches: TTLCache = TTLCache(maxsize=1000, ttl=settings.NOTION_PAGE_TREE_TTL)
+_token_caches_lock = threading.Lock()  # TTLCache 非執行緒安全 (io Worker 以 threads 執行)
+
+VERSION_TTL = 7 * 24 * 3600  # 版本號需比 L1 存活更久，避免過期重建後與舊 L1 版本號相同
+LOCK_TTL = 120  # 單次爬取的最長時間
+LOCK_POLL_INTERVAL = 0.2
+
+# 以新版本號寫入同步結果 (保留至下次完整同步，過期前皆可增量更新)
+_STORE_SCRIPT = """
+local version = redis.call("incr", KEYS[2])
+redis.call("expire", KEYS[2], ARGV[6])
+redis.call("hset", KEYS[1], "roots", ARGV[1], "subpages", ARGV[2], "version", version,
+           "synced_at", ARGV[3], "full_synced_at", ARGV[4])
+redis.call("expire", KEYS[1], ARGV[5])
+return version
+"""
+
+# 於既有 Page Tree 附加一個子頁面 (不更新同步時間)
+_APPEND_SUBPAGE_SCRIPT = """
+local subpages = redis.call("hget", KEYS[1], "subpages")
+if not subpages then
+    return 0
+end
+if subpages == "[]" then
+    subpages = "[" .. ARGV[1] .. "]"
+else
+    subpages = string.sub(subpages, 1, -2) .. "," .. ARGV[1] .. "]"
+end
+local version = redis.call("incr", KEYS[2])
+redis.call("hset", KEYS[1], "subpages", subpages, "version", version)
+return version
+"""
+
+# 僅在仍由自己持有時釋放爬取鎖
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _local_get(token_hash: str) -> Optional[_Entry]:
+    with _token_caches_lock:
+        return _token_caches.get(token_hash)
+
+
+def _local_set(token_hash: str, entry: _Entry) -> None:
+    with _token_caches_lock:
+        _token_caches[token_hash] = entry
+
+
+class PageTreeCache:
+    """單一 Notion Token 的 Page Tree 快取"""
+
+    def __init__(self, token_hash: str):
+        self.token_hash = token_hash
+        self.key = f"page_tree:{token_hash}"
+        self.version_key = f"{self.key}:version"
+        self.lock_key = f"{self.key}:lock"
+
+    def get(self) -> Optional[PageTree]:
+        """讀取 Page Tree (不論是否需要更新)"""
+        entry = self._entry()
+        return entry.tree if entry is not None else None
+
+    def _entry(self) -> Optional[_Entry]:
+        """讀取快取項目，L1 版本號與 Redis 一致時直接使用 L1"""
+        local = _local_get(self.token_hash)
+        try:
+            if local is not None and redis_client.hget(self.key, "version") == str(local.version):
+                return local
+            version, roots, subpages, synced_at, full_synced_at = redis_client.hmget(
+                self.key, "version", "roots", "subpages", "synced_at", "full_synced_at"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to read page tree from Redis: {e}")
+            return local
+
+        if version is None:
+            return None
+        entry = _Entry(
+            int(version),
+            {"roots": json.loads(roots), "subpages": json.loads(subpages)},
+            float(synced_at or 0),
+            float(full_synced_at or 0),
+        )
+        _local_set(self.token_hash, entry)
+        return entry
+
+    def set(self, tree: PageTree, synced_at: Optional[float] = None, full_synced_at: Optional[float] = None) -> None:
+        """
+        寫入同步結果 (遞增版本號)
+
+        Args:
+            tree: Page Tree
+            synced_at: 同步開始時間 (預設為現在)
+            full_synced_at: 上次完整同步時間 (預設同 synced_at，即本次為完整同步)
+        """
+        synced_at = time.time() if synced_at is None else synced_at
+        full_synced_at = synced_at if full_synced_at is None else full_synced_at
+        version = 0
+        try:
+            version = int(redis_client.eval(
+                _STORE_SCRIPT, 2, self.key, self.version_key,
+                json.dumps(tree["roots"], ensure_ascii=False),
+                json.dumps(tree["subpages"], ensure_ascii=False),
+                synced_at,
+                full_synced_at,
+                settings.NOTION_PAGE_TREE_FULL_SYNC_SECONDS,
+                VERSION_TTL,
+            ))
+        except Exception as e:
+            logger.warning(f"Failed to store page tree in Redis: {e}")
+        _local_set(self.token_hash, _Entry(version, tree, synced_at, full_synced_at))
+
+    def add_subpage(self, subpage: Dict[str, str]) -> None:
+        """
+        將新建立的子頁面加入快取 (取代失效，下一則筆記即可路由至該頁面)
+
+        Redis 中沒有快取時不寫入，避免產生只有單一子頁面的不完整 Page Tree。
+        """
+        try:
+            version = int(redis_client.eval(
+                _APPEND_SUBPAGE_SCRIPT, 2, self.key, self.version_key,
+                json.dumps(subpage, ensure_ascii=False),
+            ))
+        except Exception as e:
+            logger.warning(f"Failed to update page tree in Redis: {e}")
+            version = None
+
+        with _token_caches_lock:
+            local = _token_caches.get(self.token_hash)
+            if version == 0:
+                _token_caches.pop(self.token_hash, None)
+            elif local is not None:
+                tree = {"roots": local.tree["roots"], "subpages": [*local.tree["subpages"], subpage]}
+                # Redis 無法使用時保留原版本號，僅更新本機
+                _token_caches[self.token_hash] = local._replace(
+                    version=local.version if version is None else version, tree=tree
+                )
+
+    def get_or_load(
+        self,
+        crawl: Callable[[], PageTree],
+        refresh: Optional[Callable[[PageTree, float], PageTree]] = None,
+    ) -> Tuple[PageTree, bool]:
+        """
+        讀取 Page Tree，過期或未命中時以 Single-flight 方式同步
+
+        - 未超過 NOTION_PAGE_TREE_TTL：直接回傳快取
+        - 已有快取且未到完整同步時間：呼叫 refresh(舊 Page Tree, Watermark) 增量更新，
+          失敗時沿用舊的 Page Tree
+        - 尚無快取、未提供 refresh 或已到完整同步時間：呼叫 crawl 完整爬取
+
+        同步時其他 Process 沿用舊的 Page Tree；尚無快取時等待最多
+        NOTION_PAGE_TREE_LOCK_WAIT_SECONDS，逾時後自行爬取。
+
+        Returns:
+            (Page Tree, 是否命中快取)
+        """
+        started = time.time()
+        entry = self._entry()
+        if entry is not None and started - entry.synced_at < settings.NOTION_PAGE_TREE_TTL:
+            return entry.tree, True
+
+        token = self._acquire()
+        if token is None:
+            if entry is not None:
+                return entry.tree, True
+            tree = self._wait_for_peer()
+            if tree is not None:
+                return tree, True
+            logger.warning("Timed out waiting for concurrent page tree sync, crawling locally")
+
+        try:
+            full = (
+                entry is None
+                or refresh is None
+                or started - entry.full_synced_at >= settings.NOTION_PAGE_TREE_FULL_SYNC_SECONDS
+            )
+            if full:
+                tree = crawl()
+                self.set(tree, started)
+                return tree, False
+
+            try:
+                tree = refresh(entry.tree, entry.synced_at)
+            except Exception as e:
+                logger.warning(f"Incremental page tree refresh failed, keeping previous tree: {e}")
+                return entry.tree, True
+            self.set(tree, started, entry.full_synced_at)
+            return tree, False
+        finally:
+            if token:
+                self._release(token)
+
+    def _acquire(self) -> Optional[str]:
+        """
+        取得爬取鎖
+
+        Returns:
+            鎖的 Token；已由其他 Process 持有時回傳 None，Redis 無法使用時回傳空字串 (直接爬取)
+        """
+        token = str(uuid.uuid4())
+        try:
+            if redis_client.set(self.lock_key, token, nx=True, ex=LOCK_TTL):
+                return token
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to acquire page tree lock: {e}")
+            return ""
+
+    def _release(self, token: str) -> None:
+        try:
+            redis_client.eval(_RELEASE_SCRIPT, 1, self.lock_key, token)
+        except Exception as e:
+            logger.warning(f"Failed to release page tree lock: {e}")
+
+    def _wait_for_peer(self) -> Optional[PageTree]:
+        """等待持有鎖的 Process 完成爬取"""
+        logger.info("Page tree sync in progress elsewhere, waiting for result")
+        deadline = time.monotonic() + settings.NOTION_PAGE_TREE_LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            tree = self.get()
+            if tree is not None:
+                return tree
+            try:
+                if not redis_client.exists(self.lock_key):
+                    # 對方爬取失敗 (未寫入快取即釋放鎖)
+                    return None
+            except Exception:
+                return None
+        return None
@@ -0,0 +1,82 @@
+"""
+Task Progress Service
+將任務處理階段、進度與部分逐字稿寫入 Redis，供 API 查詢與監控訂閱
+"""
+import json
+import time
+from typing import Any, Dict, Optional
+
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+
+logger = get_logger(__name__)
+
+PROGRESS_TTL = 24 * 3600  # 進度資料保留 1 天
+PROGRESS_MIN_INTERVAL = 1.0  # 串流進度最短回報間隔 (秒)
+
+
+class TaskProgress:
+    """
+    單一任務的進度回報器
+
+    進度存放於 Hash `task_progress:{task_id}`，並同步發佈至同名 Channel。
+    回報失敗只記錄警告，不影響任務本身。
+    """
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.key = f"task_progress:{task_id}"
+        self._last_report = 0.0
+
+    def update(
+        self,
+        stage: str,
+        progress: float = 0.0,
+        partial_text: Optional[str] = None,
+        **extra: Any
+    ) -> None:
+        """
+        更新任務階段與進度
+
+        Args:
+            stage: 目前階段 (queued / transcribing / routing / ...)
+            progress: 目前階段完成百分比 (0~100)
+            partial_text: 目前為止的部分逐字稿
+            extra: 其他欄位 (如 notion_url、error)
+        """
+        data = {"stage": stage, "progress": round(progress, 1), "updated_at": time.time()}
+        if partial_text is not None:
+            data["partial_text"] = partial_text
+        data.update({k: v for k, v in extra.items() if v is not None})
+
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(self.key, mapping=data)
+            pipe.expire(self.key, PROGRESS_TTL)
+            pipe.publish(self.key, json.dumps(data, ensure_ascii=False))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to report progress for task {self.task_id}: {e}")
+
+    def stream(self, stage: str, progress: float, partial_text: str) -> None:
+        """
+        串流進度回報 (節流)
+
+        解碼過程中每個片段都會呼叫，僅在距上次回報超過 PROGRESS_MIN_INTERVAL
+        或階段完成時才實際寫入 Redis。
+        """
+        now = time.monotonic()
+        if progress < 100 and now - self._last_report < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_report = now
+        self.update(stage, progress, partial_text)
+
+    @staticmethod
+    def get(task_id: str) -> Optional[Dict[str, Any]]:
+        """讀取任務進度，不存在時回傳 None"""
+        data = redis_client.hgetall(f"task_progress:{task_id}")
+        if not data:
+            return None
+        data["progress"] = float(data.get("progress", 0))
+        data["updated_at"] = float(data.get("updated_at", 0))
+        return data
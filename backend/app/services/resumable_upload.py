@@ -0,0 +1,234 @@
+"""
+Resumable Upload Service
+可續傳的分段上傳：連線中斷後由目前 Offset 繼續傳送，不必重傳整個檔案
+
+流程:
+1. create: 建立 Session，回傳 upload_id
+2. append: 依 Offset 寫入 Chunk (Offset 不符時回傳 409 與目前 Offset)
+3. 查詢目前 Offset (中斷後續傳前)
+4. finalize: 驗證完整性後移入 /data，交由 Pipeline 處理
+
+Session 狀態存於 Redis Hash `upload_session:{upload_id}`，檔案內容寫入 /data/uploads/{upload_id}.part。
+finalize 後 Session 保留 FINALIZED_TTL 並記錄 task_id，客戶端重送 finalize 時回傳同一個 task_id。
+"""
+import os
+import time
+import uuid
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+from app.services.audio_validator import validate_audio_format, MAX_FILE_SIZE, HEADER_BYTES
+from app.services.upload_service import DATA_DIR
+
+logger = get_logger(__name__)
+
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+SESSION_TTL = 24 * 3600  # 未完成的 Session 保留 1 天
+FINALIZED_TTL = 3600  # 完成後保留 Session 供重送的 finalize 取得 task_id
+LOCK_TTL = 300  # 單一 Chunk 寫入的最長時間
+
+# 僅在仍由自己持有時釋放 Session 鎖
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class UploadSession:
+    """單一可續傳上傳的狀態與檔案操作"""
+
+    def __init__(self, upload_id: str, data: Dict[str, str]):
+        self.upload_id = upload_id
+        self.key = f"upload_session:{upload_id}"
+        self.offset = int(data.get("offset", 0))
+        self.length = int(data["length"]) if data.get("length") else None
+        self.file_ext = data.get("file_ext") or None
+        self.encrypted_context = data.get("encrypted_context", "")
+        self.owner = data.get("owner", "")
+        self.part_path = os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+    @classmethod
+    def create(cls, encrypted_context: str, owner: str, length: Optional[int] = None) -> "UploadSession":
+        """
+        建立上傳 Session
+
+        Args:
+            encrypted_context: 加密後的使用者上下文 (finalize 時交給 Pipeline)
+            owner: 建立者的識別 (後續請求須相同)
+            length: 預告的檔案總大小 (選用，finalize 時檢查)
+
+        Raises:
+            HTTPException: 預告大小超過限制 (413)
+        """
+        if length is not None and length > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"檔案過大 (最大 {MAX_FILE_SIZE // 1024 // 1024}MB)"
+            )
+
+        os.makedirs(UPLOAD_DIR, mode=0o700, exist_ok=True)
+        purge_stale_parts()
+
+        upload_id = str(uuid.uuid4())
+        data = {"offset": 0, "encrypted_context": encrypted_context, "owner": owner, "created_at": time.time()}
+        if length is not None:
+            data["length"] = length
+
+        session = cls(upload_id, {k: str(v) for k, v in data.items()})
+        pipe = redis_client.pipeline()
+        pipe.hset(session.key, mapping=data)
+        pipe.expire(session.key, SESSION_TTL)
+        pipe.execute()
+        open(session.part_path, "wb").close()
+
+        logger.info(f"Upload session created: {upload_id} (length: {length})")
+        return session
+
+    @classmethod
+    def load(cls, upload_id: str) -> Optional["UploadSession"]:
+        """讀取 Session，不存在或已過期時回傳 None"""
+        data = redis_client.hgetall(f"upload_session:{upload_id}")
+        if not data:
+            return None
+        return cls(upload_id, data)
+
+    def _acquire(self) -> str:
+        """取得 Session 鎖，避免同一 Session 的 Chunk 同時寫入"""
+        token = str(uuid.uuid4())
+        if not redis_client.set(f"{self.key}:lock", token, nx=True, ex=LOCK_TTL):
+            raise HTTPException(status_code=409, detail="此上傳正在寫入中，請稍後再試")
+        return token
+
+    def _release(self, token: str) -> None:
+        redis_client.eval(_RELEASE_SCRIPT, 1, f"{self.key}:lock", token)
+
+    async def append(self, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """
+        於指定 Offset 寫入 Chunk
+
+        傳輸中斷時保留已收到的位元組並更新 Offset，客戶端可由該處續傳。
+
+        Args:
+            offset: 客戶端認定的目前 Offset
+            chunks: Chunk 內容的 Async Iterator
+
+        Returns:
+            int: 寫入後的 Offset
+
+        Raises:
+            HTTPException: Offset 不符 (409)、超過大小 (413) 或格式不支援 (400)
+        """
+        token = self._acquire()
+        try:
+            # 以鎖內讀取的 Offset 為準，避免與其他請求競態
+            if redis_client.hget(self.key, "file_path"):
+                raise HTTPException(status_code=409, detail="此上傳已完成")
+            self.offset = int(redis_client.hget(self.key, "offset") or 0)
+            if offset != self.offset:
+                raise HTTPException(status_code=409, detail=f"Offset 不符 (目前 Offset: {self.offset})")
+
+            limit = min(self.length or MAX_FILE_SIZE, MAX_FILE_SIZE)
+            f = await run_in_threadpool(open, self.part_path, "r+b")
+            try:
+                # 捨棄上次中斷時寫入但未記錄的位元組
+                await run_in_threadpool(f.truncate, self.offset)
+                f.seek(self.offset)
+                async for chunk in chunks:
+                    if f.tell() + len(chunk) > limit:
+                        raise HTTPException(status_code=413, detail="超過檔案大小限制")
+                    await run_in_threadpool(f.write, chunk)
+            finally:
+                f.close()
+                self.offset = os.path.getsize(self.part_path)
+                redis_client.hset(self.key, "offset", self.offset)
+
+            if self.file_ext is None and self.offset >= HEADER_BYTES:
+                self._validate_header()
+            return self.offset
+        finally:
+            self._release(token)
+
+    def _validate_header(self) -> None:
+        """驗證檔案開頭的 Magic Number，不支援的格式直接刪除 Session"""
+        with open(self.part_path, "rb") as f:
+            head = f.read(HEADER_BYTES)
+        try:
+            self.file_ext = validate_audio_format(head)
+        except HTTPException:
+            self.delete()
+            raise
+        redis_client.hset(self.key, "file_ext", self.file_ext)
+
+    def finalize(self, process: Callable[[str], str]) -> str:
+        """
+        完成上傳，將檔案移入 /data 並交由 process 處理 (冪等)
+
+        整個流程持有 Session 鎖；已完成時直接回傳記錄的 task_id，
+        檔案已移入 /data 但 process 失敗時，重送只重新執行 process。
+
+        Args:
+            process: 接收檔案路徑 (/data/{uuid}{ext})、回傳 task_id 的函式
+
+        Returns:
+            str: task_id
+
+        Raises:
+            HTTPException: 檔案不完整 (409) 或格式不支援 (400)
+        """
+        token = self._acquire()
+        try:
+            task_id = redis_client.hget(self.key, "task_id")
+            if task_id:
+                logger.info(f"Upload session {self.upload_id} already finalized: {task_id}")
+                return task_id
+
+            file_path = redis_client.hget(self.key, "file_path")
+            if not file_path:
+                file_path = self._move_to_data_dir()
+
+            task_id = process(file_path)
+            redis_client.hset(self.key, "task_id", task_id)
+            redis_client.expire(self.key, FINALIZED_TTL)
+            return task_id
+        finally:
+            self._release(token)
+
+    def _move_to_data_dir(self) -> str:
+        """檢查完整性後將暫存檔案移入 /data，並記錄於 Session"""
+        self.offset = int(redis_client.hget(self.key, "offset") or 0)
+        if self.offset == 0:
+            raise HTTPException(status_code=400, detail="未收到音訊資料")
+        if self.length is not None and self.offset != self.length:
+            raise HTTPException(status_code=409, detail=f"上傳尚未完成 ({self.offset}/{self.length} bytes)")
+        if self.file_ext is None:
+            self._validate_header()
+
+        file_path = os.path.join(DATA_DIR, f"{uuid.uuid4()}{self.file_ext}")
+        os.replace(self.part_path, file_path)
+        redis_client.hset(self.key, "file_path", file_path)
+        logger.info(f"Upload session {self.upload_id} finalized: {file_path} ({self.offset} bytes)")
+        return file_path
+
+    def delete(self) -> None:
+        """刪除 Session 與暫存檔案"""
+        redis_client.delete(self.key)
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def purge_stale_parts() -> None:
+    """刪除 Session 已過期的暫存檔案"""
+    cutoff = time.time() - SESSION_TTL
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        try:
+            if name.endswith(".part") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            continue
@@ -0,0 +1,202 @@
+"""
+STT Batcher
+跨任務批次轉錄：收集佇列中的短語音，合併為單次 faster-whisper 批次推論
+
+運作方式 (Leader / Follower):
+1. 每個任務將已解碼 (並移除靜音) 的 PCM 檔路徑推入 Redis 待處理清單
+2. 搶到 Leader 鎖的任務等待至多 STT_BATCH_WINDOW_MS 或湊滿 STT_BATCH_MAX_SIZE，
+   一次取出整批請求並以 BatchedInferencePipeline 推論；
+   清單中只有自己且 STT 佇列沒有等待中的任務時不等待
+3. 結果依請求 ID 寫回，其餘任務 (Follower) 於各自的結果 Key 上等待
+4. 逾時或批次失敗時，任務自行轉錄，不會因批次機制而遺失
+
+批次只會合併「同時執行中」的任務，STT Worker 的並行數 (STT_FAST_CONCURRENCY)
+需大於 1 才有效果，建議設為 STT_BATCH_MAX_SIZE。
+"""
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.config import get_settings
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+from app.utils.audio_chunking import SAMPLE_RATE
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# 待處理清單與 Leader 鎖依模型區分，只有使用相同模型的任務會合併為一批
+PENDING_KEY = "stt_batch:{model_size}:pending"
+LEADER_KEY = "stt_batch:{model_size}:leader"
+RESULT_KEY = "stt_batch:result:{request_id}"
+RESULT_TTL = 300
+BATCH_PCM_SUFFIX = ".batch.npy"  # 交給 Leader 的暫存 PCM 檔 (已移除靜音)
+
+# 僅在仍由自己持有時釋放 Leader 鎖
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def transcribe_batch(model: Any, audios: List[Any], beam_size: int = 5) -> List[str]:
+    """
+    以單次批次推論轉錄多段短語音
+
+    各段音訊串接後以 clip_timestamps 標記邊界，每段成為一個獨立的推論單元，
+    再依片段起始時間分回各段。
+
+    Args:
+        model: WhisperModel 實例
+        audios: 16 kHz PCM 陣列 (每段不超過 30 秒)
+        beam_size: Beam search 寬度
+
+    Returns:
+        與 audios 順序相同的逐字稿
+    """
+    import numpy as np
+    from faster_whisper import BatchedInferencePipeline
+
+    bounds = []
+    offset = 0.0
+    for audio in audios:
+        duration = len(audio) / SAMPLE_RATE
+        bounds.append((offset, offset + duration))
+        offset += duration
+
+    pipeline = BatchedInferencePipeline(model=model)
+    segments, _ = pipeline.transcribe(
+        np.concatenate(audios),
+        language=settings.STT_LANGUAGE,
+        clip_timestamps=[{"start": start, "end": end} for start, end in bounds],
+        beam_size=beam_size,
+        batch_size=len(audios)
+    )
+
+    texts: List[List[str]] = [[] for _ in audios]
+    for segment in segments:
+        for index, (start, end) in enumerate(bounds):
+            if start <= segment.start < end:
+                texts[index].append(segment.text)
+                break
+
+    return [" ".join(parts).strip() for parts in texts]
+
+
+class STTBatcher:
+    """跨任務 STT 批次器"""
+
+    def __init__(self, model: Any, model_size: str, beam_size: int = 5):
+        self.model = model
+        self.beam_size = beam_size
+        self.pending_key = PENDING_KEY.format(model_size=model_size)
+        self.leader_key = LEADER_KEY.format(model_size=model_size)
+
+    def transcribe(self, audio: Any, audio_path: str, pcm_path: Optional[str] = None) -> Optional[str]:
+        """
+        將短語音加入批次並等待結果
+
+        Args:
+            audio: 已解碼 (並移除靜音) 的 16 kHz PCM 陣列
+            audio_path: 原始音訊檔案路徑 (暫存檔位置與日誌用)
+            pcm_path: 內容與 audio 相同的 PCM 檔 (Ingest 產生的 Sidecar)；
+                未提供時寫入暫存檔，Leader 不需重新解碼
+
+        Returns:
+            逐字稿；逾時或批次失敗時回傳 None，由呼叫端自行轉錄
+        """
+        import numpy as np
+
+        request_id = str(uuid.uuid4())
+        temp_path = None
+        if pcm_path is None:
+            temp_path = pcm_path = f"{audio_path}.{request_id}{BATCH_PCM_SUFFIX}"
+            np.save(temp_path, np.asarray(audio, dtype=np.float32))
+
+        try:
+            return self._wait_for_result(request_id, pcm_path, audio_path)
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _wait_for_result(self, request_id: str, pcm_path: str, audio_path: str) -> Optional[str]:
+        entry = json.dumps({"id": request_id, "pcm": pcm_path})
+        result_key = RESULT_KEY.format(request_id=request_id)
+        redis_client.rpush(self.pending_key, entry)
+
+        window = settings.STT_BATCH_WINDOW_MS / 1000
+        deadline = time.monotonic() + window + settings.STT_BATCH_RESULT_TIMEOUT
+
+        while time.monotonic() < deadline:
+            lease_ms = int((window + settings.STT_BATCH_RESULT_TIMEOUT) * 1000)
+            if redis_client.set(self.leader_key, request_id, nx=True, px=lease_ms):
+                try:
+                    self._lead(window)
+                finally:
+                    redis_client.eval(_RELEASE_SCRIPT, 1, self.leader_key, request_id)
+
+            item = redis_client.blpop(result_key, timeout=1)
+            if item:
+                result = json.loads(item[1])
+                if "error" in result:
+                    logger.warning(f"Batched STT failed, falling back: {result['error']}")
+                    return None
+                return result["text"]
+
+        # 逾時：若請求仍在清單中則撤回，由呼叫端自行轉錄
+        redis_client.lrem(self.pending_key, 1, entry)
+        logger.warning(f"Batched STT timed out for {audio_path}, falling back")
+        return None
+
+    def _lead(self, window: float) -> None:
+        """擔任 Leader：收集一批請求並執行批次推論"""
+        if self._alone():
+            window = 0.0
+        collect_deadline = time.monotonic() + window
+        while time.monotonic() < collect_deadline and redis_client.llen(self.pending_key) < settings.STT_BATCH_MAX_SIZE:
+            time.sleep(0.02)
+
+        raw_entries = redis_client.lpop(self.pending_key, settings.STT_BATCH_MAX_SIZE)
+        if not raw_entries:
+            return
+        requests = [json.loads(raw) for raw in raw_entries]
+
+        start = time.perf_counter()
+        try:
+            audios = [_load_batch_pcm(request["pcm"]) for request in requests]
+            results: List[Dict[str, str]] = [{"text": text} for text in transcribe_batch(self.model, audios, self.beam_size)]
+            logger.info(f"Batched STT: {len(requests)} notes in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"Batched STT failed: {e}", exc_info=True)
+            results = [{"error": str(e)} for _ in requests]
+
+        pipe = redis_client.pipeline()
+        for request, result in zip(requests, results):
+            key = RESULT_KEY.format(request_id=request["id"])
+            pipe.rpush(key, json.dumps(result, ensure_ascii=False))
+            pipe.expire(key, RESULT_TTL)
+        pipe.execute()
+
+    def _alone(self) -> bool:
+        """待處理清單只有 Leader 自己，且 STT 佇列沒有可能加入本批的任務"""
+        from app.services.model_policy import stt_queue_depth
+
+        try:
+            return redis_client.llen(self.pending_key) <= 1 and stt_queue_depth() == 0
+        except Exception as e:
+            logger.warning(f"Failed to check STT batch peers: {e}")
+            return False
+
+
+def _load_batch_pcm(pcm_path: str) -> Any:
+    """以 mmap 載入請求端已解碼的 PCM 檔 (int16 Sidecar 轉為 float32)"""
+    import numpy as np
+
+    pcm = np.load(pcm_path, mmap_mode="r")
+    if pcm.dtype == np.int16:
+        return pcm.astype(np.float32) / 32768.0
+    return pcm
@@ -0,0 +1,43 @@
+"""
+STT Scheduler
+依音訊長度實作「最短任務優先」：短錄音走快速通道，長錄音走一般通道，並依長度分級設定優先序
+
+一段 20 分鐘的會議錄音不會再擋住後面的 10 秒 Siri 筆記。
+"""
+import bisect
+from typing import Optional, Tuple
+
+from app.config import get_settings
+from app.core.celery_app import PRIORITY_STEPS
+
+settings = get_settings()
+
+
+def stt_priority(duration: Optional[float]) -> int:
+    """
+    依音訊長度取得 Broker 優先序 (0 最優先)
+
+    長度依 STT_PRIORITY_BUCKETS 分級，各級平均分布於 PRIORITY_STEPS；長度未知時為最低優先。
+    """
+    bounds = settings.stt_priority_buckets_list
+    levels = len(bounds) + 1
+    bucket = levels - 1 if duration is None else bisect.bisect_left(bounds, duration)
+    step = (len(PRIORITY_STEPS) - 1) / max(1, levels - 1)
+    return PRIORITY_STEPS[round(bucket * step)]
+
+
+def stt_route(duration: Optional[float]) -> Tuple[str, int]:
+    """
+    決定轉錄任務的佇列與優先序
+
+    Args:
+        duration: 音訊長度 (秒)；未知時視為長錄音，避免佔用快速通道
+
+    Returns:
+        (佇列名稱, 優先序)
+    """
+    if duration is not None and duration <= settings.STT_FAST_MAX_SECONDS:
+        queue = settings.STT_FAST_QUEUE
+    else:
+        queue = settings.STT_BULK_QUEUE
+    return queue, stt_priority(duration)
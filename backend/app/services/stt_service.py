@@ -2,50 +2,418 @@
 STT Service - Faster-Whisper
 使用 faster-whisper 於 CPU 執行語音轉文字
 """
+import multiprocessing
+import os
+import resource
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from app.config import get_settings
 from app.core.logger import get_logger
+from app.services.audio_decoder import has_pcm_sidecar, load_pcm, pcm_sidecar_path, trim_for_stt
+from app.services.stt_batcher import STTBatcher
+from app.services.stt_tuning import tuning_for
+from app.services.transcript_cache import TranscriptCache
+from app.utils.audio_chunking import SAMPLE_RATE, plan_chunks, stitch_transcripts
 
+settings = get_settings()
 logger = get_logger(__name__)
 
+try:
+    from faster_whisper import WhisperModel
+except ImportError:  # Web 容器不安裝 faster-whisper
+    WhisperModel = None
 
-class STTService:
-    """Speech-to-Text Service"""
-    
-    def __init__(self):
-        try:
-            from faster_whisper import WhisperModel
-        except ImportError:
+
+def _resident_memory_mb() -> float:
+    """取得目前 Process 的常駐記憶體 (RSS, MB)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        # 非 Linux 環境退回峰值 RSS (Linux 單位為 KB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class WhisperModelRegistry:
+    """
+    Process 層級的 Whisper 模型註冊表
+
+    每個 Worker Process 只載入一次模型並於任務間共用，
+    避免每個任務重新建立 WhisperModel 造成的延遲與記憶體尖峰。
+    常駐模型數以 STT_MODEL_CACHE_SIZE 為上限，超過時釋放最久未使用的模型。
+    """
+
+    _models: "OrderedDict[str, Any]" = OrderedDict()
+    _stats: Dict[str, Dict[str, float]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, model_size: Optional[str] = None) -> Any:
+        """
+        取得 (必要時載入) 指定大小的模型
+
+        Args:
+            model_size: 模型大小，預設為 STT_MODEL_SIZE
+
+        Returns:
+            WhisperModel 實例
+        """
+        model_size = model_size or settings.STT_MODEL_SIZE
+        with cls._lock:
+            if model_size in cls._models:
+                cls._models.move_to_end(model_size)
+                return cls._models[model_size]
+
+            # 先釋放最久未使用的模型，避免載入時同時佔用兩份記憶體
+            while len(cls._models) >= max(1, settings.STT_MODEL_CACHE_SIZE):
+                evicted, _ = cls._models.popitem(last=False)
+                cls._stats.pop(evicted, None)
+                logger.info(f"Evicted Whisper model '{evicted}' from registry")
+
+            cls._models[model_size] = cls._load(model_size)
+            return cls._models[model_size]
+
+    @classmethod
+    def preload(cls, model_size: Optional[str] = None, warmup: bool = True) -> None:
+        """
+        預先載入並暖機模型 (於 worker_process_init 呼叫)
+
+        Args:
+            model_size: 模型大小，預設為 STT_MODEL_SIZE
+            warmup: 是否以一秒靜音執行一次推論，預先配置推論所需記憶體
+        """
+        model_size = model_size or settings.STT_MODEL_SIZE
+        model = cls.get(model_size)
+
+        if warmup:
+            import numpy as np
+
+            start = time.perf_counter()
+            segments, _ = model.transcribe(
+                np.zeros(16000, dtype=np.float32),
+                language=settings.STT_LANGUAGE,
+                vad_filter=False
+            )
+            list(segments)
+            cls._stats[model_size]["warmup_seconds"] = round(time.perf_counter() - start, 3)
+            cls._stats[model_size]["rss_mb"] = round(_resident_memory_mb(), 1)
+            logger.info(f"Whisper model warmed up: {cls._stats[model_size]}")
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, float]]:
+        """取得各模型的載入時間與載入後的常駐記憶體"""
+        return {size: dict(stat) for size, stat in cls._stats.items()}
+
+    @classmethod
+    def clear(cls) -> None:
+        """釋放所有已載入的模型 (主要供測試使用)"""
+        with cls._lock:
+            cls._models.clear()
+            cls._stats.clear()
+
+    @classmethod
+    def _load(cls, model_size: str) -> Any:
+        if WhisperModel is None:
             logger.error("faster-whisper is not installed. This service should only run in a worker container.")
-            raise
-            
+            raise ImportError("faster-whisper is not installed")
+
+        rss_before = _resident_memory_mb()
+        start = time.perf_counter()
+
         # NOTE: 如有需要且有足夠的資源，可以換更強的 model
-        # 使用 small model, CPU, int8 量化
         # Faster Whisper 的 model 選擇可以參考 https://github.com/SYSTRAN/faster-whisper/blob/master/faster_whisper/utils.py
-        self.model = WhisperModel("small", device="cpu", compute_type="int8")
-        logger.info("Faster-Whisper model loaded (small/CPU)")
-    
-    def transcribe(self, audio_path: str) -> str:
+        tuning = tuning_for(model_size)
+        model = WhisperModel(
+            model_size,
+            device="cpu",
+            compute_type=tuning["compute_type"],
+            cpu_threads=tuning["cpu_threads"],
+            # 切段並行 (thread 模式) 需要多個 worker 才能真正同時推論
+            num_workers=max(tuning["num_workers"], _chunk_workers() if _threaded_chunking() else 1)
+        )
+
+        rss_after = _resident_memory_mb()
+        cls._stats[model_size] = {
+            "load_seconds": round(time.perf_counter() - start, 3),
+            "rss_mb": round(rss_after, 1),
+            "rss_delta_mb": round(rss_after - rss_before, 1),
+        }
+        logger.info(
+            f"Faster-Whisper model loaded ({model_size}/CPU/{tuning['compute_type']}, "
+            f"threads={tuning['cpu_threads']}, workers={tuning['num_workers']}) "
+            f"in {cls._stats[model_size]['load_seconds']}s, RSS {cls._stats[model_size]['rss_mb']} MB"
+        )
+        return model
+
+
+def _chunk_workers() -> int:
+    return settings.STT_CHUNK_WORKERS or os.cpu_count() or 1
+
+
+def _threaded_chunking() -> bool:
+    return settings.STT_CHUNKED_ENABLED and settings.STT_CHUNK_POOL != "process"
+
+
+_chunk_pool: Optional[Executor] = None
+_chunk_pool_lock = threading.Lock()
+
+
+def _get_chunk_pool() -> Executor:
+    """取得 Process 內共用的切段轉錄執行池"""
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            if settings.STT_CHUNK_POOL == "process":
+                # 每個子 Process 各自載入一份模型，只在第一次建立時付出成本
+                # 使用 spawn 避免 fork 已啟動 CTranslate2 執行緒的 Process
+                _chunk_pool = ProcessPoolExecutor(
+                    max_workers=_chunk_workers(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=WhisperModelRegistry.get
+                )
+            else:
+                _chunk_pool = ThreadPoolExecutor(
+                    max_workers=_chunk_workers(),
+                    thread_name_prefix="stt-chunk"
+                )
+        return _chunk_pool
+
+
+def _transcribe_chunk(audio: Any, model_size: str, offset: float, core_start: float, core_end: float) -> str:
+    """
+    轉錄單一段落 (可於 Thread 或子 Process 執行)
+
+    只保留中點落在 core 範圍內的片段，重疊區的片段交由相鄰段落負責。
+    """
+    model = WhisperModelRegistry.get(model_size)
+    segments, _ = model.transcribe(
+        audio,
+        language=settings.STT_LANGUAGE,
+        beam_size=tuning_for(model_size)["beam_size"],
+        vad_filter=True
+    )
+
+    texts = []
+    for segment in segments:
+        midpoint = offset + (segment.start + segment.end) / 2
+        if core_start <= midpoint < core_end:
+            texts.append(segment.text)
+    return " ".join(texts)
+
+
+def _transcript_cache_key(cache: TranscriptCache, audio_path: str, model_size: str) -> str:
+    """逐字稿快取 Key (依模型與解碼設定區分，不需載入模型)"""
+    tuning = tuning_for(model_size)
+    model_tag = f"{model_size}:{tuning['compute_type']}:beam{tuning['beam_size']}"
+    if settings.STT_TRIM_SILENCE:
+        model_tag += f":trim{settings.STT_TRIM_THRESHOLD_DB}"
+    return cache.make_key(audio_path, model_tag)
+
+
+def lookup_cached_transcript(audio_path: str, model_size: str) -> Optional[str]:
+    """
+    查詢逐字稿快取 (未啟用快取、未命中或快取異常時回傳 None)
+
+    不需載入模型，Worker 可於建立 STTService 前先行查詢，
+    重複上傳不必等待模型載入，也不會擠掉常駐的模型。
+    """
+    if not settings.STT_CACHE_ENABLED:
+        return None
+    try:
+        cache = TranscriptCache()
+        cached = cache.get(_transcript_cache_key(cache, audio_path, model_size))
+    except Exception as e:
+        # 快取異常不影響轉錄
+        logger.warning(f"Transcript cache lookup failed: {e}")
+        return None
+    if cached is not None:
+        logger.info(f"Transcript cache hit: {len(cached)} chars")
+    return cached
+
+
+def store_cached_transcript(audio_path: str, model_size: str, transcript: str) -> None:
+    """寫入逐字稿快取 (失敗只記錄警告)"""
+    if not settings.STT_CACHE_ENABLED:
+        return
+    try:
+        cache = TranscriptCache()
+        cache.put(_transcript_cache_key(cache, audio_path, model_size), transcript)
+    except Exception as e:
+        logger.warning(f"Transcript cache write failed: {e}")
+
+
+class STTService:
+    """Speech-to-Text Service"""
+
+    def __init__(self, model_size: Optional[str] = None):
+        # 模型由 WhisperModelRegistry 於 Process 內共用，建立 Service 不再重新載入
+        self.model_size = model_size or settings.STT_MODEL_SIZE
+        self.tuning = tuning_for(self.model_size)
+        self.model = WhisperModelRegistry.get(self.model_size)
+        self.trim_report: Optional[Dict[str, float]] = None  # 最近一次轉錄的靜音移除報告
+
+    def transcribe_stream(self, audio: Any) -> Iterator[Tuple[str, float]]:
+        """
+        以串流方式轉錄音訊，解碼過程中逐段產生結果
+
+        Args:
+            audio: 音訊檔案路徑或 16 kHz PCM 陣列
+
+        Yields:
+            (片段文字, 已完成百分比 0~100)
+        """
+        segments, info = self.model.transcribe(
+            audio,
+            language=settings.STT_LANGUAGE,
+            beam_size=self.tuning["beam_size"],
+            vad_filter=True  # 語音活動檢測
+        )
+        for segment in segments:
+            progress = min(segment.end / info.duration * 100, 100.0) if info.duration else 0.0
+            yield segment.text, progress
+
+    def transcribe(
+        self,
+        audio_path: str,
+        on_progress: Optional[Callable[[float, str], None]] = None,
+        check_cache: bool = True
+    ) -> str:
         """
         轉錄音訊檔案為文字
-        
+
+        相同內容的音訊 (重送、重試) 會直接回傳快取的逐字稿。
+
         Args:
-            audio_path: 音訊檔案路徑
-            
+            audio_path: 音訊檔案路徑 (若有 Ingest 產生的 PCM 檔會優先使用)
+            on_progress: 進度回呼 (完成百分比, 目前為止的部分逐字稿)
+            check_cache: 是否查詢快取 (呼叫端已於載入模型前查過時設為 False，結果仍會寫入快取)
+
         Returns:
             轉錄的文字內容
         """
+        if check_cache:
+            cached = lookup_cached_transcript(audio_path, self.model_size)
+            if cached is not None:
+                if on_progress:
+                    on_progress(100.0, cached)
+                return cached
+
+        transcript = self._transcribe(audio_path, on_progress)
+        store_cached_transcript(audio_path, self.model_size, transcript)
+        return transcript
+
+    def _transcribe(
+        self,
+        audio_path: str,
+        on_progress: Optional[Callable[[float, str], None]] = None
+    ) -> str:
+        """實際執行轉錄 (依長度選擇單次、切段並行或跨任務批次)"""
         try:
-            segments, info = self.model.transcribe(
-                audio_path,
-                language="zh",  # 中文
-                vad_filter=True  # 語音活動檢測
-            )
-            
+            audio = audio_path
+            # Ingest 已預先解碼、需移除靜音，或需依長度選擇轉錄方式時，改以 PCM 陣列轉錄
+            if (has_pcm_sidecar(audio_path) or settings.STT_TRIM_SILENCE
+                    or settings.STT_CHUNKED_ENABLED or settings.STT_BATCH_ENABLED):
+                audio, self.trim_report = trim_for_stt(load_pcm(audio_path))
+                if self.trim_report:
+                    logger.info(
+                        f"Silence trimmed: {self.trim_report['removed_seconds']}s of "
+                        f"{self.trim_report['original_seconds']}s removed"
+                    )
+                duration = len(audio) / SAMPLE_RATE
+
+                # 長錄音：切段並行
+                if settings.STT_CHUNKED_ENABLED and duration >= settings.STT_CHUNK_MIN_SECONDS:
+                    return self._transcribe_chunked(audio, on_progress)
+
+                # 短語音：與其他任務合併批次推論，失敗時退回單獨轉錄
+                if settings.STT_BATCH_ENABLED and duration <= min(settings.STT_BATCH_MAX_SECONDS, 30):
+                    # 未移除靜音時 Sidecar 與 audio 內容相同，Leader 可直接讀取
+                    pcm_path = pcm_sidecar_path(audio_path) if self.trim_report is None and has_pcm_sidecar(audio_path) else None
+                    transcript = STTBatcher(self.model, self.model_size, self.tuning["beam_size"]).transcribe(
+                        audio, audio_path, pcm_path
+                    )
+                    if transcript is not None:
+                        if on_progress:
+                            on_progress(100.0, transcript)
+                        logger.info(f"Transcription completed (batched): {len(transcript)} chars")
+                        return transcript
+
             # 組合所有片段
-            transcript = " ".join([segment.text for segment in segments])
-            
+            texts = []
+            for text, progress in self.transcribe_stream(audio):
+                texts.append(text)
+                if on_progress:
+                    on_progress(progress, " ".join(texts).strip())
+            transcript = " ".join(texts)
+
             logger.info(f"Transcription completed: {len(transcript)} chars")
             return transcript.strip()
-            
+
         except Exception as e:
             logger.error(f"STT failed: {e}", exc_info=True)
             raise
+
+    def _transcribe_chunked(
+        self,
+        audio: Any,
+        on_progress: Optional[Callable[[float, str], None]] = None
+    ) -> str:
+        """
+        長錄音切段並行轉錄
+
+        1. 以 VAD 找出語音區段，於靜音處切段
+        2. 各段交由執行池並行轉錄
+        3. 依原順序拼接並去除重疊區重複文字
+        """
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        start = time.perf_counter()
+        speech_spans = get_speech_timestamps(
+            audio,
+            VadOptions(max_speech_duration_s=settings.STT_CHUNK_MAX_SECONDS),
+            sampling_rate=SAMPLE_RATE
+        )
+        chunks = plan_chunks(
+            speech_spans,
+            total_samples=len(audio),
+            max_chunk_seconds=settings.STT_CHUNK_MAX_SECONDS,
+            overlap_seconds=settings.STT_CHUNK_OVERLAP_SECONDS
+        )
+
+        pool = _get_chunk_pool()
+        futures = {
+            pool.submit(
+                _transcribe_chunk,
+                audio[chunk["start"]:chunk["end"]],
+                self.model_size,
+                chunk["start"] / SAMPLE_RATE,
+                chunk["core_start"] / SAMPLE_RATE,
+                chunk["core_end"] / SAMPLE_RATE
+            ): index
+            for index, chunk in enumerate(chunks)
+        }
+
+        # 依完成順序回報進度，部分逐字稿只拼接從頭開始已連續完成的段落
+        parts = [None] * len(chunks)
+        for done, future in enumerate(as_completed(futures), start=1):
+            parts[futures[future]] = future.result()
+            if on_progress:
+                completed_prefix = []
+                for part in parts:
+                    if part is None:
+                        break
+                    completed_prefix.append(part)
+                on_progress(done / len(chunks) * 100, stitch_transcripts(completed_prefix))
+
+        transcript = stitch_transcripts(parts)
+
+        logger.info(
+            f"Chunked transcription completed: {len(chunks)} chunks, "
+            f"{len(audio) / SAMPLE_RATE:.0f}s audio in {time.perf_counter() - start:.1f}s, {len(transcript)} chars"
+        )
+        return transcript
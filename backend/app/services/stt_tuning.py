@@ -0,0 +1,54 @@
+"""
+STT Tuning Profile
+Whisper 的 CPU 調校參數 (compute_type / cpu_threads / num_workers / beam_size / rtf)
+
+調校檔由 scripts/benchmark_whisper.py 於本機量測後產生，依 STT_PROFILE_MODE
+(latency / throughput) 選用；未涵蓋的模型或欄位使用預設值。
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict
+
+from app.config import get_settings
+from app.core.logger import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+@lru_cache(maxsize=None)
+def load_tuning_profile() -> Dict[str, Dict[str, Any]]:
+    """
+    載入 CPU 調校檔 (由 scripts/benchmark_whisper.py 於本機產生)
+
+    Returns:
+        依模型大小索引的調校參數，檔案不存在時回傳空字典
+    """
+    try:
+        with open(settings.STT_PROFILE_PATH, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Invalid STT tuning profile {settings.STT_PROFILE_PATH}: {e}")
+        return {}
+
+    tuned = profile.get(settings.STT_PROFILE_MODE, {})
+    logger.info(f"Loaded STT tuning profile '{settings.STT_PROFILE_MODE}' for models: {list(tuned)}")
+    return tuned
+
+
+def tuning_for(model_size: str) -> Dict[str, Any]:
+    """
+    取得指定模型的調校參數 (調校檔未涵蓋的欄位使用預設值)
+
+    Returns:
+        {"compute_type", "cpu_threads", "num_workers", "beam_size", "rtf" (選用)}
+    """
+    return {
+        "compute_type": settings.STT_COMPUTE_TYPE,
+        "cpu_threads": 0,  # 0 表示由 CTranslate2 自行決定
+        "num_workers": 1,
+        "beam_size": 5,
+        **load_tuning_profile().get(model_size, {}),
+    }
@@ -0,0 +1,82 @@
+"""
+Template Predictor
+於路由判斷完成前預測摘要模板，供推測式摘要 (Speculative Summarization) 使用
+
+預測依序採用：
+1. 逐字稿關鍵字計分 (本機計算，無需呼叫 LLM)
+2. 最近一次路由選用的模板
+3. general
+"""
+from typing import Dict
+
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+
+logger = get_logger(__name__)
+
+LAST_TEMPLATE_KEY = "llm_template:last"
+HITS_KEY = "llm_speculation:hits"
+MISSES_KEY = "llm_speculation:misses"
+
+# 各模板的關鍵字 (逐字稿為 Whisper 輸出，繁簡皆可能出現)
+TEMPLATE_KEYWORDS: Dict[str, tuple] = {
+    "meeting": ("會議", "会议", "開會", "开会", "週會", "周会", "討論", "讨论", "決議", "决议", "議程", "meeting"),
+    "todo": ("待辦", "待办", "要做", "記得", "记得", "提醒", "截止", "deadline", "todo"),
+    "idea": ("想法", "靈感", "灵感", "點子", "点子", "構想", "构想", "如果可以", "idea"),
+}
+
+
+def predict_template(transcript: str) -> str:
+    """
+    預測摘要模板
+
+    Args:
+        transcript: 語音逐字稿
+
+    Returns:
+        模板類型 (meeting / idea / todo / general)
+    """
+    text = transcript.lower()
+    scores = {
+        template_type: sum(text.count(keyword) for keyword in keywords)
+        for template_type, keywords in TEMPLATE_KEYWORDS.items()
+    }
+    best = max(scores, key=scores.get)
+    if scores[best] > 0:
+        return best
+
+    try:
+        return redis_client.get(LAST_TEMPLATE_KEY) or "general"
+    except Exception as e:
+        logger.warning(f"Failed to read last template: {e}")
+        return "general"
+
+
+def record_speculation(predicted: str, actual: str) -> bool:
+    """
+    記錄推測結果並更新最近使用的模板
+
+    Returns:
+        是否命中
+    """
+    hit = predicted == actual
+    try:
+        pipe = redis_client.pipeline()
+        pipe.incr(HITS_KEY if hit else MISSES_KEY)
+        pipe.set(LAST_TEMPLATE_KEY, actual)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record speculation result: {e}")
+    return hit
+
+
+def speculation_stats() -> Dict[str, float]:
+    """取得推測式摘要命中統計"""
+    hits = int(redis_client.get(HITS_KEY) or 0)
+    misses = int(redis_client.get(MISSES_KEY) or 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,129 @@
+"""
+Transcript Cache Service
+以音訊內容雜湊快取逐字稿，iOS Shortcuts 重送或任務重試時跳過重複的 Whisper 轉錄
+
+- Key: sha256(音訊內容) + 模型 / 解碼 / 語言設定
+- Backend: Redis (預設) 或本機磁碟，皆以 LRU 淘汰並限制筆數
+- 命中 / 未命中計數存於 Redis，可由 /stats 查詢
+"""
+import hashlib
+import os
+import time
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.core.logger import get_logger
+from app.core.redis_client import redis_client
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+KEY_PREFIX = "stt_cache"
+LRU_KEY = f"{KEY_PREFIX}:lru"
+HITS_KEY = f"{KEY_PREFIX}:hits"
+MISSES_KEY = f"{KEY_PREFIX}:misses"
+
+
+class TranscriptCache:
+    """逐字稿快取 (Redis 或本機磁碟，LRU 淘汰)"""
+
+    def __init__(self, backend: Optional[str] = None, max_entries: Optional[int] = None):
+        self.backend = backend or settings.STT_CACHE_BACKEND
+        self.max_entries = max_entries or settings.STT_CACHE_MAX_ENTRIES
+        self.cache_dir = settings.STT_CACHE_DIR
+
+    @staticmethod
+    def make_key(audio_path: str, model_tag: str) -> str:
+        """
+        計算快取 Key
+
+        Args:
+            audio_path: 原始音訊檔案路徑 (以內容計算雜湊，與檔名無關)
+            model_tag: 實際使用的模型與解碼設定 (如 "small:int8:beam5")
+
+        Returns:
+            十六進位雜湊字串
+        """
+        content_hash = hashlib.sha256()
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                content_hash.update(block)
+
+        settings_tag = f"{model_tag}:{settings.STT_LANGUAGE}"
+        return hashlib.sha256(f"{content_hash.hexdigest()}:{settings_tag}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """讀取快取並更新 LRU 順序，未命中回傳 None"""
+        if self.backend == "disk":
+            transcript = self._disk_get(key)
+        else:
+            transcript = redis_client.get(f"{KEY_PREFIX}:{key}")
+            if transcript is not None:
+                redis_client.zadd(LRU_KEY, {key: time.time()})
+
+        redis_client.incr(HITS_KEY if transcript is not None else MISSES_KEY)
+        return transcript
+
+    def put(self, key: str, transcript: str) -> None:
+        """寫入快取，超過筆數上限時淘汰最久未使用的項目"""
+        if self.backend == "disk":
+            self._disk_put(key, transcript)
+            return
+
+        pipe = redis_client.pipeline()
+        pipe.set(f"{KEY_PREFIX}:{key}", transcript)
+        pipe.zadd(LRU_KEY, {key: time.time()})
+        pipe.zcard(LRU_KEY)
+        size = pipe.execute()[-1]
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = [member for member, _ in redis_client.zpopmin(LRU_KEY, overflow)]
+            if evicted:
+                redis_client.delete(*[f"{KEY_PREFIX}:{member}" for member in evicted])
+                logger.info(f"Transcript cache evicted {len(evicted)} entries")
+
+    @staticmethod
+    def stats() -> Dict[str, int]:
+        """取得命中 / 未命中計數"""
+        hits, misses = redis_client.mget(HITS_KEY, MISSES_KEY)
+        hits, misses = int(hits or 0), int(misses or 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                transcript = f.read()
+        except FileNotFoundError:
+            return None
+        # 以 mtime 記錄最近使用時間
+        os.utime(path)
+        return transcript
+
+    def _disk_put(self, key: str, transcript: str) -> None:
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(transcript)
+        os.replace(tmp_path, path)
+
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".txt")]
+        overflow = len(entries) - self.max_entries
+        if overflow > 0:
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:overflow]:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass  # 其他 Worker 已淘汰
+            logger.info(f"Transcript cache evicted {overflow} entries")
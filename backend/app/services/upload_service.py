@@ -0,0 +1,161 @@
+"""
+Upload Service
+以串流方式將上傳的音訊寫入磁碟，每個上傳的記憶體用量固定為單一 Chunk
+
+- 第一個 Chunk 即驗證 Magic Number，不支援的格式不會寫入完整檔案
+- 逐 Chunk 累計大小，超過 MAX_FILE_SIZE 立即中止
+- 先寫入 /data 內的暫存檔，完成後原子性改名，Worker 不會讀到寫入一半的檔案
+- 寫入完成後沿用同一個檔案 Handle 與已驗證的格式推算音訊長度，不重新開檔驗證
+- multipart/form-data 亦直接解析 Request 串流，不經 Starlette 表單解析 (會先將整個檔案暫存至磁碟)
+"""
+import os
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.logger import get_logger
+from app.services.audio_validator import validate_audio_format, probe_duration, MAX_FILE_SIZE, HEADER_BYTES
+
+logger = get_logger(__name__)
+
+DATA_DIR = "/data"
+
+
+async def iter_multipart_file(request: Request, field: str = "audio") -> AsyncIterator[bytes]:
+    """
+    逐 Chunk 解析 multipart/form-data Request Body，只輸出指定檔案欄位的內容
+
+    Raises:
+        HTTPException: Content-Type 不是 multipart/form-data (400) 或缺少檔案欄位 (422)
+    """
+    from python_multipart.multipart import MultipartParser, parse_options_header
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="需以 multipart/form-data 上傳")
+
+    target = field.encode()
+    state = {"field": b"", "value": b"", "in_file": False, "found": False, "done": False}
+    headers: Dict[bytes, bytes] = {}
+    out: List[bytes] = []
+
+    def on_part_begin() -> None:
+        headers.clear()
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        state["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        state["value"] += data[start:end]
+
+    def on_header_end() -> None:
+        headers[state["field"].lower()] = state["value"]
+        state["field"], state["value"] = b"", b""
+
+    def on_headers_finished() -> None:
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        # 只取第一個同名檔案欄位
+        state["in_file"] = not state["done"] and options.get(b"name") == target and b"filename" in options
+        state["found"] = state["found"] or state["in_file"]
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if state["in_file"]:
+            out.append(bytes(data[start:end]))
+
+    def on_part_end() -> None:
+        if state["in_file"]:
+            state["in_file"], state["done"] = False, True
+
+    parser = MultipartParser(boundary, callbacks={
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    async for chunk in request.stream():
+        parser.write(chunk)
+        if out:
+            yield b"".join(out)
+            out.clear()
+    parser.finalize()
+    if out:
+        yield b"".join(out)
+
+    if not state["found"]:
+        raise HTTPException(status_code=422, detail=f"缺少檔案欄位: {field}")
+
+
+async def save_upload_stream(
+    chunks: AsyncIterator[bytes], data_dir: str = DATA_DIR
+) -> Tuple[str, Optional[float]]:
+    """
+    串流寫入上傳的音訊檔案
+
+    Args:
+        chunks: 音訊內容的 Async Iterator (request.stream() 或 iter_multipart_file)
+        data_dir: 存放目錄
+
+    Returns:
+        (檔案路徑 ({data_dir}/{uuid}{ext}), 由容器標頭推算的音訊長度 (秒，無法判斷時為 None))
+
+    Raises:
+        HTTPException: 未收到資料 (400)、格式不支援 (400) 或檔案過大 (413)
+    """
+    os.makedirs(data_dir, mode=0o700, exist_ok=True)  # 限制目錄權限為僅擁有者可存取
+    file_id = str(uuid.uuid4())  # 防止路徑注入攻擊
+    tmp_path = os.path.join(data_dir, f".{file_id}.part")
+
+    f = await run_in_threadpool(open, tmp_path, "w+b")
+    try:
+        head = b""
+        file_ext = None
+        total = 0
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            total += len(chunk)
+            if total > MAX_FILE_SIZE:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"檔案過大 (最大 {MAX_FILE_SIZE // 1024 // 1024}MB)"
+                )
+
+            if file_ext is None:
+                # 累積到足以判斷格式的長度後才驗證並開始寫入
+                head += chunk
+                if len(head) < HEADER_BYTES:
+                    continue
+                file_ext = validate_audio_format(head)
+                chunk, head = head, b""
+
+            await run_in_threadpool(f.write, chunk)
+
+        if total == 0:
+            raise HTTPException(status_code=400, detail="未收到音訊資料")
+        if file_ext is None:
+            # 檔案小於 HEADER_BYTES，交由驗證回報錯誤
+            file_ext = validate_audio_format(head)
+            await run_in_threadpool(f.write, head)
+
+        # ⏱️ 由容器標頭取得音訊長度 (不解碼)，供排程與模型選擇使用
+        await run_in_threadpool(f.flush)
+        duration = await run_in_threadpool(probe_duration, f, file_ext, total)
+
+        await run_in_threadpool(f.close)
+        file_path = os.path.join(data_dir, f"{file_id}{file_ext}")
+        os.replace(tmp_path, file_path)
+        logger.info(f"Upload streamed to disk: {file_path} ({total} bytes, duration: {duration})")
+        return file_path, duration
+
+    except BaseException:
+        f.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,105 @@
+"""
+Audio Chunking Utilities
+長錄音切段與轉錄結果拼接：依 VAD 靜音邊界切段，並於拼接時去除重疊區的重複文字
+"""
+from typing import List, Dict
+
+SAMPLE_RATE = 16000
+
+
+def plan_chunks(
+    speech_spans: List[Dict[str, int]],
+    total_samples: int,
+    max_chunk_seconds: float = 60.0,
+    overlap_seconds: float = 1.0,
+    sample_rate: int = SAMPLE_RATE
+) -> List[Dict[str, int]]:
+    """
+    依 VAD 語音區段規劃切段
+
+    相鄰語音區段會合併至單一段落，直到超過 max_chunk_seconds；
+    切點落在兩個語音區段間的靜音中點。每段前後再各延伸 overlap_seconds，
+    避免切點附近的字詞被截斷。
+
+    Args:
+        speech_spans: VAD 輸出的語音區段 [{"start": sample, "end": sample}, ...]
+        total_samples: 音訊總取樣數
+        max_chunk_seconds: 單段最長秒數
+        overlap_seconds: 每段前後延伸的重疊秒數
+        sample_rate: 取樣率
+
+    Returns:
+        [{"start", "end", "core_start", "core_end"}, ...]
+        start/end 為含重疊的實際轉錄範圍；core_start/core_end 為互不重疊的歸屬範圍，
+        用於判斷片段 (Segment) 應歸屬於哪一段。
+    """
+    if total_samples <= 0:
+        return []
+
+    max_samples = int(max_chunk_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+
+    # 1. 以靜音中點作為切點，合併相鄰語音區段
+    cut_points = [0]
+    chunk_start = 0
+    for prev, curr in zip(speech_spans, speech_spans[1:]):
+        if curr["end"] - chunk_start > max_samples:
+            cut = (prev["end"] + curr["start"]) // 2
+            if cut > chunk_start:
+                cut_points.append(cut)
+                chunk_start = cut
+
+    # 2. 單一語音區段仍過長時 (長時間無停頓)，強制等分切段
+    bounds = []
+    for start, end in zip(cut_points, cut_points[1:] + [total_samples]):
+        while end - start > max_samples:
+            bounds.append((start, start + max_samples))
+            start += max_samples
+        if end > start:
+            bounds.append((start, end))
+
+    return [
+        {
+            "start": max(0, core_start - overlap),
+            "end": min(total_samples, core_end + overlap),
+            "core_start": core_start,
+            "core_end": core_end,
+        }
+        for core_start, core_end in bounds
+    ]
+
+
+def stitch_transcripts(parts: List[str], max_overlap_chars: int = 20) -> str:
+    """
+    依序拼接各段轉錄文字，並移除重疊區造成的重複
+
+    若前一段的結尾與下一段的開頭相同 (長度至多 max_overlap_chars)，
+    則只保留一次。
+
+    Args:
+        parts: 依時間順序排列的各段文字
+        max_overlap_chars: 重複比對的最大字元數
+
+    Returns:
+        拼接後的完整逐字稿
+    """
+    result = ""
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        if not result:
+            result = part
+            continue
+
+        overlap = 0
+        for size in range(min(max_overlap_chars, len(result), len(part)), 1, -1):
+            if result.endswith(part[:size]):
+                overlap = size
+                break
+
+        remainder = part[overlap:].lstrip()
+        if remainder:
+            result = f"{result} {remainder}"
+
+    return result
@@ -9,6 +9,7 @@ from mistune.plugins.task_lists import task_lists
 
 # Notion API 限制
 # REFERENCE: https://developers.notion.com/reference/request-limits
+# children 數量不在此截斷，由 NotionBlockWriter 分批寫入
 NOTION_RICH_TEXT_LIMIT = 2000
 NOTION_BLOCK_CHILDREN_LIMIT = 100
 
@@ -103,7 +104,7 @@ class NotionMarkdownParser:
             
             if nested_tokens:
                 cb = self._process_tokens(nested_tokens)
-                if cb: item_data["children"] = cb[:NOTION_BLOCK_CHILDREN_LIMIT]
+                if cb: item_data["children"] = cb
                 
             blocks.append({"object": "block", "type": block_type, block_type: item_data})
         return blocks
@@ -138,7 +139,7 @@ class NotionMarkdownParser:
                 "table_width": max_cols,
                 "has_column_header": has_column_header,
                 "has_row_header": False,
-                "children": rows[:NOTION_BLOCK_CHILDREN_LIMIT]
+                "children": rows
             }
         }
 
@@ -0,0 +1,110 @@
+"""
+Silence Trimming Utilities
+以 NumPy 向量化計算短時能量，於 Whisper 推論前移除頭尾靜音並壓縮過長的停頓
+"""
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from app.utils.audio_chunking import SAMPLE_RATE
+
+
+def trim_silence(
+    pcm: Any,
+    sample_rate: int = SAMPLE_RATE,
+    threshold_db: float = -40.0,
+    frame_ms: int = 20,
+    min_gap_seconds: float = 1.0,
+    keep_gap_seconds: float = 0.3,
+    pad_seconds: float = 0.1
+) -> Tuple[Any, Dict[str, float]]:
+    """
+    移除頭尾靜音，並將超過 min_gap_seconds 的內部停頓壓縮為 keep_gap_seconds
+
+    Args:
+        pcm: 一維 float32 PCM (範圍 -1~1)
+        sample_rate: 取樣率
+        threshold_db: 低於此能量 (dBFS) 的音框視為靜音
+        frame_ms: 音框長度 (毫秒)
+        min_gap_seconds: 超過此長度的內部停頓才會被壓縮
+        keep_gap_seconds: 壓縮後保留的停頓長度
+        pad_seconds: 語音前後額外保留的長度，避免切掉字首字尾
+
+    Returns:
+        (處理後的 PCM, 報告 {"original_seconds", "trimmed_seconds", "removed_seconds",
+                             "leading_seconds", "trailing_seconds", "internal_seconds"})
+        未移除任何內容時回傳原陣列 (不複製)
+    """
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(pcm) // frame_len
+    original_seconds = len(pcm) / sample_rate
+    report = {
+        "original_seconds": round(original_seconds, 2),
+        "trimmed_seconds": round(original_seconds, 2),
+        "removed_seconds": 0.0,
+        "leading_seconds": 0.0,
+        "trailing_seconds": 0.0,
+        "internal_seconds": 0.0,
+    }
+    if n_frames == 0:
+        return pcm, report
+
+    # 1. 每個音框的 RMS 能量 (dBFS)
+    frames = np.asarray(pcm[:n_frames * frame_len], dtype=np.float32).reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    voiced = 20 * np.log10(rms + 1e-10) > threshold_db
+
+    if not voiced.any():
+        # 整段皆為靜音時不處理，交由 Whisper VAD 判斷
+        return pcm, report
+
+    # 2. 語音音框前後各延伸 pad_frames (以累積和實作的一維膨脹)
+    pad_frames = int(pad_seconds * 1000 / frame_ms)
+    if pad_frames:
+        counts = np.concatenate(([0], np.cumsum(voiced)))
+        lo = np.clip(np.arange(n_frames) - pad_frames, 0, n_frames)
+        hi = np.clip(np.arange(n_frames) + pad_frames + 1, 0, n_frames)
+        voiced = (counts[hi] - counts[lo]) > 0
+
+    # 3. 找出所有靜音區段 [start, end)
+    edges = np.diff(np.concatenate(([1], voiced.astype(np.int8), [1])))
+    silence_starts = np.flatnonzero(edges == -1)
+    silence_ends = np.flatnonzero(edges == 1)
+
+    keep = np.ones(n_frames, dtype=bool)
+    min_gap_frames = int(min_gap_seconds * 1000 / frame_ms)
+    half_keep = int(keep_gap_seconds * 1000 / frame_ms) // 2
+    leading = trailing = internal = 0
+
+    for start, end in zip(silence_starts, silence_ends):
+        if start == 0:
+            keep[start:end] = False
+            leading = end - start
+        elif end == n_frames:
+            keep[start:end] = False
+            trailing = end - start
+        elif end - start > min_gap_frames:
+            # 保留停頓前後各一半，讓 Whisper 仍能辨識斷句
+            keep[start + half_keep:end - half_keep] = False
+            internal += end - start - 2 * half_keep
+
+    # 尾端不足一個音框的取樣跟隨最後一個音框
+    tail = len(pcm) - n_frames * frame_len
+    sample_keep = np.repeat(keep, frame_len)
+    if tail:
+        sample_keep = np.concatenate((sample_keep, np.full(tail, keep[-1])))
+
+    removed_frames = leading + trailing + internal
+    if removed_frames == 0:
+        return pcm, report
+
+    trimmed = np.asarray(pcm)[sample_keep]
+    frame_seconds = frame_ms / 1000
+    report.update({
+        "trimmed_seconds": round(len(trimmed) / sample_rate, 2),
+        "removed_seconds": round((len(pcm) - len(trimmed)) / sample_rate, 2),
+        "leading_seconds": round(leading * frame_seconds, 2),
+        "trailing_seconds": round(trailing * frame_seconds, 2),
+        "internal_seconds": round(internal * frame_seconds, 2),
+    })
+    return trimmed, report
@@ -1,116 +1,464 @@
 """
 Celery Background Tasks
 處理語音筆記的完整 Pipeline
+
+Pipeline 拆分為多個 Stage 並以 Celery chain 串接，依負載類型分派至不同佇列：
+- stt_fast / stt_bulk 佇列 (CPU-bound, 低並行 prefork)：transcribe_stage，依音訊長度分派並設定優先序
+- io 佇列 (網路等待, 高並行 threads)：route_stage → summarize_stage → notion_stage → notify_stage
+
+每個 Stage 接收並回傳同一份 note 字典，前一階段的結果隨 chain 傳遞。
+慢速的 Notion / Gemini 呼叫不再佔用載有 Whisper 模型的 Worker。
+
+各 Stage 結果同時寫入 NoteCheckpoint，重試或訊息重新投遞時直接沿用，
+不會重新轉錄，也不會重複寫入 Notion。
+
+發送 Pipeline 時同時於 io 佇列執行 prefetch_page_tree，與轉錄並行同步 Notion 頁面樹，
+路由階段再等待其檢查點。
 """
+import functools
 import os
-from typing import Optional, Dict
+import time
+import uuid
+from typing import Optional, Dict, Any
+from celery import chain
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from app.config import get_settings
 from app.core.celery_app import celery_app
-from app.services.stt_service import STTService
+from app.services.stt_service import STTService, WhisperModelRegistry, lookup_cached_transcript
 from app.services.llm_service import LLMService
 from app.services.notion_service import NotionService
 from app.services.notification_service import NotificationService
+from app.services.progress_service import TaskProgress
+from app.services.checkpoint_service import NoteCheckpoint
+from app.services.audio_decoder import remove_pcm_sidecar
+from app.services.model_policy import choose_model_for
+from app.services.stt_scheduler import stt_route
+from app.services.template_predictor import predict_template, record_speculation
 from app.core.logger import get_logger
+from app.core.metrics import track_stage, observe_queue_wait, reset_multiproc_dir, start_metrics_server, mark_process_dead
 from app.schemas.context import UserContext
 from app.core.security import TaskSecurity
 
 logger = get_logger(__name__)
+settings = get_settings()
 
 
-@celery_app.task(bind=True, max_retries=3)
-def process_voice_note(self, file_path: str, encrypted_context: Optional[str] = None):
+@worker_init.connect
+def start_worker_metrics(**kwargs):
+    """
+    Worker 主 Process 啟動時 (fork 子 Process 前) 清除舊指標並啟動 /metrics Server
+
+    不論是否啟動 Server 都需建立 Multiprocess 目錄，
+    否則設定 PROMETHEUS_MULTIPROC_DIR 時每次記錄指標都會找不到檔案。
+    """
+    try:
+        reset_multiproc_dir()
+    except Exception as e:
+        logger.error(f"Failed to reset metrics directory: {e}", exc_info=True)
+
+    if not settings.METRICS_WORKER_PORT:
+        return
+    try:
+        start_metrics_server(settings.METRICS_WORKER_PORT)
+    except Exception as e:
+        logger.error(f"Failed to start metrics server: {e}", exc_info=True)
+
+
+@worker_process_shutdown.connect
+def cleanup_worker_metrics(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
+
+
+@worker_process_init.connect
+def preload_whisper_model(**kwargs):
+    """
+    Worker 子 Process 啟動時預先載入 Whisper 模型
+
+    模型由 WhisperModelRegistry 於 Process 內共用，任務不再各自載入。
+    (io Worker 應設定 STT_PRELOAD_MODEL=false)
     """
-    處理語音筆記 Pipeline（兩階段 LLM）
-    
-    0. 解析 Context (解密)
-    1. STT: 語音轉文字
-    2. LLM Stage 1: 路由判斷 (Tree Routing)
-    3. LLM Stage 2: 依模板生成摘要
-    4. Notion: create_subpage 或 append_to_page
-    5. Line: 推播通知
+    if not settings.STT_PRELOAD_MODEL:
+        return
+    try:
+        WhisperModelRegistry.preload()
+    except Exception as e:
+        # 預載失敗不阻擋 Worker 啟動，首個任務會再嘗試載入
+        logger.error(f"Failed to preload Whisper model: {e}", exc_info=True)
+
+
+def enqueue_voice_note(
+    file_path: str,
+    encrypted_context: Optional[str] = None,
+    note_id: Optional[str] = None,
+    duration: Optional[float] = None,
+    owner: Optional[str] = None
+):
+    """
+    發送語音筆記 Pipeline
+
+    先產生 Note ID 並寫入 queued 狀態，避免與 Worker 回報的進度產生競態。
+    Note ID 同時作為 chain 最後一個 Stage 的 Task ID，回傳給客戶端查詢狀態。
 
     Args:
         file_path: 音訊檔案路徑
         encrypted_context: 加密後的使用者上下文字串
+        note_id: 指定 Note ID (預設自動產生)
+        duration: Ingest 時由標頭取得的音訊長度 (秒)，未知時為 None
+        owner: 上傳者識別 (TaskSecurity.owner_of)，查詢任務狀態時比對
+
+    Returns:
+        AsyncResult (id 即為 Note ID)
+    """
+    note_id = note_id or str(uuid.uuid4())
+    # 最短任務優先：依音訊長度決定轉錄通道與優先序
+    stt_queue, stt_priority = stt_route(duration)
+    note = {
+        "note_id": note_id,
+        "file_path": file_path,
+        "encrypted_context": encrypted_context,
+        "enqueued_at": time.time(),
+        "duration": duration,
+        "stt_queue": stt_queue,
+    }
+    TaskProgress(note_id).update("queued", duration=duration, owner=owner)
+
+    if settings.PAGE_TREE_PREFETCH_ENABLED:
+        note["prefetch_id"] = prefetch_page_tree.apply_async(args=(note,)).id
+
+    pipeline = chain(
+        transcribe_stage.s(note).set(queue=stt_queue, priority=stt_priority),
+        route_stage.s(),
+        summarize_stage.s(),
+        notion_stage.s(),
+        notify_stage.s(),
+    )
+    return pipeline.apply_async(task_id=note_id)
+
+
+def _load_context(note: Dict[str, Any]) -> Optional[UserContext]:
+    """解析 Context (解密)"""
+    encrypted_context = note.get("encrypted_context")
+    if not encrypted_context:
+        return None
+    context_dict = TaskSecurity.decrypt_payload(encrypted_context)
+    return UserContext(**context_dict)
+
+
+def _await_page_tree(note: Dict[str, Any], checkpoint: NoteCheckpoint) -> Optional[Dict[str, Any]]:
+    """
+    等待預取的頁面樹
+
+    預取任務結束 (成功或失敗) 或超過 PAGE_TREE_PREFETCH_WAIT_SECONDS 即停止等待，
+    取不到時回傳 None，由呼叫端自行同步。
+    """
+    page_tree = checkpoint.get("page_tree")
+    prefetch_id = note.get("prefetch_id")
+    if page_tree is not None or not prefetch_id:
+        return page_tree
+
+    deadline = time.monotonic() + settings.PAGE_TREE_PREFETCH_WAIT_SECONDS
+    prefetch = celery_app.AsyncResult(prefetch_id)
+    while time.monotonic() < deadline:
+        if prefetch.ready():
+            return checkpoint.get("page_tree")
+        time.sleep(0.5)
+        page_tree = checkpoint.get("page_tree")
+        if page_tree is not None:
+            return page_tree
+
+    logger.warning(f"Page tree prefetch for note {note['note_id']} timed out, syncing inline")
+    return None
+
+
+def instrumented_stage(stage: str):
+    """
+    Stage 指標裝飾器
+
+    記錄佇列等待時間 (上一階段交接或排入佇列至開始執行，重試不計) 與處理時間，
+    並於回傳的 note 寫入交接時間供下一階段計算。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, note: Dict[str, Any]):
+            if not self.request.retries:
+                observe_queue_wait(stage, note.get("handoff_at") or note["enqueued_at"])
+            with track_stage(stage):
+                result = func(self, note)
+            if isinstance(result, dict) and "note_id" in result:
+                result["handoff_at"] = time.time()
+            return result
+        return wrapper
+    return decorator
+
+
+def _retry_stage(task, note: Dict[str, Any], stage: str, exc: Exception):
+    """記錄 Stage 失敗並以指數退避重試 (僅重跑失敗的 Stage)"""
+    logger.error(f"Stage '{stage}' failed for note {note['note_id']}: {exc}", exc_info=True)
+    final = task.request.retries >= task.max_retries
+    TaskProgress(note["note_id"]).update("failed" if final else "retrying", error=f"{stage}: {exc}")
+    # Retry with exponential backoff
+    return task.retry(exc=exc, countdown=60 * (2 ** task.request.retries))
+
+
+@celery_app.task(bind=True, max_retries=3)
+@instrumented_stage("transcribe")
+def transcribe_stage(self, note: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Stage 1 (stt 佇列): 語音轉文字
+
+    模型已於 Process 啟動時載入，解碼過程中回報部分逐字稿。
+    啟用 STT_ADAPTIVE_MODEL 時依音訊長度與佇列深度選擇模型。
     """
+    progress = TaskProgress(note["note_id"])
+    checkpoint = NoteCheckpoint(note["note_id"])
+    file_path = note["file_path"]
     try:
+        saved = checkpoint.get("transcript")
+        if saved:
+            return {**note, **saved}
+
         logger.info(f"Processing voice note: {file_path}")
-        
-        # 0. 解析 Context (解密)
-        context = None
-        if encrypted_context:
-            context_dict = TaskSecurity.decrypt_payload(encrypted_context)
-            context = UserContext(**context_dict)
-            logger.info(f"Task context initialized (Mode: {context.type})")
-        
-        # 1. STT
-        stt_service = STTService()
-        transcript = stt_service.transcribe(file_path)
-        logger.info(f"Transcript: {transcript[:100]}...")
-        
-        # 2. Notion: 同步頁面樹狀結構
-        notion_service = NotionService(context=context)
-        page_tree = notion_service.sync_page_tree()
-        
-        # 3. LLM Stage 1: 路由判斷
+
+        if settings.STT_ADAPTIVE_MODEL:
+            queues = [note["stt_queue"]] if note.get("stt_queue") else None
+            model_size = choose_model_for(file_path, note.get("duration"), queues)
+        else:
+            model_size = settings.STT_MODEL_SIZE
+        progress.update("transcribing", model=model_size)
+        # 重複上傳先查快取，命中時不需載入模型
+        transcript = lookup_cached_transcript(file_path, model_size)
+        silence_removed = 0.0
+        if transcript is None:
+            stt_service = STTService(model_size)
+            transcript = stt_service.transcribe(
+                file_path,
+                on_progress=lambda percent, partial: progress.stream("transcribing", percent, partial),
+                check_cache=False
+            )
+            silence_removed = (stt_service.trim_report or {}).get("removed_seconds", 0.0)
+        logger.info(f"Transcript ({model_size}): {transcript[:100]}...")
+        progress.update("transcribed", 100, transcript, silence_removed_seconds=silence_removed)
+
+        result = {
+            "transcript": transcript,
+            "stt_model": model_size,
+            "silence_removed_seconds": silence_removed,
+        }
+        checkpoint.save("transcript", result)
+        return {**note, **result}
+    except Exception as e:
+        raise _retry_stage(self, note, "transcribe", e)
+
+
+@celery_app.task(bind=True, max_retries=3)
+@instrumented_stage("route")
+def route_stage(self, note: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 2 (io 佇列): 同步 Notion 頁面樹並進行 LLM 路由判斷"""
+    progress = TaskProgress(note["note_id"])
+    checkpoint = NoteCheckpoint(note["note_id"])
+    try:
+        routing = checkpoint.get("routing")
+        if routing:
+            return {**note, "routing": routing}
+
+        context = _load_context(note)
+
+        # Notion: 同步頁面樹狀結構 (優先使用與轉錄並行預取的結果)
+        page_tree = _await_page_tree(note, checkpoint)
+        if page_tree is None:
+            progress.update("syncing")
+            page_tree = NotionService(context=context).sync_page_tree()
+            # 同步失敗時回傳空樹，不寫入檢查點以便重試時重新同步
+            if page_tree.get("roots"):
+                checkpoint.save("page_tree", page_tree)
+
         llm_service = LLMService(context=context)
-        routing = llm_service.route(transcript, page_tree)
-        
+        if settings.LLM_FUSED_MODE:
+            # 融合模式：路由與摘要單次完成，摘要階段直接沿用
+            progress.update("routing")
+            routing, summary_md = llm_service.route_and_summarize(note["transcript"], page_tree)
+            checkpoint.save("summary", summary_md)
+            checkpoint.save("routing", routing)
+            return {**note, "routing": routing, "summary_md": summary_md}
+
+        if settings.LLM_SPECULATIVE_SUMMARY:
+            # 推測模式：摘要與路由並行，命中時摘要階段直接沿用
+            progress.update("routing")
+            predicted = predict_template(note["transcript"])
+            routing, summary_md = llm_service.route_with_speculation(note["transcript"], page_tree, predicted)
+            record_speculation(predicted, routing.get("template_type", "general"))
+            checkpoint.save("summary", summary_md)
+            checkpoint.save("routing", routing)
+            return {**note, "routing": routing, "summary_md": summary_md}
+
+        # LLM Stage 1: 路由判斷
+        progress.update("routing")
+        routing = llm_service.route(note["transcript"], page_tree)
+        checkpoint.save("routing", routing)
+
+        return {**note, "routing": routing}
+    except Exception as e:
+        raise _retry_stage(self, note, "route", e)
+
+
+@celery_app.task
+def prefetch_page_tree(note: Dict[str, Any]) -> None:
+    """
+    與轉錄並行 (io 佇列): 預取 Notion 頁面樹並預先建立 Gemini Client
+
+    結果寫入 page_tree 檢查點供路由階段使用；失敗不重試，路由階段會自行同步。
+    """
+    checkpoint = NoteCheckpoint(note["note_id"])
+    try:
+        if checkpoint.get("page_tree") is not None:
+            return
+        observe_queue_wait("prefetch", note["enqueued_at"])
+        with track_stage("prefetch"):
+            context = _load_context(note)
+            LLMService(context=context)  # Client 快取於 Process 內，路由階段直接沿用
+            page_tree = NotionService(context=context).sync_page_tree()
+        if page_tree.get("roots"):
+            checkpoint.save("page_tree", page_tree)
+    except Exception as e:
+        logger.warning(f"Page tree prefetch failed for note {note['note_id']}: {e}")
+
+
+@celery_app.task(bind=True, max_retries=3)
+@instrumented_stage("summarize")
+def summarize_stage(self, note: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 3 (io 佇列): LLM 依模板生成摘要"""
+    progress = TaskProgress(note["note_id"])
+    checkpoint = NoteCheckpoint(note["note_id"])
+    try:
+        summary_md = note.get("summary_md") or checkpoint.get("summary")
+        if summary_md:
+            return {**note, "summary_md": summary_md}
+
+        context = _load_context(note)
+        template_type = note["routing"].get("template_type", "general")
+
+        progress.update("summarizing")
+        summary_md = LLMService(context=context).summarize(note["transcript"], template_type)
+        logger.info(f"Summary length: {len(summary_md)} characters")
+        checkpoint.save("summary", summary_md)
+
+        return {**note, "summary_md": summary_md}
+    except Exception as e:
+        raise _retry_stage(self, note, "summarize", e)
+
+
+@celery_app.task(bind=True, max_retries=3)
+@instrumented_stage("notion")
+def notion_stage(self, note: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 4 (io 佇列): Notion create_subpage 或 append_to_page"""
+    progress = TaskProgress(note["note_id"])
+    checkpoint = NoteCheckpoint(note["note_id"])
+    try:
+        # 已寫入 Notion 時不可重複寫入
+        saved = checkpoint.get("notion")
+        if saved:
+            return {**note, **saved}
+
+        context = _load_context(note)
+        notion_service = NotionService(context=context)
+        routing = note["routing"]
+        summary_md = note["summary_md"]
+
         action = routing.get("action")
         target_id = routing.get("target_id")
         title = routing.get("title") or "Untitled Note"
-        template_type = routing.get("template_type", "general")
-        
-        # 4. LLM Stage 2: 依模板生成摘要
-        summary_md = llm_service.summarize(transcript, template_type)
-        logger.info(f"Summary length: {len(summary_md)} characters")
-        
-        # 5. Notion: 執行操作
-        notion_url = ""
-        
+
+        # 多個請求的寫入中途失敗時，由已保存的進度繼續，不重複建立頁面或 append
+        write_state = checkpoint.get("notion_write")
+
+        def save_write_state(state: Dict[str, Any]) -> None:
+            checkpoint.save("notion_write", state)
+
+        progress.update("writing")
         if action == "create":
             # 在 Root 下建立新 Subpage
             new_topic_name = routing.get("new_topic_name") or title
             logger.info(f"Action: CREATE subpage '{new_topic_name}' under Root {target_id}")
-            
+
             # 建立 Subpage 並寫入摘要
             result = notion_service.create_subpage(
                 parent_id=target_id,
                 title=new_topic_name,
-                summary_md=summary_md
+                summary_md=summary_md,
+                resume=write_state,
+                on_progress=save_write_state
             )
             notion_url = result["url"]
-            
+
         elif action == "append":
             # 在 Existing Subpage 追加內容
             logger.info(f"Action: APPEND to subpage {target_id}")
-            
+
             notion_url = notion_service.append_to_page(
                 page_id=target_id,
                 title=title,
-                summary_md=summary_md
+                summary_md=summary_md,
+                resume=write_state,
+                on_progress=save_write_state
             )
-            
+
         else:
-             raise ValueError(f"Unknown action: {action}")
-        
-        # 6. Line: 推播通知
-        notification_service = NotificationService(context=context)
-        notification_service.push_message(title, notion_url)
-        
-        # 7. 清理暫存檔案
+            raise ValueError(f"Unknown action: {action}")
+
+        result = {"title": title, "notion_url": notion_url}
+        checkpoint.save("notion", result)
+        return {**note, **result}
+    except Exception as e:
+        raise _retry_stage(self, note, "notion", e)
+
+
+@celery_app.task(bind=True, max_retries=3)
+@instrumented_stage("notify")
+def notify_stage(self, note: Dict[str, Any]) -> Dict[str, Any]:
+    """Stage 5 (io 佇列): Line 推播通知並清理暫存檔案"""
+    progress = TaskProgress(note["note_id"])
+    file_path = note["file_path"]
+    try:
+        context = _load_context(note)
+
+        # Line: 推播通知 (已推播時不重複發送)
+        checkpoint = NoteCheckpoint(note["note_id"])
+        if not checkpoint.get("notified"):
+            progress.update("notifying")
+            NotificationService(context=context).push_message(note["title"], note["notion_url"])
+            checkpoint.save("notified", True)
+
+        # 清理暫存檔案
         if os.path.exists(file_path):
             os.remove(file_path)
             logger.info(f"Cleaned up: {file_path}")
-        
+        remove_pcm_sidecar(file_path)
+
         logger.info("Voice note processing completed successfully")
-        
+        progress.update("completed", 100, title=note["title"], notion_url=note["notion_url"])
+
         return {
             "status": "success",
-            "title": title,
-            "notion_url": notion_url
+            "title": note["title"],
+            "notion_url": note["notion_url"],
+            "stt_model": note.get("stt_model"),
+            "silence_removed_seconds": note.get("silence_removed_seconds", 0.0)
         }
-        
     except Exception as e:
-        logger.error(f"Task failed: {e}", exc_info=True)
-        # Retry with exponential backoff
-        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+        raise _retry_stage(self, note, "notify", e)
+
+
+@celery_app.task
+def process_voice_note(file_path: str, encrypted_context: Optional[str] = None):
+    """
+    相容舊版佇列訊息：改以分段 Pipeline 處理
+
+    升級前已排入佇列的任務仍會呼叫此 Task，此處僅轉交 enqueue_voice_note。
+
+    Args:
+        file_path: 音訊檔案路徑
+        encrypted_context: 加密後的使用者上下文字串
+    """
+    result = enqueue_voice_note(file_path, encrypted_context)
+    logger.info(f"Legacy task re-enqueued as staged pipeline: {result.id}")
+    return {"status": "forwarded", "note_id": result.id}
@@ -0,0 +1,200 @@
+"""
+Whisper CPU Tuning Benchmark
+於目前主機掃描 faster-whisper 的 CPU 參數，產生 STTService 啟動時載入的調校檔
+
+掃描參數：
+- compute_type (量化類型)
+- cpu_threads (單一推論的執行緒數)
+- num_workers (可同時進行的推論數)
+- beam_size
+
+輸出兩組設定 (各模型)：
+- latency: 單一任務最快完成 (最低 RTF)
+- throughput: 同時處理 num_workers 個任務時，每秒可處理最多音訊秒數
+
+執行方式：
+    cd backend
+    poetry run python -m scripts.benchmark_whisper --models small,base,tiny
+    poetry run python -m scripts.benchmark_whisper --corpus path/to/audio_dir --output /data/stt_profile.json
+
+注意：未提供 --corpus 時使用合成音訊，僅能反映相對速度；以實際錄音作為語料較準確。
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path for app imports
+root_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(root_dir))
+
+# Load environment variables from .env
+from dotenv import load_dotenv
+load_dotenv(root_dir / ".env")
+
+import numpy as np
+from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
+
+from app.config import get_settings
+from app.utils.audio_chunking import SAMPLE_RATE
+
+settings = get_settings()
+
+AUDIO_EXTENSIONS = {".m4a", ".mp3", ".wav", ".ogg", ".opus", ".webm", ".flac"}
+
+
+def synthetic_corpus(clips: int = 4, seconds: float = 20.0) -> list:
+    """
+    產生類語音的合成音訊 (諧波 + 音節般的振幅調變)
+
+    不含真正的語音內容，僅用於相對比較各組參數的推論速度。
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    corpus = []
+    for _ in range(clips):
+        pitch = rng.uniform(100, 220)
+        voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        syllables = (np.sin(2 * np.pi * rng.uniform(3, 5) * t) > 0).astype(np.float32)
+        audio = voice * syllables * 0.1 + rng.normal(0, 0.005, t.shape)
+        corpus.append(audio.astype(np.float32))
+    return corpus
+
+
+def load_corpus(corpus_dir: str) -> list:
+    """載入語料資料夾中的音訊並解碼為 16 kHz PCM"""
+    paths = sorted(p for p in Path(corpus_dir).iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)
+    return [decode_audio(str(p), sampling_rate=SAMPLE_RATE) for p in paths]
+
+
+def _transcribe(model, audio, beam_size: int, vad_filter: bool) -> None:
+    segments, _ = model.transcribe(
+        audio,
+        language=settings.STT_LANGUAGE,
+        beam_size=beam_size,
+        vad_filter=vad_filter
+    )
+    list(segments)
+
+
+def measure(model_size: str, params: dict, corpus: list, vad_filter: bool) -> dict:
+    """
+    測量單組參數的延遲與吞吐量
+
+    Returns:
+        {"rtf": 單一任務的中位數即時率, "throughput": 每秒處理的音訊秒數}
+    """
+    model = WhisperModel(
+        model_size,
+        device="cpu",
+        compute_type=params["compute_type"],
+        cpu_threads=params["cpu_threads"],
+        num_workers=params["num_workers"]
+    )
+    # 暖機
+    _transcribe(model, corpus[0][:SAMPLE_RATE * 5], params["beam_size"], vad_filter)
+
+    # 延遲：逐段依序轉錄
+    rtfs = []
+    for audio in corpus:
+        start = time.perf_counter()
+        _transcribe(model, audio, params["beam_size"], vad_filter)
+        rtfs.append((time.perf_counter() - start) / (len(audio) / SAMPLE_RATE))
+
+    # 吞吐量：num_workers 個執行緒同時轉錄
+    jobs = corpus * max(1, params["num_workers"])
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=params["num_workers"]) as pool:
+        list(pool.map(lambda audio: _transcribe(model, audio, params["beam_size"], vad_filter), jobs))
+    throughput = sum(len(audio) for audio in jobs) / SAMPLE_RATE / (time.perf_counter() - start)
+
+    del model
+    gc.collect()
+    return {"rtf": round(statistics.median(rtfs), 4), "throughput": round(throughput, 2)}
+
+
+def _int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(args) -> None:
+    cores = os.cpu_count() or 1
+    cpu_threads = _int_list(args.cpu_threads) if args.cpu_threads else sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    num_workers = _int_list(args.num_workers) if args.num_workers else sorted({1, 2, cores} & set(range(1, cores + 1)))
+    beam_sizes = _int_list(args.beam_sizes)
+    compute_types = [c.strip() for c in args.compute_types.split(",") if c.strip()]
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+        vad_filter = True
+        print(f"📂 Loaded {len(corpus)} clips from {args.corpus}")
+    else:
+        corpus = synthetic_corpus()
+        vad_filter = False  # 合成音訊不含語音，關閉 VAD 以確保實際執行解碼
+        print(f"🧪 Using {len(corpus)} synthetic clips (pass --corpus for representative numbers)")
+
+    if not corpus:
+        print("❌ Error: Empty corpus")
+        return
+
+    profile = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "host": {"cpu_count": cores},
+        "latency": {},
+        "throughput": {},
+    }
+
+    for model_size in models:
+        results = []
+        for compute_type, threads, workers, beam in itertools.product(compute_types, cpu_threads, num_workers, beam_sizes):
+            # 超過核心數的組合只會互相搶資源
+            if threads * workers > cores * 2:
+                continue
+            params = {"compute_type": compute_type, "cpu_threads": threads, "num_workers": workers, "beam_size": beam}
+            try:
+                metrics = measure(model_size, params, corpus, vad_filter)
+            except Exception as e:
+                print(f"   ⚠️ {model_size} {params}: {e}")
+                continue
+            results.append({**params, **metrics})
+            print(f"   {model_size} {params} -> RTF {metrics['rtf']:.3f}, {metrics['throughput']:.1f} audio-s/s")
+
+        if not results:
+            continue
+
+        best_latency = min(results, key=lambda r: r["rtf"])
+        best_throughput = max(results, key=lambda r: r["throughput"])
+        profile["latency"][model_size] = {**best_latency, "num_workers": 1}
+        profile["throughput"][model_size] = best_throughput
+        print(f"✅ {model_size}: latency {profile['latency'][model_size]}")
+        print(f"✅ {model_size}: throughput {best_throughput}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    print(f"\n💾 Profile written to {output}")
+    print("💡 Set STT_PROFILE_MODE=latency or throughput and restart the worker to apply.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Voice-Notion Whisper CPU Tuning Benchmark")
+    parser.add_argument("--models", default=settings.STT_MODEL_SIZE, help="Comma-separated model sizes")
+    parser.add_argument("--corpus", help="Directory of audio files (default: synthetic audio)")
+    parser.add_argument("--output", default=settings.STT_PROFILE_PATH, help="Profile output path")
+    parser.add_argument("--compute-types", default="int8", help="Comma-separated compute types (e.g. int8,int8_float32)")
+    parser.add_argument("--cpu-threads", help="Comma-separated cpu_threads values (default: 1,2,4,<cores>)")
+    parser.add_argument("--num-workers", help="Comma-separated num_workers values (default: 1,2,<cores>)")
+    parser.add_argument("--beam-sizes", default="1,5", help="Comma-separated beam sizes")
+
+    args = parser.parse_args()
+    main(args)
@@ -1,22 +1,24 @@
 import requests
 import time
 import argparse
-import sys
 import os
 
-def smoke_test(file_path, api_url):
+def smoke_test(file_path, api_url, timeout=900, api_key=None):
     print(f"🚀 Starting smoke test with file: {file_path}")
     
     if not os.path.exists(file_path):
         print(f"❌ Error: File not found at {file_path}")
         return
 
+    # 上傳與查詢狀態使用相同的驗證 Header (僅上傳者可查詢任務)
+    headers = {"X-API-Key": api_key} if api_key else {}
+
     # 1. Upload audio
     with open(file_path, 'rb') as f:
         files = {'audio': f}
         print(f"📤 Uploading to {api_url}/api/v1/note...")
         try:
-            response = requests.post(f"{api_url}/api/v1/note", files=files)
+            response = requests.post(f"{api_url}/api/v1/note", files=files, headers=headers)
             response.raise_for_status()
         except Exception as e:
             print(f"❌ Upload failed: {e}")
@@ -25,11 +27,33 @@ def smoke_test(file_path, api_url):
     data = response.json()
     task_id = data.get("task_id")
     print(f"✅ Upload successful! Task ID: {task_id}")
-    print(f"⏳ Waiting for processing (Check worker logs for progress)...")
+    print("⏳ Waiting for processing...")
+    
+    # 透過 GET /api/v1/task/{id} 輪詢處理階段與進度
+    deadline = time.monotonic() + timeout
+    while True:
+        if time.monotonic() > deadline:
+            print(f"❌ Timed out after {timeout}s waiting for task {task_id}")
+            return
+        time.sleep(2)
+        try:
+            response = requests.get(f"{api_url}/api/v1/task/{task_id}", headers=headers, timeout=10)
+            if response.status_code != 200:
+                print(f"❌ Status check failed: HTTP {response.status_code} {response.text}")
+                return
+            status = response.json()
+        except Exception as e:
+            print(f"❌ Status check failed: {e}")
+            return
+        
+        print(f"   [{status.get('state')}] {status.get('stage')} {status.get('progress', 0):.0f}%")
+        if status.get("stage") == "completed":
+            print(f"✅ Done! {status.get('title')} -> {status.get('notion_url')}")
+            break
+        if status.get("stage") == "failed" or status.get("state") == "FAILURE":
+            print(f"❌ Task failed: {status.get('error')}")
+            break
     
-    # 目前 API 沒有實作 GET /task/{id}，所以這裡純粹是模擬等待
-    # 使用者需要手動查看 Docker 日誌或 Notion 頁面
-    time.sleep(5)
     print("\n💡 Tip: Run `docker-compose logs -f worker` to see the processing details.")
     print("Check your Notion and Line to verify the result!")
 
@@ -37,6 +61,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Voice-Notion Smoke Test Script")
     parser.add_argument("--file", required=True, help="Path to the audio file")
     parser.add_argument("--url", default="http://localhost:8000", help="Backend API URL")
+    parser.add_argument("--timeout", type=int, default=900, help="Max seconds to wait for processing")
+    parser.add_argument("--api-key", default=os.environ.get("SIRI_API_KEY"), help="Admin API key (default: $SIRI_API_KEY)")
     
     args = parser.parse_args()
-    smoke_test(args.file, args.url)
+    smoke_test(args.file, args.url, args.timeout, args.api_key)
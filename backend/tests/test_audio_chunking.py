@@ -0,0 +1,35 @@
+from app.utils.audio_chunking import plan_chunks, stitch_transcripts
+
+SR = 16000
+
+
+def test_plan_chunks_cuts_at_silence():
+    """測試切點落在語音區段之間的靜音中點"""
+    spans = [
+        {"start": 0, "end": 40 * SR},
+        {"start": 50 * SR, "end": 90 * SR},
+        {"start": 100 * SR, "end": 110 * SR},
+    ]
+    chunks = plan_chunks(spans, total_samples=120 * SR, max_chunk_seconds=60, overlap_seconds=1)
+
+    assert [c["core_start"] for c in chunks] == [0, 45 * SR, 95 * SR]
+    assert chunks[-1]["core_end"] == 120 * SR
+    # 重疊只延伸實際轉錄範圍，不影響 core 範圍
+    assert chunks[0]["end"] == 46 * SR
+    assert chunks[1]["start"] == 44 * SR
+
+
+def test_plan_chunks_splits_long_speech():
+    """測試無停頓的長語音會被強制切段"""
+    chunks = plan_chunks([{"start": 0, "end": 150 * SR}], total_samples=150 * SR, max_chunk_seconds=60, overlap_seconds=0)
+
+    assert [(c["core_start"], c["core_end"]) for c in chunks] == [
+        (0, 60 * SR), (60 * SR, 120 * SR), (120 * SR, 150 * SR)
+    ]
+
+
+def test_stitch_transcripts_removes_overlap():
+    """測試拼接時移除重疊區的重複文字"""
+    parts = ["今天的會議討論了預算", "討論了預算與時程", "", "下週再確認"]
+
+    assert stitch_transcripts(parts) == "今天的會議討論了預算 與時程 下週再確認"
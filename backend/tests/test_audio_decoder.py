@@ -0,0 +1,31 @@
+import wave
+import numpy as np
+from app.services.audio_decoder import write_pcm_sidecar, load_pcm, has_pcm_sidecar, remove_pcm_sidecar
+
+
+def _write_wav(path, seconds=1.0, rate=44100):
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * 0.5 * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(np.repeat(samples, 2).tobytes())
+
+
+def test_predecode_roundtrip(tmp_path):
+    """測試 Ingest 預先解碼為 16 kHz 單聲道，並以 mmap 零拷貝載入"""
+    audio_path = str(tmp_path / "note.wav")
+    _write_wav(audio_path)
+
+    assert write_pcm_sidecar(audio_path)
+    assert has_pcm_sidecar(audio_path)
+
+    pcm = load_pcm(audio_path)
+    assert isinstance(pcm, np.memmap)
+    assert pcm.dtype == np.float32
+    assert abs(len(pcm) - 16000) < 200
+    assert 0.4 < np.abs(pcm).max() <= 1.0
+
+    remove_pcm_sidecar(audio_path)
+    assert not has_pcm_sidecar(audio_path)
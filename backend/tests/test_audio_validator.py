@@ -0,0 +1,113 @@
+import struct
+import pytest
+from fastapi import HTTPException
+from app.services.audio_validator import validate_audio_format, probe_audio_duration
+
+
+def _ogg_page(codec_header: bytes) -> bytes:
+    """第一個 OGG 頁面：27 bytes 頁首 + 1 個區段 + Codec 識別標頭"""
+    page_header = b"OggS" + b"\x00\x02" + b"\x00" * 20 + b"\x01"
+    return page_header + bytes([len(codec_header)]) + codec_header
+
+
+OPUS_HEAD = b"OpusHead\x01\x01\x38\x01\x80\x3e\x00\x00\x00\x00\x00"
+WEBM_EBML = (
+    b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\xf7\x81\x01\x42\xf2\x81\x04"
+    b"\x42\xf3\x81\x08\x42\x82\x84webm\x42\x87\x81\x04\x42\x85\x81\x02"
+)
+
+
+@pytest.mark.parametrize("content, expected", [
+    (b"\x00\x00\x00\x20ftypM4A \x00\x00\x00\x00", ".m4a"),
+    (b"RIFF\x24\x00\x00\x00WAVEfmt ", ".wav"),
+    (b"\xff\xfb\x90\x64" + b"\x00" * 12, ".mp3"),
+    (_ogg_page(OPUS_HEAD), ".ogg"),
+    (_ogg_page(b"\x01vorbis\x00\x00\x00\x00\x01"), ".ogg"),
+    (WEBM_EBML, ".webm"),
+    (b"fLaC\x00\x00\x00\x22" + b"\x00" * 34, ".flac"),
+])
+def test_supported_formats(content, expected):
+    """測試各音訊格式的 Magic Number 判斷"""
+    assert validate_audio_format(content) == expected
+
+
+@pytest.mark.parametrize("content", [
+    _ogg_page(b"\x80theora\x03\x02\x01"),  # OGG 影像串流
+    _ogg_page(b"Opus"),  # 過短，不含完整的 Codec 識別標頭
+    WEBM_EBML.replace(b"webm", b"mkv!"),  # 非 WebM 的 Matroska
+    b"%PDF-1.7\n" + b"\x00" * 20,
+])
+def test_unsupported_formats(content):
+    """測試非音訊或不支援的容器被拒絕"""
+    with pytest.raises(HTTPException) as exc_info:
+        validate_audio_format(content)
+    assert exc_info.value.status_code == 400
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_probe_m4a_mvhd(tmp_path):
+    """測試由 moov/mvhd 取得長度 (moov 位於 mdat 之後)"""
+    mvhd = _box(b"mvhd", b"\x00\x00\x00\x00" + b"\x00" * 8 + struct.pack(">II", 1000, 12500))
+    content = _box(b"ftyp", b"M4A \x00\x00\x00\x00") + _box(b"mdat", b"\x00" * 4096) + _box(b"moov", mvhd)
+    assert probe_audio_duration(_write(tmp_path, "a.m4a", content)) == 12.5
+
+
+def test_probe_wav(tmp_path):
+    """測試由 fmt 的 byte rate 與 data 大小取得長度"""
+    fmt = struct.pack("<HHIIHH", 1, 1, 16000, 32000, 2, 16)
+    data = b"\x00" * 32000 * 3
+    content = b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(data)) + b"WAVE"
+    content += b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    assert probe_audio_duration(_write(tmp_path, "a.wav", content)) == 3.0
+
+
+def test_probe_mp3_xing(tmp_path):
+    """測試由 Xing 標頭的總 Frame 數取得長度 (MPEG1 Layer III 單聲道, 44.1 kHz)"""
+    header = b"\xff\xfb\x90\xc4"  # 128 kbps, 44.1 kHz, mono
+    xing = b"Xing" + struct.pack(">II", 0x1, 1000)
+    content = header + b"\x00" * 17 + xing + b"\x00" * 400
+    assert probe_audio_duration(_write(tmp_path, "a.mp3", content)) == round(1000 * 1152 / 44100, 3)
+
+
+def test_probe_flac_streaminfo(tmp_path):
+    """測試由 STREAMINFO 的總取樣數取得長度"""
+    packed = (16000 << 44) | (0 << 41) | (15 << 36) | (16000 * 42)
+    streaminfo = b"\x00" * 10 + struct.pack(">Q", packed) + b"\x00" * 16
+    content = b"fLaC" + b"\x80\x00\x00\x22" + streaminfo
+    assert probe_audio_duration(_write(tmp_path, "a.flac", content)) == 42.0
+
+
+def test_probe_ogg_opus(tmp_path):
+    """測試由最後一頁的 Granule Position 取得長度 (扣除 pre-skip)"""
+    last_page = b"OggS\x00\x04" + struct.pack("<q", 48000 * 5 + 312) + b"\x00" * 20
+    content = _ogg_page(OPUS_HEAD[:10] + struct.pack("<H", 312) + OPUS_HEAD[12:]) + b"\x00" * 100 + last_page
+    assert probe_audio_duration(_write(tmp_path, "a.ogg", content)) == 5.0
+
+
+def _ebml(element_id: bytes, payload: bytes) -> bytes:
+    return element_id + bytes([0x80 | len(payload)]) + payload
+
+
+def test_probe_webm_segment_info(tmp_path):
+    """測試由 Segment/Info 的 Duration × TimecodeScale 取得長度 (Segment 長度未知)"""
+    seek_head = _ebml(b"\x11\x4d\x9b\x74", b"\x00" * 16)
+    info = _ebml(b"\x15\x49\xa9\x66", _ebml(b"\x2a\xd7\xb1", b"\x0f\x42\x40") + _ebml(b"\x44\x89", struct.pack(">d", 12500.0)))
+    segment = b"\x18\x53\x80\x67\x01\xff\xff\xff\xff\xff\xff\xff" + seek_head + info
+    assert probe_audio_duration(_write(tmp_path, "a.webm", WEBM_EBML + segment)) == 12.5
+
+
+def test_probe_unknown_duration(tmp_path):
+    """測試 WebM 未寫入長度 (Info 不含 Duration 或 Cluster 先出現) 或無法解析時回傳 None"""
+    assert probe_audio_duration(_write(tmp_path, "a.webm", WEBM_EBML)) is None
+    live = b"\x18\x53\x80\x67\x01\xff\xff\xff\xff\xff\xff\xff" + b"\x1f\x43\xb6\x75\x01\xff\xff\xff\xff\xff\xff\xff"
+    assert probe_audio_duration(_write(tmp_path, "live.webm", WEBM_EBML + live)) is None
+    assert probe_audio_duration(str(tmp_path / "missing.m4a")) is None
@@ -1,10 +1,11 @@
 import pytest
 import os
 from unittest.mock import MagicMock, patch, mock_open
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, SUMMARY_TEMPERATURE, _gemini_clients
 
 @pytest.fixture
 def llm_service():
+    _gemini_clients.clear()
     with patch("app.services.llm_service.genai.Client"):
         service = LLMService()
         return service
@@ -54,3 +55,49 @@ def test_summarize_template_not_found(llm_service):
             summary = llm_service.summarize("內容", "invalid_type")
     
     assert summary == "通用摘要內容"
+
+
+PAGE_TREE = {"roots": [{"id": "root-1", "title": "工作"}], "subpages": [{"id": "sub-1", "title": "週會"}]}
+
+
+def test_route_and_summarize_single_call(llm_service):
+    """測試融合模式以單次呼叫回傳路由與摘要"""
+    mock_response = MagicMock()
+    mock_response.text = '{"action": "append", "target_id": "sub-1", "new_topic_name": "", "title": "週會", "template_type": "meeting", "summary": "## 會議摘要"}'
+    llm_service.client.models.generate_content.return_value = mock_response
+
+    routing, summary = llm_service.route_and_summarize("今天開週會", PAGE_TREE)
+
+    assert routing["target_id"] == "sub-1" and "summary" not in routing
+    assert summary == "## 會議摘要"
+    assert llm_service.client.models.generate_content.call_count == 1
+    # 與兩階段摘要相同的生成溫度，啟用融合模式不改變摘要風格
+    config = llm_service.client.models.generate_content.call_args.kwargs["config"]
+    assert config.temperature == SUMMARY_TEMPERATURE
+
+
+def test_route_and_summarize_falls_back_on_invalid_target(llm_service):
+    """測試融合模式回傳不存在的目標 ID 時退回兩階段"""
+    mock_response = MagicMock()
+    mock_response.text = '{"action": "append", "target_id": "unknown", "new_topic_name": "", "title": "週會", "template_type": "meeting", "summary": "## 摘要"}'
+    llm_service.client.models.generate_content.return_value = mock_response
+    fallback_routing = {"action": "create", "target_id": "root-1", "template_type": "idea"}
+
+    with patch.object(llm_service, "route", return_value=fallback_routing) as mock_route, \
+         patch.object(llm_service, "summarize", return_value="## 靈感") as mock_summarize:
+        routing, summary = llm_service.route_and_summarize("今天開週會", PAGE_TREE)
+
+    mock_route.assert_called_once()
+    mock_summarize.assert_called_once_with("今天開週會", "idea")
+    assert routing == fallback_routing and summary == "## 靈感"
+
+
+def test_route_with_speculation(llm_service):
+    """測試推測模板命中時沿用推測的摘要，未命中時以路由模板重新生成"""
+    with patch.object(llm_service, "route", return_value={"template_type": "meeting"}), \
+         patch.object(llm_service, "summarize", side_effect=lambda t, template: f"## {template}") as mock_summarize:
+        assert llm_service.route_with_speculation("逐字稿", PAGE_TREE, "meeting")[1] == "## meeting"
+        assert mock_summarize.call_count == 1
+
+        assert llm_service.route_with_speculation("逐字稿", PAGE_TREE, "todo")[1] == "## meeting"
+        assert mock_summarize.call_count == 3
@@ -0,0 +1,53 @@
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from app.services.notion_service import InstrumentedClient
+
+
+def _calls(operation, status="ok"):
+    return REGISTRY.get_sample_value(
+        "voice_notion_external_calls_total",
+        {"service": "notion", "operation": operation, "status": status}
+    ) or 0
+
+
+def test_notion_calls_are_counted_without_ids():
+    """測試 Notion 呼叫依 Endpoint 統計，路徑中的頁面 ID 不進入 Label"""
+    client = InstrumentedClient(auth="secret")
+    before = _calls("GET blocks/children")
+
+    with patch("notion_client.Client.request", return_value={"results": []}):
+        client.blocks.children.list(block_id="1429989f-e8ac-4eff-bc8f-57f56486db54")
+
+    assert _calls("GET blocks/children") == before + 1
+
+
+def test_worker_init_creates_multiproc_dir_without_server(tmp_path):
+    """測試 METRICS_WORKER_PORT=0 時仍建立 Multiprocess 目錄，只是不啟動 Server"""
+    from app.worker import tasks
+
+    multiproc_dir = tmp_path / "prometheus"
+    with patch("app.core.metrics.MULTIPROC_DIR", str(multiproc_dir)), \
+         patch.object(tasks.settings, "METRICS_WORKER_PORT", 0), \
+         patch("app.worker.tasks.start_metrics_server") as mock_server:
+        tasks.start_worker_metrics()
+
+    assert multiproc_dir.is_dir()
+    mock_server.assert_not_called()
+
+
+def test_stats_degrades_when_redis_fails():
+    """測試 /stats 僅限 Admin，Redis 無法使用時該項回傳 None 而非 500"""
+    import pytest
+    from fastapi import HTTPException
+    from app.main import stats
+    from app.schemas.context import UserContext, AuthType
+
+    with patch("app.main.TranscriptCache.stats", side_effect=ConnectionError("down")), \
+         patch("app.main.model_usage", return_value={"small": 3}), \
+         patch("app.main.speculation_stats", return_value={"hits": 1}):
+        result = stats(UserContext(type=AuthType.ADMIN))
+        with pytest.raises(HTTPException) as exc_info:
+            stats(UserContext(type=AuthType.DEMO, gemini_key="g", notion_token="n"))
+
+    assert result == {"transcript_cache": None, "stt_models": {"small": 3}, "speculative_summary": {"hits": 1}}
+    assert exc_info.value.status_code == 403
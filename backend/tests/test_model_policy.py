@@ -0,0 +1,16 @@
+from unittest.mock import patch
+from app.services.model_policy import select_model
+
+
+def test_select_model_degrades_under_backlog():
+    """測試佇列積壓時改選較快的模型"""
+    with patch("app.services.model_policy.settings") as mock_settings:
+        mock_settings.STT_MODEL_RTF = {"tiny": 0.05, "base": 0.1, "small": 0.3}
+        mock_settings.STT_POLICY_CONCURRENCY = 1
+        mock_settings.STT_POLICY_AVG_AUDIO_SECONDS = 60
+        mock_settings.STT_LATENCY_SLO_SECONDS = 300
+        candidates = ["small", "base", "tiny"]
+
+        assert select_model(30, 0, candidates) == "small"
+        assert select_model(30, 20, candidates) == "base"
+        assert select_model(30, 200, candidates) == "tiny"
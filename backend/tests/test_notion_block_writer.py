@@ -0,0 +1,122 @@
+import itertools
+import json
+import pytest
+from unittest.mock import MagicMock
+from app.services.notion_block_writer import NotionBlockWriter
+from app.utils.markdown_parser import NotionMarkdownParser
+
+
+def _paragraph(text):
+    return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"text": {"content": text}}]}}
+
+
+def _bullet(text, children=None):
+    body = {"rich_text": [{"text": {"content": text}}]}
+    if children:
+        body["children"] = children
+    return {"object": "block", "type": "bulleted_list_item", "bulleted_list_item": body}
+
+
+def _table(rows):
+    return {"object": "block", "type": "table", "table": {
+        "table_width": 1, "has_column_header": False, "has_row_header": False,
+        "children": [{"object": "block", "type": "table_row", "table_row": {"cells": [[]]}} for _ in range(rows)]
+    }}
+
+
+def _client():
+    """模擬 Notion Client，append 回傳依序編號的 Block ID"""
+    client = MagicMock()
+    ids = itertools.count()
+    client.pages.create.return_value = {"id": "page", "url": "https://notion.so/page"}
+    client.blocks.children.append.side_effect = lambda block_id, children: {
+        "results": [{"id": f"b{next(ids)}"} for _ in children]
+    }
+    return client
+
+
+def _appends(client):
+    return [(c.kwargs["block_id"], c.kwargs["children"]) for c in client.blocks.children.append.call_args_list]
+
+
+def test_append_splits_into_100_block_batches():
+    """測試超過 100 個頂層 Block 時依序分批寫入"""
+    client = _client()
+    blocks = [_paragraph(str(i)) for i in range(250)]
+
+    NotionBlockWriter(client).append("page", blocks)
+
+    appends = _appends(client)
+    assert [len(children) for _, children in appends] == [100, 100, 50]
+    assert [b for _, children in appends for b in children] == blocks
+
+
+def test_create_page_writes_large_table_in_follow_up():
+    """測試超過 100 列的表格：頁面建立後 append 表格前 100 列，其餘列再 append 至表格"""
+    client = _client()
+    blocks = [_paragraph("前言"), _table(150), _paragraph("結語")]
+
+    writer = NotionBlockWriter(client)
+    page = writer.create_page({"page_id": "root"}, {}, blocks)
+    writer.flush()
+
+    assert page["id"] == "page"
+    assert client.pages.create.call_args.kwargs["children"] == [blocks[0]]
+    appends = _appends(client)
+    assert appends[0][0] == "page"
+    assert [b["type"] for b in appends[0][1]] == ["table", "paragraph"]
+    assert len(appends[0][1][0]["table"]["children"]) == 100
+    # 表格為該批第一個 Block (ID b0)
+    assert appends[1][0] == "b0"
+    assert len(appends[1][1]) == 50
+
+
+def test_deep_nesting_written_after_parent():
+    """測試超過兩層巢狀的子 Block 於父 Block 建立後寫入，且不修改原 Block"""
+    client = _client()
+    deep = _bullet("L0", [_bullet("L1", [_bullet("L2", [_bullet("L3")])])])
+
+    NotionBlockWriter(client).append("page", [deep])
+
+    appends = _appends(client)
+    assert appends[0][1][0]["bulleted_list_item"].get("children") is None
+    assert appends[1] == ("b0", deep["bulleted_list_item"]["children"])
+    assert len(appends) == 2
+    assert deep["bulleted_list_item"]["children"][0]["bulleted_list_item"]["children"]
+
+
+def test_parser_keeps_all_nested_items():
+    """測試 Parser 不再截斷超過 100 個的巢狀項目"""
+    md = "- parent\n" + "".join(f"  - child {i}\n" for i in range(150))
+
+    blocks = NotionMarkdownParser().parse(md)
+
+    assert len(blocks[0]["bulleted_list_item"]["children"]) == 150
+
+
+def test_resume_continues_without_recreating_page():
+    """測試寫入中斷後由保存的進度繼續，不重新建立頁面或重複 append"""
+    client = _client()
+    blocks = [_paragraph(str(i)) for i in range(250)]
+    states = []
+    ok = client.blocks.children.append.side_effect
+    calls = itertools.count()
+    client.blocks.children.append.side_effect = lambda **kwargs: (
+        ok(**kwargs) if next(calls) == 0 else (_ for _ in ()).throw(RuntimeError("502"))
+    )
+
+    writer = NotionBlockWriter(client, on_progress=states.append)
+    writer.create_page({"page_id": "root"}, {}, blocks)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+
+    # 進度以 JSON 保存於檢查點
+    saved = json.loads(json.dumps(states[-1]))
+    assert saved["page"] == {"id": "page", "url": "https://notion.so/page"}
+    resumed = _client()
+    page = NotionBlockWriter(resumed).resume(saved)
+
+    resumed.pages.create.assert_not_called()
+    assert page["id"] == "page"
+    written = [b for _, children in _appends(client)[:1] + _appends(resumed) for b in children]
+    assert client.pages.create.call_args.kwargs["children"] + written == blocks
@@ -0,0 +1,116 @@
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+from notion_client import Client
+from notion_client.errors import HTTPResponseError
+from app.services.notion_rate_limiter import NotionRateGovernor
+from app.services.notion_service import InstrumentedClient
+
+
+def _error(status, headers=None):
+    response = httpx.Response(
+        status, headers=headers or {}, request=httpx.Request("POST", "https://api.notion.com/v1/pages")
+    )
+    return HTTPResponseError(response)
+
+
+def _rate_limited(retry_after="1"):
+    return _error(429, {"Retry-After": retry_after})
+
+
+def test_acquire_waits_until_token_available():
+    """測試 Bucket 無 Token 時等待 Redis 回傳的秒數後再取得"""
+    with patch("app.services.notion_rate_limiter.redis_client") as mock_redis, \
+         patch("app.services.notion_rate_limiter.time.sleep") as mock_sleep:
+        mock_redis.eval.side_effect = ["0.25", "0"]
+        waited = NotionRateGovernor("hash").acquire()
+
+    assert mock_redis.eval.call_count == 2
+    assert 0.25 <= mock_sleep.call_args.args[0] <= 0.3
+    assert waited == mock_sleep.call_args.args[0]
+
+
+def test_acquire_fails_open_without_redis():
+    """測試 Redis 無法使用時不阻擋請求"""
+    with patch("app.services.notion_rate_limiter.redis_client") as mock_redis:
+        mock_redis.eval.side_effect = ConnectionError("down")
+        assert NotionRateGovernor("hash").acquire() == 0.0
+
+
+def test_backoff_pauses_bucket_for_retry_after():
+    """測試 429 時依 Retry-After 暫停所有 Worker 共用的 Bucket"""
+    with patch("app.services.notion_rate_limiter.redis_client") as mock_redis:
+        delay = NotionRateGovernor("hash").backoff("2", attempt=0)
+
+    assert 2 <= delay <= 2.5
+    key, _ = mock_redis.set.call_args.args
+    assert key == "notion_rate:hash:pause"
+    assert mock_redis.set.call_args.kwargs["px"] == int(delay * 1000)
+
+
+def test_client_retries_rate_limited_request():
+    """測試 Client 於 429 時在呼叫層級重試，而非直接拋出"""
+    client = InstrumentedClient(auth="secret")
+    client.governor = MagicMock()
+    client.governor.backoff.return_value = 0.5
+
+    with patch.object(Client, "request", side_effect=[_rate_limited(), {"id": "page_1"}]) as mock_request:
+        assert client.request("pages", "POST", body={}) == {"id": "page_1"}
+
+    assert mock_request.call_count == 2
+    assert client.governor.acquire.call_count == 2
+    client.governor.backoff.assert_called_once_with("1", 0)
+
+
+@pytest.mark.parametrize("status", [409, 502])
+def test_client_retries_transient_errors_on_reads(status):
+    """測試唯讀請求於 409 / 5xx 時在呼叫層級退避重試，且不暫停共用的 Bucket"""
+    client = InstrumentedClient(auth="secret")
+    client.governor = MagicMock()
+
+    with patch("app.services.notion_service.transient_backoff", return_value=0.5) as mock_backoff, \
+         patch.object(Client, "request", side_effect=[_error(status), {"id": "page_1"}]):
+        assert client.request("pages/page_1", "GET") == {"id": "page_1"}
+
+    mock_backoff.assert_called_once_with(0)
+    client.governor.backoff.assert_not_called()
+
+
+def test_client_does_not_resend_failed_write():
+    """測試 pages.create 收到 502 時不重送 (Notion 可能已建立頁面)，交由檢查點繼續"""
+    client = InstrumentedClient(auth="secret")
+    client.governor = MagicMock()
+
+    with patch("app.services.notion_service.transient_backoff") as mock_backoff, \
+         patch.object(Client, "request", side_effect=[_error(502), {"id": "page_1"}]) as mock_request:
+        with pytest.raises(HTTPResponseError):
+            client.pages.create(parent={"page_id": "root"}, properties={})
+
+    assert mock_request.call_count == 1
+    mock_backoff.assert_not_called()
+
+
+def test_client_does_not_retry_client_errors():
+    """測試 400 等請求本身的錯誤直接拋出"""
+    client = InstrumentedClient(auth="secret")
+    client.governor = MagicMock()
+
+    with patch.object(Client, "request", side_effect=_error(400)) as mock_request:
+        with pytest.raises(HTTPResponseError):
+            client.request("pages", "POST", body={})
+
+    assert mock_request.call_count == 1
+
+
+def test_client_gives_up_after_retries():
+    """測試重試次數用盡後拋出例外，交由 Task 重試"""
+    client = InstrumentedClient(auth="secret")
+    client.governor = MagicMock()
+    client.governor.backoff.return_value = 0.0
+
+    with patch("app.services.notion_service.settings.NOTION_REQUEST_RETRIES", 2), \
+         patch.object(Client, "request", side_effect=_rate_limited()) as mock_request:
+        with pytest.raises(HTTPResponseError):
+            client.request("pages", "POST", body={})
+
+    assert mock_request.call_count == 3
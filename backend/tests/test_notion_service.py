@@ -4,7 +4,7 @@ from app.services.notion_service import NotionService
 
 @pytest.fixture
 def notion_service():
-    with patch("app.services.notion_service.Client"):
+    with patch("app.services.notion_service.InstrumentedClient"):
         service = NotionService()
         return service
 
@@ -45,3 +45,86 @@ def test_append_to_page(notion_service):
     assert url == "https://notion.so/existing_page"
     assert notion_service.client.blocks.children.append.called
     assert notion_service.client.pages.retrieve.called
+
+def _child_page(page_id, title):
+    return {"object": "block", "id": page_id, "type": "child_page", "child_page": {"title": title}}
+
+def test_sync_page_tree_paginates_children(notion_service):
+    """測試子頁面超過 100 個時依 next_cursor 讀完所有分頁"""
+
+    notion_service.client.search.return_value = {
+        "results": [
+            {"id": "root_1", "parent": {"type": "workspace"}, "properties": {"title": {"type": "title", "title": [{"plain_text": "工作"}]}}},
+            {"id": "root_2", "parent": {"type": "workspace"}, "properties": {"title": {"type": "title", "title": [{"plain_text": "生活"}]}}},
+        ],
+        "has_more": False
+    }
+
+    def list_children(block_id, start_cursor=None, page_size=None):
+        if block_id == "root_1" and start_cursor is None:
+            return {"results": [_child_page("sub_1", "A")], "has_more": True, "next_cursor": "c1"}
+        if block_id == "root_1":
+            return {"results": [_child_page("sub_2", "B"), {"object": "block", "id": "p", "type": "paragraph"}], "has_more": False}
+        return {"results": [_child_page("sub_3", "C")], "has_more": False}
+
+    notion_service.client.blocks.children.list.side_effect = list_children
+
+    with patch("app.services.page_tree_cache.redis_client") as mock_redis:
+        mock_redis.hmget.return_value = [None] * 5
+        mock_redis.set.return_value = True
+        mock_redis.eval.return_value = 1
+        tree = notion_service.sync_page_tree()
+
+    assert [r["id"] for r in tree["roots"]] == ["root_1", "root_2"]
+    # 依 Root 順序合併，不受並行完成順序影響
+    assert [(s["id"], s["parent_id"]) for s in tree["subpages"]] == [
+        ("sub_1", "root_1"), ("sub_2", "root_1"), ("sub_3", "root_2")
+    ]
+    assert notion_service.client.blocks.children.list.call_count == 3
+
+
+def _search_page(page_id, parent, title, edited):
+    return {
+        "id": page_id,
+        "parent": parent,
+        "last_edited_time": edited,
+        "properties": {"title": {"type": "title", "title": [{"plain_text": title}]}}
+    }
+
+def test_refresh_page_tree_patches_changed_pages(notion_service):
+    """測試增量更新只處理 Watermark 之後的頁面，並就地更新 Roots / Subpages"""
+    from datetime import datetime, timezone
+    since = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+    tree = {
+        "roots": [{"id": "root_1", "title": "工作"}],
+        "subpages": [
+            {"id": "sub_1", "parent_id": "root_1", "title": "舊標題"},
+            {"id": "sub_2", "parent_id": "root_1", "title": "會議"},
+        ]
+    }
+    notion_service.client.search.return_value = {
+        "results": [
+            _search_page("sub_1", {"type": "page_id", "page_id": "root_1"}, "新標題", "2024-05-01T12:30:00.000Z"),
+            _search_page("root_2", {"type": "workspace"}, "生活", "2024-05-01T12:20:00.000Z"),
+            _search_page("sub_3", {"type": "page_id", "page_id": "root_1"}, "想法", "2024-05-01T12:00:00.000Z"),
+            _search_page("sub_2", {"type": "page_id", "page_id": "root_1"}, "不該處理", "2024-05-01T11:00:00.000Z"),
+        ],
+        "has_more": True,
+        "next_cursor": "c1"
+    }
+    notion_service.client.blocks.children.list.return_value = {
+        "results": [_child_page("sub_4", "旅遊")], "has_more": False
+    }
+
+    result = notion_service._refresh_page_tree(tree, since)
+
+    # 遇到早於 Watermark 的頁面即停止，不讀取下一頁
+    notion_service.client.search.assert_called_once()
+    assert notion_service.client.search.call_args.kwargs["sort"]["timestamp"] == "last_edited_time"
+    assert result["roots"] == [{"id": "root_1", "title": "工作"}, {"id": "root_2", "title": "生活"}]
+    assert [(s["id"], s["title"]) for s in result["subpages"]] == [
+        ("sub_1", "新標題"), ("sub_2", "會議"), ("sub_3", "想法"), ("sub_4", "旅遊")
+    ]
+    # 只有新 Root 需要列出子頁面
+    notion_service.client.blocks.children.list.assert_called_once()
+    assert tree["subpages"][0]["title"] == "舊標題"
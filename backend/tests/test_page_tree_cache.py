@@ -0,0 +1,131 @@
+import json
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services import page_tree_cache
+from app.services.page_tree_cache import PageTreeCache, _Entry
+
+TREE = {"roots": [{"id": "root_1", "title": "工作"}], "subpages": []}
+
+
+def _fields(version, tree, synced_at=None, full_synced_at=None):
+    """模擬 HMGET 回傳值"""
+    synced_at = time.time() if synced_at is None else synced_at
+    full_synced_at = synced_at if full_synced_at is None else full_synced_at
+    return [str(version), json.dumps(tree["roots"]), json.dumps(tree["subpages"]), str(synced_at), str(full_synced_at)]
+
+
+@pytest.fixture
+def mock_redis():
+    page_tree_cache._token_caches.clear()
+    with patch("app.services.page_tree_cache.redis_client") as mock_redis:
+        yield mock_redis
+    page_tree_cache._token_caches.clear()
+
+
+def test_local_hit_when_version_matches(mock_redis):
+    """測試 Redis 版本號與 L1 一致時不讀取完整 Page Tree"""
+    page_tree_cache._token_caches["hash"] = _Entry(3, TREE, time.time(), time.time())
+    mock_redis.hget.return_value = "3"
+
+    assert PageTreeCache("hash").get() == TREE
+    mock_redis.hmget.assert_not_called()
+
+
+def test_reload_when_other_worker_bumped_version(mock_redis):
+    """測試其他 Worker 更新後 (版本號不同) 改讀 Redis 的 Page Tree"""
+    page_tree_cache._token_caches["hash"] = _Entry(3, TREE, time.time(), time.time())
+    subpages = [{"id": "sub_1", "parent_id": "root_1", "title": "新頁面"}]
+    mock_redis.hget.return_value = "4"
+    mock_redis.hmget.return_value = _fields(4, {"roots": TREE["roots"], "subpages": subpages})
+
+    tree = PageTreeCache("hash").get()
+
+    assert tree["subpages"] == subpages
+    assert page_tree_cache._token_caches["hash"].version == 4
+
+
+def test_miss_crawls_once_and_stores(mock_redis):
+    """測試未命中時取得鎖、爬取、寫入 Redis 並釋放鎖"""
+    mock_redis.hmget.return_value = [None] * 5
+    mock_redis.set.return_value = True
+    mock_redis.eval.return_value = 1
+    loader = MagicMock(return_value=TREE)
+
+    tree, hit = PageTreeCache("hash").get_or_load(loader)
+
+    assert (tree, hit) == (TREE, False)
+    loader.assert_called_once()
+    scripts = [call.args[0] for call in mock_redis.eval.call_args_list]
+    assert scripts == [page_tree_cache._STORE_SCRIPT, page_tree_cache._RELEASE_SCRIPT]
+    assert page_tree_cache._token_caches["hash"][:2] == (1, TREE)
+
+
+def test_concurrent_miss_waits_for_peer(mock_redis):
+    """測試鎖已被持有時等待對方的結果，不重複爬取"""
+    mock_redis.hmget.side_effect = [[None] * 5, _fields(1, TREE)]
+    mock_redis.set.return_value = None
+    loader = MagicMock()
+
+    with patch.object(page_tree_cache, "LOCK_POLL_INTERVAL", 0):
+        tree, hit = PageTreeCache("hash").get_or_load(loader)
+
+    assert (tree, hit) == (TREE, True)
+    loader.assert_not_called()
+
+
+def test_add_subpage_skips_missing_tree(mock_redis):
+    """測試 Redis 無快取時不寫入不完整的 Page Tree，並捨棄本機舊資料"""
+    page_tree_cache._token_caches["hash"] = _Entry(3, TREE, time.time(), time.time())
+    mock_redis.eval.return_value = 0
+
+    PageTreeCache("hash").add_subpage({"id": "sub_1", "parent_id": "root_1", "title": "新頁面"})
+
+    assert "hash" not in page_tree_cache._token_caches
+
+
+def test_stale_tree_refreshed_incrementally(mock_redis):
+    """測試超過 TTL 時以上次同步時間為 Watermark 增量更新，並保留完整同步時間"""
+    now = time.time()
+    synced_at = now - page_tree_cache.settings.NOTION_PAGE_TREE_TTL - 10
+    mock_redis.hmget.return_value = _fields(1, TREE, synced_at, synced_at - 100)
+    mock_redis.set.return_value = True
+    mock_redis.eval.return_value = 2
+    refreshed = {"roots": TREE["roots"], "subpages": [{"id": "sub_1", "parent_id": "root_1", "title": "新頁面"}]}
+    crawl = MagicMock()
+    refresh = MagicMock(return_value=refreshed)
+
+    tree, hit = PageTreeCache("hash").get_or_load(crawl, refresh)
+
+    assert (tree, hit) == (refreshed, False)
+    crawl.assert_not_called()
+    refresh.assert_called_once_with(TREE, synced_at)
+    store_args = mock_redis.eval.call_args_list[0].args
+    assert store_args[0] == page_tree_cache._STORE_SCRIPT
+    assert store_args[7] == synced_at - 100
+
+
+def test_full_sync_when_schedule_due(mock_redis):
+    """測試到達完整同步間隔時改為完整爬取"""
+    old = time.time() - page_tree_cache.settings.NOTION_PAGE_TREE_FULL_SYNC_SECONDS - 10
+    mock_redis.hmget.return_value = _fields(1, TREE, old, old)
+    mock_redis.set.return_value = True
+    mock_redis.eval.return_value = 2
+    crawl = MagicMock(return_value=TREE)
+    refresh = MagicMock()
+
+    PageTreeCache("hash").get_or_load(crawl, refresh)
+
+    crawl.assert_called_once()
+    refresh.assert_not_called()
+
+
+def test_stale_tree_served_while_peer_refreshes(mock_redis):
+    """測試其他 Process 正在更新時直接沿用舊的 Page Tree"""
+    synced_at = time.time() - page_tree_cache.settings.NOTION_PAGE_TREE_TTL - 10
+    mock_redis.hmget.return_value = _fields(1, TREE, synced_at)
+    mock_redis.set.return_value = None
+    refresh = MagicMock()
+
+    assert PageTreeCache("hash").get_or_load(MagicMock(), refresh) == (TREE, True)
+    refresh.assert_not_called()
@@ -0,0 +1,157 @@
+from unittest.mock import patch
+from app.core.celery_app import celery_app
+from app.worker import tasks
+
+
+def _route(task_name):
+    return celery_app.amqp.router.route({}, task_name)["queue"].name
+
+
+def test_stages_are_routed_by_workload():
+    """測試轉錄預設進入 stt_bulk 佇列，其餘 Stage 進入 io 佇列"""
+    assert _route("app.worker.tasks.transcribe_stage") == "stt_bulk"
+    for stage in ("route_stage", "summarize_stage", "notion_stage", "notify_stage"):
+        assert _route(f"app.worker.tasks.{stage}") == "io"
+
+
+def test_enqueue_builds_chain_with_note_id():
+    """測試 Pipeline 依序串接各 Stage，且以 Note ID 作為最終 Task ID"""
+    with patch("app.worker.tasks.TaskProgress") as mock_progress, \
+         patch("app.worker.tasks.prefetch_page_tree") as mock_prefetch, \
+         patch("celery.canvas._chain.apply_async") as mock_apply:
+        mock_prefetch.apply_async.return_value.id = "prefetch-1"
+        tasks.enqueue_voice_note("/data/a.m4a", "ctx", note_id="note-1", owner="owner-hash")
+
+    mock_progress.return_value.update.assert_called_once_with("queued", duration=None, owner="owner-hash")
+    assert mock_apply.call_args.kwargs["task_id"] == "note-1"
+    # 頁面樹預取與 Pipeline 同時發送，ID 隨 note 傳給路由階段
+    assert mock_prefetch.apply_async.call_args.kwargs["args"][0]["prefetch_id"] == "prefetch-1"
+
+
+def test_chain_order():
+    """測試 chain 的 Stage 順序與初始 note 內容"""
+    with patch("app.worker.tasks.TaskProgress"), \
+         patch.object(tasks.settings, "PAGE_TREE_PREFETCH_ENABLED", False), \
+         patch("celery.canvas._chain.apply_async", lambda self, **kwargs: self):
+        pipeline = tasks.enqueue_voice_note("/data/a.m4a", "ctx", note_id="note-1")
+
+    names = [sig.task.rsplit(".", 1)[-1] for sig in pipeline.tasks]
+    assert names == ["transcribe_stage", "route_stage", "summarize_stage", "notion_stage", "notify_stage"]
+    note = pipeline.tasks[0].args[0]
+    assert note["note_id"] == "note-1" and note["file_path"] == "/data/a.m4a"
+
+
+def test_short_notes_use_fast_lane():
+    """測試短錄音進入快速通道並取得較高優先序，長度未知時進入一般通道"""
+    with patch("app.worker.tasks.TaskProgress"), \
+         patch.object(tasks.settings, "PAGE_TREE_PREFETCH_ENABLED", False), \
+         patch("celery.canvas._chain.apply_async", lambda self, **kwargs: self):
+        short = tasks.enqueue_voice_note("/data/a.m4a", "ctx", duration=12.0).tasks[0]
+        long = tasks.enqueue_voice_note("/data/b.m4a", "ctx", duration=1200.0).tasks[0]
+        unknown = tasks.enqueue_voice_note("/data/c.webm", "ctx").tasks[0]
+
+    assert short.options["queue"] == "stt_fast"
+    assert long.options["queue"] == unknown.options["queue"] == "stt_bulk"
+    assert short.options["priority"] < long.options["priority"] <= unknown.options["priority"]
+
+
+def test_transcribe_stage_resumes_from_checkpoint():
+    """測試已有逐字稿檢查點時略過轉錄"""
+    saved = {"transcript": "已完成的逐字稿", "stt_model": "small", "silence_removed_seconds": 0.0}
+    with patch("app.worker.tasks.TaskProgress"), \
+         patch("app.worker.tasks.NoteCheckpoint") as mock_checkpoint, \
+         patch("app.worker.tasks.STTService") as mock_stt:
+        mock_checkpoint.return_value.get.return_value = saved
+        note = tasks.transcribe_stage.run({"note_id": "note-1", "enqueued_at": 0, "file_path": "/data/a.m4a"})
+
+    mock_stt.assert_not_called()
+    assert note["transcript"] == "已完成的逐字稿"
+
+
+def test_transcribe_stage_cache_hit_skips_model_load():
+    """測試逐字稿快取命中時不建立 STTService (不載入模型)"""
+    with patch("app.worker.tasks.TaskProgress"), \
+         patch("app.worker.tasks.NoteCheckpoint") as mock_checkpoint, \
+         patch("app.worker.tasks.lookup_cached_transcript", return_value="快取的逐字稿"), \
+         patch("app.worker.tasks.STTService") as mock_stt:
+        mock_checkpoint.return_value.get.return_value = None
+        note = tasks.transcribe_stage.run({"note_id": "note-1", "enqueued_at": 0, "file_path": "/data/a.m4a"})
+
+    mock_stt.assert_not_called()
+    assert note["transcript"] == "快取的逐字稿"
+
+
+def test_notion_stage_does_not_write_twice():
+    """測試 Notion 已寫入時重試不會重複建立頁面"""
+    with patch("app.worker.tasks.TaskProgress"), \
+         patch("app.worker.tasks.NoteCheckpoint") as mock_checkpoint, \
+         patch("app.worker.tasks.NotionService") as mock_notion:
+        mock_checkpoint.return_value.get.return_value = {"title": "會議", "notion_url": "https://notion.so/x"}
+        note = tasks.notion_stage.run({"note_id": "note-1", "enqueued_at": 0, "routing": {"action": "create"}, "summary_md": "# 摘要"})
+
+    mock_notion.return_value.create_subpage.assert_not_called()
+    assert note["notion_url"] == "https://notion.so/x"
+
+
+def test_notion_stage_resumes_partial_write():
+    """測試寫入中途失敗後重試時，由保存的寫入進度繼續"""
+    write_state = {"page": {"id": "page-1", "url": "https://notion.so/page-1"}, "jobs": [["page-1", []]]}
+    checkpoints = {"notion_write": write_state}
+    with patch("app.worker.tasks.TaskProgress"), \
+         patch("app.worker.tasks._load_context"), \
+         patch("app.worker.tasks.NoteCheckpoint") as mock_checkpoint, \
+         patch("app.worker.tasks.NotionService") as mock_notion:
+        mock_checkpoint.return_value.get.side_effect = checkpoints.get
+        mock_notion.return_value.create_subpage.return_value = write_state["page"]
+        note = tasks.notion_stage.run({
+            "note_id": "note-1", "enqueued_at": 0, "summary_md": "# 摘要",
+            "routing": {"action": "create", "target_id": "root-1", "title": "會議"},
+        })
+
+    kwargs = mock_notion.return_value.create_subpage.call_args.kwargs
+    assert kwargs["resume"] == write_state
+    kwargs["on_progress"]({"page": write_state["page"], "jobs": []})
+    mock_checkpoint.return_value.save.assert_any_call("notion_write", {"page": write_state["page"], "jobs": []})
+    assert note["notion_url"] == "https://notion.so/page-1"
+
+
+def test_route_stage_joins_prefetched_page_tree():
+    """測試路由階段沿用預取的頁面樹，不再自行同步 Notion"""
+    page_tree = {"roots": [{"id": "root-1", "title": "工作"}], "subpages": []}
+    checkpoints = {"page_tree": page_tree}
+    with patch("app.worker.tasks.TaskProgress"), \
+         patch("app.worker.tasks.NoteCheckpoint") as mock_checkpoint, \
+         patch("app.worker.tasks.NotionService") as mock_notion, \
+         patch("app.worker.tasks.LLMService") as mock_llm:
+        mock_checkpoint.return_value.get.side_effect = checkpoints.get
+        mock_llm.return_value.route.return_value = {"action": "create"}
+        tasks.route_stage.run({"note_id": "note-1", "enqueued_at": 0, "prefetch_id": "prefetch-1", "transcript": "逐字稿"})
+
+    mock_notion.return_value.sync_page_tree.assert_not_called()
+    mock_llm.return_value.route.assert_called_once_with("逐字稿", page_tree)
+
+
+def test_task_status_only_visible_to_owner():
+    """測試任務狀態僅上傳者可查詢，其他使用者視為不存在"""
+    import pytest
+    from fastapi import HTTPException
+    from app.core.security import TaskSecurity
+    from app.routes.voice_note import get_task_status
+    from app.schemas.context import UserContext, AuthType
+
+    task_id = "00000000-0000-0000-0000-000000000001"
+    owner = UserContext(type=AuthType.DEMO, gemini_key="g", notion_token="mine")
+    other = UserContext(type=AuthType.DEMO, gemini_key="g", notion_token="theirs")
+    progress = {"stage": "transcribing", "progress": 50.0, "partial_text": "逐字稿", "owner": TaskSecurity.owner_of(owner)}
+
+    with patch("app.routes.voice_note.TaskProgress") as mock_progress, \
+         patch("app.routes.voice_note.celery_app") as mock_celery:
+        mock_progress.get.side_effect = lambda _: dict(progress)
+        mock_celery.AsyncResult.return_value.state = "STARTED"
+
+        status = get_task_status(task_id, owner)
+        with pytest.raises(HTTPException) as exc_info:
+            get_task_status(task_id, other)
+
+    assert status.partial_text == "逐字稿"
+    assert exc_info.value.status_code == 404
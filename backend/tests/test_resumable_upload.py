@@ -0,0 +1,84 @@
+import asyncio
+import os
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from app.services import resumable_upload
+from app.services.resumable_upload import UploadSession
+
+WAV = b"RIFF\x24\x00\x00\x00WAVEfmt " + b"\x00" * 100
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.fixture
+def session(tmp_path):
+    """以 dict 模擬 Redis Hash 的 Session"""
+    store = {"offset": "0", "length": str(len(WAV))}
+    with patch.object(resumable_upload, "UPLOAD_DIR", str(tmp_path / "uploads")), \
+         patch.object(resumable_upload, "DATA_DIR", str(tmp_path)), \
+         patch("app.services.resumable_upload.redis_client") as mock_redis:
+        mock_redis.hget.side_effect = lambda key, field: store.get(field)
+        mock_redis.hset.side_effect = lambda key, field, value: store.__setitem__(field, str(value))
+        os.makedirs(tmp_path / "uploads")
+        session = UploadSession("upload-1", store)
+        open(session.part_path, "wb").close()
+        yield session
+
+
+def test_resume_after_interrupted_chunk(session):
+    """測試中斷後依目前 Offset 續傳，完成後移入 /data"""
+    assert asyncio.run(session.append(0, _chunks(WAV[:70]))) == 70
+    assert session.file_ext == ".wav"
+
+    # 以過期的 Offset 重傳會被拒絕
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(session.append(0, _chunks(WAV)))
+    assert exc_info.value.status_code == 409
+
+    assert asyncio.run(session.append(70, _chunks(WAV[70:]))) == len(WAV)
+    processed = []
+    assert session.finalize(lambda path: processed.append(path) or "task-1") == "task-1"
+
+    file_path, = processed
+    assert file_path.endswith(".wav")
+    assert open(file_path, "rb").read() == WAV
+    assert not os.path.exists(session.part_path)
+
+
+def test_finalize_is_idempotent(session):
+    """測試重送 finalize 回傳同一個 task_id，不重複處理"""
+    asyncio.run(session.append(0, _chunks(WAV)))
+    processed = []
+    session.finalize(lambda path: processed.append(path) or "task-1")
+
+    assert session.finalize(lambda path: processed.append(path) or "task-2") == "task-1"
+    assert len(processed) == 1
+    resumable_upload.redis_client.delete.assert_not_called()
+
+
+def test_finalize_retries_failed_processing(session):
+    """測試檔案已移入 /data 但處理失敗時，重送只重新處理同一個檔案"""
+    asyncio.run(session.append(0, _chunks(WAV)))
+
+    def fail(path):
+        raise RuntimeError("broker unavailable")
+
+    with pytest.raises(RuntimeError):
+        session.finalize(fail)
+
+    processed = []
+    assert session.finalize(lambda path: processed.append(path) or "task-1") == "task-1"
+    assert open(processed[0], "rb").read() == WAV
+
+
+def test_finalize_rejects_incomplete_upload(session):
+    """測試未達預告大小時不可完成上傳"""
+    asyncio.run(session.append(0, _chunks(WAV[:50])))
+
+    with pytest.raises(HTTPException) as exc_info:
+        session.finalize(lambda path: "task-1")
+    assert exc_info.value.status_code == 409
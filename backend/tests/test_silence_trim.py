@@ -0,0 +1,45 @@
+import numpy as np
+from app.utils.silence_trim import trim_silence
+
+SR = 16000
+
+
+def _tone(seconds):
+    t = np.arange(int(seconds * SR)) / SR
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+def test_trims_edges_and_compresses_long_gaps():
+    """測試移除頭尾靜音並壓縮過長的內部停頓"""
+    pcm = np.concatenate([_silence(2), _tone(1), _silence(3), _tone(1), _silence(0.5), _tone(1), _silence(2)])
+
+    trimmed, report = trim_silence(pcm, min_gap_seconds=1.0, keep_gap_seconds=0.3, pad_seconds=0.1)
+
+    # 3 段語音 + 壓縮後的停頓 (0.3s + 前後 padding) + 未超過門檻的 0.5s 停頓 + 頭尾 padding
+    assert 3.9 < report["trimmed_seconds"] < 4.4
+    assert abs(report["leading_seconds"] - 1.9) < 0.05
+    assert abs(report["trailing_seconds"] - 1.9) < 0.05
+    assert report["internal_seconds"] > 2.5
+    assert report["removed_seconds"] == round((len(pcm) - len(trimmed)) / SR, 2)
+
+
+def test_returns_original_when_nothing_to_trim():
+    """測試無可移除內容時回傳原陣列 (不複製)"""
+    pcm = _tone(2)
+    trimmed, report = trim_silence(pcm)
+
+    assert trimmed is pcm
+    assert report["removed_seconds"] == 0.0
+
+
+def test_all_silence_left_untouched():
+    """測試整段靜音時不處理，交由 Whisper VAD 判斷"""
+    pcm = _silence(3)
+    trimmed, report = trim_silence(pcm)
+
+    assert trimmed is pcm
+    assert report["removed_seconds"] == 0.0
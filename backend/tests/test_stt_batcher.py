@@ -0,0 +1,51 @@
+import os
+import time
+import numpy as np
+from unittest.mock import MagicMock, patch
+from app.services import stt_batcher
+from app.services.stt_batcher import STTBatcher, transcribe_batch
+
+
+def test_transcribe_batch_splits_segments_by_note():
+    """測試批次推論結果依片段時間分回各筆語音"""
+    audios = [np.zeros(16000 * 5, dtype=np.float32), np.zeros(16000 * 10, dtype=np.float32)]
+    segments = [MagicMock(text="第一則", start=0.0), MagicMock(text="第二則", start=5.0)]
+
+    with patch("faster_whisper.BatchedInferencePipeline") as mock_pipeline_cls:
+        mock_pipeline_cls.return_value.transcribe.return_value = (iter(segments), MagicMock())
+        result = transcribe_batch(MagicMock(), audios)
+
+    assert result == ["第一則", "第二則"]
+    clips = mock_pipeline_cls.return_value.transcribe.call_args.kwargs["clip_timestamps"]
+    assert clips == [{"start": 0.0, "end": 5.0}, {"start": 5.0, "end": 15.0}]
+
+
+def test_batcher_leader_alone_reads_decoded_pcm_without_waiting(tmp_path):
+    """測試 Leader 單獨一筆時不等待批次視窗，且直接讀取請求端已解碼的 PCM"""
+    audio = np.ones(16000, dtype=np.float32)
+    pending, results = [], {}
+
+    def lpop(key, count):
+        batch = pending[:count]
+        del pending[:count]
+        return batch
+
+    with patch.object(stt_batcher, "redis_client") as mock_redis, \
+         patch.object(stt_batcher, "transcribe_batch", return_value=["你好"]) as mock_batch, \
+         patch.object(stt_batcher.settings, "STT_BATCH_WINDOW_MS", 60000), \
+         patch("app.services.model_policy.stt_queue_depth", return_value=0):
+        mock_redis.rpush.side_effect = lambda key, entry: pending.append(entry)
+        mock_redis.llen.side_effect = lambda key: len(pending)
+        mock_redis.set.return_value = True
+        mock_redis.lpop.side_effect = lpop
+        mock_redis.pipeline.return_value.rpush.side_effect = lambda key, value: results.__setitem__(key, value)
+        mock_redis.blpop.side_effect = lambda key, timeout: (key, results[key])
+
+        start = time.monotonic()
+        text = STTBatcher(MagicMock(), "small").transcribe(audio, str(tmp_path / "note.wav"))
+
+    assert text == "你好"
+    assert time.monotonic() - start < 5
+    assert np.array_equal(mock_batch.call_args.args[1][0], audio)
+    # 暫存 PCM 檔已清除
+    assert os.listdir(tmp_path) == []
@@ -1,28 +1,44 @@
 import pytest
 from unittest.mock import MagicMock, patch
-from app.services.stt_service import STTService
+from app.services.stt_service import STTService, WhisperModelRegistry
 
 @pytest.fixture
 def stt_service():
     # 模擬 WhisperModel 載入，避免在測試環境真的跑模型（太重）
-    with patch("app.services.stt_service.WhisperModel"):
+    # 測試使用假路徑，關閉需實際解碼音訊的靜音移除
+    WhisperModelRegistry.clear()
+    with patch("app.services.stt_service.WhisperModel"), \
+         patch("app.services.stt_service.settings.STT_TRIM_SILENCE", False):
         service = STTService()
-        return service
+        yield service
+    WhisperModelRegistry.clear()
 
 def test_transcribe_success(stt_service):
     """測試語音轉文字功能"""
     # 模擬 segment 物件
     mock_segment = MagicMock()
     mock_segment.text = "這是一段測試文字"
+    mock_segment.end = 2.0
     
     # 模擬 model.transcribe 的回傳值 (segments, info)
-    stt_service.model.transcribe.return_value = ([mock_segment], MagicMock())
+    stt_service.model.transcribe.return_value = ([mock_segment], MagicMock(duration=2.0))
     
     result = stt_service.transcribe("fake_audio.m4a")
     
     assert result == "這是一段測試文字"
     assert stt_service.model.transcribe.called
 
+def test_transcribe_reports_progress(stt_service):
+    """測試解碼過程中逐段回報進度與部分逐字稿"""
+    segments = [MagicMock(text="第一段", end=5.0), MagicMock(text="第二段", end=10.0)]
+    stt_service.model.transcribe.return_value = (iter(segments), MagicMock(duration=10.0))
+    reports = []
+
+    result = stt_service.transcribe("fake_audio.m4a", on_progress=lambda p, text: reports.append((p, text)))
+
+    assert result == "第一段 第二段"
+    assert reports == [(50.0, "第一段"), (100.0, "第一段 第二段")]
+
 def test_transcribe_failure(stt_service):
     """測試轉錄失敗的情況"""
     stt_service.model.transcribe.side_effect = Exception("STT Error")
@@ -31,3 +47,28 @@ def test_transcribe_failure(stt_service):
         stt_service.transcribe("fake_audio.m4a")
     
     assert "STT Error" in str(excinfo.value)
+
+def test_model_loaded_once_per_process():
+    """測試模型於 Process 內只載入一次"""
+    WhisperModelRegistry.clear()
+    with patch("app.services.stt_service.WhisperModel") as mock_model_cls:
+        first = STTService()
+        second = STTService()
+
+    assert first.model is second.model
+    assert mock_model_cls.call_count == 1
+    assert "load_seconds" in WhisperModelRegistry.stats()[first.model_size]
+    WhisperModelRegistry.clear()
+
+def test_registry_evicts_least_recently_used_model():
+    """測試常駐模型數超過上限時釋放最久未使用的模型"""
+    WhisperModelRegistry.clear()
+    with patch("app.services.stt_service.WhisperModel"), \
+         patch("app.services.stt_service.settings.STT_MODEL_CACHE_SIZE", 2):
+        WhisperModelRegistry.get("small")
+        WhisperModelRegistry.get("tiny")
+        WhisperModelRegistry.get("small")
+        WhisperModelRegistry.get("base")
+
+    assert list(WhisperModelRegistry._models) == ["small", "base"]
+    WhisperModelRegistry.clear()
@@ -0,0 +1,34 @@
+import json
+from unittest.mock import patch
+from app.services.stt_service import STTService, WhisperModelRegistry
+from app.services.stt_tuning import load_tuning_profile, tuning_for
+
+
+def test_missing_profile_uses_defaults(tmp_path):
+    """測試調校檔不存在時使用預設參數"""
+    load_tuning_profile.cache_clear()
+    with patch("app.services.stt_tuning.settings.STT_PROFILE_PATH", str(tmp_path / "missing.json")):
+        tuning = tuning_for("small")
+    load_tuning_profile.cache_clear()
+
+    assert tuning["beam_size"] == 5
+    assert tuning["num_workers"] == 1
+
+
+def test_tuning_profile_applied_to_model(tmp_path):
+    """測試 STTService 啟動時載入本機調校檔"""
+    profile_path = tmp_path / "stt_profile.json"
+    profile_path.write_text(json.dumps({
+        "latency": {"small": {"compute_type": "int8", "cpu_threads": 2, "num_workers": 1, "beam_size": 1, "rtf": 0.2}}
+    }))
+
+    WhisperModelRegistry.clear()
+    load_tuning_profile.cache_clear()
+    with patch("app.services.stt_tuning.settings.STT_PROFILE_PATH", str(profile_path)), \
+         patch("app.services.stt_service.WhisperModel") as mock_model_cls:
+        service = STTService("small")
+
+    assert service.tuning["beam_size"] == 1
+    assert mock_model_cls.call_args.kwargs["cpu_threads"] == 2
+    load_tuning_profile.cache_clear()
+    WhisperModelRegistry.clear()
@@ -0,0 +1,19 @@
+from unittest.mock import patch
+from app.services.template_predictor import predict_template
+
+
+def test_predict_template_by_keywords():
+    """測試依逐字稿關鍵字預測模板"""
+    assert predict_template("今天下午開會討論下週的開發進度") == "meeting"
+    assert predict_template("記得明天要做報告，週五截止") == "todo"
+    assert predict_template("突然有個點子，可以做一個語音筆記工具") == "idea"
+
+
+def test_predict_template_falls_back_to_last_used():
+    """測試無關鍵字時沿用最近一次的模板"""
+    with patch("app.services.template_predictor.redis_client") as mock_redis:
+        mock_redis.get.return_value = "meeting"
+        assert predict_template("天氣很好") == "meeting"
+
+        mock_redis.get.return_value = None
+        assert predict_template("天氣很好") == "general"
@@ -0,0 +1,35 @@
+import os
+from unittest.mock import patch
+from app.services.transcript_cache import TranscriptCache
+
+
+def test_make_key_depends_on_content_and_model(tmp_path):
+    """測試快取 Key 只依音訊內容與模型設定，與檔名無關"""
+    first, second = tmp_path / "a.m4a", tmp_path / "b.m4a"
+    first.write_bytes(b"same audio")
+    second.write_bytes(b"same audio")
+
+    assert TranscriptCache.make_key(str(first), "small") == TranscriptCache.make_key(str(second), "small")
+    assert TranscriptCache.make_key(str(first), "small") != TranscriptCache.make_key(str(first), "tiny")
+
+
+def test_disk_backend_lru_eviction(tmp_path):
+    """測試磁碟快取超過上限時淘汰最久未使用的項目"""
+    cache = TranscriptCache(backend="disk", max_entries=2)
+    cache.cache_dir = str(tmp_path)
+
+    with patch("app.services.transcript_cache.redis_client") as mock_redis:
+        cache.put("a", "逐字稿 A")
+        cache.put("b", "逐字稿 B")
+        os.utime(tmp_path / "a.txt", (0, 0))
+        os.utime(tmp_path / "b.txt", (1, 1))
+        assert cache.get("a") == "逐字稿 A"  # 讀取後 a 成為最近使用
+        cache.put("c", "逐字稿 C")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "逐字稿 A"
+        assert cache.get("c") == "逐字稿 C"
+
+    incr_keys = [call.args[0] for call in mock_redis.incr.call_args_list]
+    assert incr_keys.count("stt_cache:hits") == 3
+    assert incr_keys.count("stt_cache:misses") == 1
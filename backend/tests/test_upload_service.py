@@ -0,0 +1,102 @@
+import asyncio
+import struct
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from app.services.upload_service import save_upload_stream
+
+WAV_HEADER = b"RIFF\x24\x00\x00\x00WAVEfmt "
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_stream_written_and_renamed(tmp_path):
+    """測試分段到達的 Header 仍能正確驗證，完成後以正式檔名存放"""
+    data = WAV_HEADER + b"\x00" * 1000
+    file_path, _ = asyncio.run(save_upload_stream(_chunks(data[:5], data[5:20], data[20:]), str(tmp_path)))
+
+    assert file_path.endswith(".wav")
+    assert open(file_path, "rb").read() == data
+    assert [p.name for p in tmp_path.iterdir()] == [file_path.rsplit("/", 1)[-1]]
+
+
+def test_stream_duration_probed_without_reopening(tmp_path):
+    """測試寫入完成後以同一個檔案 Handle 推算長度"""
+    fmt = b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 16000, 32000, 2, 16)
+    data = b"RIFF\x00\x00\x00\x00WAVE" + fmt + b"data" + struct.pack("<I", 64000) + b"\x00" * 64000
+
+    with patch("app.services.audio_validator.open", create=True) as mock_open:
+        file_path, duration = asyncio.run(save_upload_stream(_chunks(data[:30], data[30:]), str(tmp_path)))
+
+    mock_open.assert_not_called()
+    assert duration == 2.0
+
+
+def test_oversized_stream_aborted(tmp_path):
+    """測試超過大小限制時中止並刪除暫存檔"""
+    with patch("app.services.upload_service.MAX_FILE_SIZE", 100):
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(save_upload_stream(_chunks(WAV_HEADER, b"\x00" * 200), str(tmp_path)))
+
+    assert exc_info.value.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_invalid_format_rejected_on_first_chunk(tmp_path):
+    """測試第一個 Chunk 即拒絕不支援的格式"""
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(save_upload_stream(_chunks(b"not an audio file", b"\x00" * 100), str(tmp_path)))
+
+    assert exc_info.value.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+
+class _StreamRequest:
+    """模擬只提供 headers 與 stream() 的 Request"""
+
+    def __init__(self, body, content_type, chunk_size=7):
+        self.headers = {"content-type": content_type}
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def stream(self):
+        for i in range(0, len(self._body), self._chunk_size):
+            yield self._body[i:i + self._chunk_size]
+
+
+def _multipart(parts, boundary="XyZ"):
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + content + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def test_multipart_stream_extracts_audio_field(tmp_path):
+    """測試直接串流解析 multipart，只寫入 audio 檔案欄位的內容"""
+    from app.services.upload_service import iter_multipart_file
+
+    data = WAV_HEADER + b"\x01\x02" * 500
+    body, content_type = _multipart([("note", None, b"hello"), ("audio", "a.wav", data)])
+
+    file_path, _ = asyncio.run(save_upload_stream(iter_multipart_file(_StreamRequest(body, content_type)), str(tmp_path)))
+
+    assert open(file_path, "rb").read() == data
+
+
+def test_multipart_stream_missing_field():
+    """測試缺少 audio 檔案欄位時回傳 422"""
+    from app.services.upload_service import iter_multipart_file
+
+    body, content_type = _multipart([("note", None, b"hello")])
+
+    async def consume():
+        return [chunk async for chunk in iter_multipart_file(_StreamRequest(body, content_type))]
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(consume())
+    assert exc_info.value.status_code == 422